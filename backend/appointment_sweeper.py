@@ -0,0 +1,187 @@
+# backend/appointment_sweeper.py
+# Background job moving appointments out of their "live" states once their slot has passed:
+#   PENDING requests nobody answered before the slot started -> EXPIRED (their slots are freed)
+#   CONFIRMED appointments whose video join window has closed  -> COMPLETED
+# so PENDING/CONFIRMED only hold appointments that still matter and every status-filtered query
+# (request lists, upcoming appointments, the rebooking checks) keeps scanning a small set.
+# Each run also rolls weekly schedule templates forward so they always reach
+# SCHEDULE_TEMPLATE_HORIZON_DAYS ahead without the doctor calling POST /expand.
+# Work is done in bounded batches, one short transaction each, so a large backlog after a long
+# downtime never holds the write lock for long. Safe to run in several workers at once: every
+# UPDATE re-checks the status it moves away from.
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import and_, or_, select, update
+
+from database import AsyncSessionLocal
+from doctor_availability import refresh_next_free_slot, refresh_statement
+from models import Appointment, AppointmentStatus, DoctorProfile, ScheduleTemplate, TimeSlot
+from routers.schedule_templates import SCHEDULE_TEMPLATE_HORIZON_DAYS, expand_template
+from schedule_time import clinic_today, local_start
+
+logger = logging.getLogger(__name__)
+
+APPOINTMENT_SWEEP_INTERVAL_SECONDS = int(os.environ.get("APPOINTMENT_SWEEP_INTERVAL_SECONDS", "300")) # 0 disables
+APPOINTMENT_SWEEP_BATCH_SIZE = int(os.environ.get("APPOINTMENT_SWEEP_BATCH_SIZE", "500"))
+# Confirmed appointments are completed this long after their start (the video join window)
+APPOINTMENT_COMPLETE_AFTER_MINUTES = int(os.environ.get("APPOINTMENT_COMPLETE_AFTER_MINUTES", "60"))
+# Templates expanded per transaction (each one is a read plus a bulk INSERT of a few weeks of slots)
+TEMPLATE_ROLL_BATCH_SIZE = 50
+
+
+class AppointmentSweeper:
+    def __init__(self, session_factory=AsyncSessionLocal, interval_seconds: int = APPOINTMENT_SWEEP_INTERVAL_SECONDS,
+                 batch_size: int = APPOINTMENT_SWEEP_BATCH_SIZE, complete_after_minutes: int = APPOINTMENT_COMPLETE_AFTER_MINUTES):
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.complete_after = timedelta(minutes=complete_after_minutes)
+        self._task: Optional[asyncio.Task] = None
+        self.stats_counters = {"runs": 0, "failed_runs": 0, "expired": 0, "slots_freed": 0, "completed": 0, "profiles_refreshed": 0,
+                              "templates_rolled": 0, "template_slots_added": 0}
+        self.last_run: Optional[dict] = None
+
+    async def _move_batch(self, from_status: AppointmentStatus, to_status: AppointmentStatus, started_before: datetime) -> list:
+        """
+        Moves up to batch_size appointments in `from_status` whose slot started before the
+        cutoff to `to_status` (one transaction). Returns the (id, timeslot_id) rows moved.
+        Legacy slots without starts_at go by their date: moved once a whole day before the cutoff's.
+        """
+        async with self.session_factory() as db:
+            ids = (await db.scalars(
+                select(Appointment.id).join(TimeSlot, TimeSlot.id == Appointment.timeslot_id).where(
+                    Appointment.status == from_status, # ix_appointments_status
+                    or_(
+                        TimeSlot.starts_at < started_before,
+                        and_(TimeSlot.starts_at.is_(None), TimeSlot.date < local_start(started_before).date()),
+                    ),
+                ).limit(self.batch_size)
+            )).all()
+            if not ids:
+                return []
+            moved = (await db.execute(
+                update(Appointment)
+                .where(Appointment.id.in_(ids), Appointment.status == from_status) # Not answered meanwhile
+                .values(status=to_status)
+                .returning(Appointment.id, Appointment.timeslot_id)
+                .execution_options(synchronize_session=False)
+            )).all()
+            if moved and to_status == AppointmentStatus.EXPIRED:
+                await db.execute(
+                    update(TimeSlot).where(TimeSlot.id.in_([row.timeslot_id for row in moved]))
+                    .values(is_booked=False).execution_options(synchronize_session=False)
+                )
+            await db.commit()
+        return moved
+
+    async def _move_all(self, from_status: AppointmentStatus, to_status: AppointmentStatus, started_before: datetime) -> int:
+        total = 0
+        while True:
+            moved = await self._move_batch(from_status, to_status, started_before)
+            total += len(moved)
+            if len(moved) < self.batch_size:
+                return total
+            await asyncio.sleep(0) # Let requests in between batches
+
+    async def _refresh_stale_next_free_slots(self, now: datetime) -> int:
+        """Profiles whose next free slot has started unbooked (readers skip them until this runs)."""
+        async with self.session_factory() as db:
+            result = await db.execute(refresh_statement(now).where(DoctorProfile.next_free_slot_at < now))
+            await db.commit()
+        return result.rowcount or 0
+
+    async def _roll_templates_batch(self, today: date) -> tuple:
+        """
+        Expands up to TEMPLATE_ROLL_BATCH_SIZE templates that stop short of the horizon (one
+        transaction). Returns (templates expanded, slots added).
+        """
+        horizon = today + timedelta(days=SCHEDULE_TEMPLATE_HORIZON_DAYS)
+        async with self.session_factory() as db:
+            templates = (await db.scalars(
+                select(ScheduleTemplate).where(
+                    or_(ScheduleTemplate.expanded_until.is_(None), ScheduleTemplate.expanded_until < horizon),
+                    or_(ScheduleTemplate.effective_until.is_(None), ScheduleTemplate.effective_until >= today), # Nothing left to add
+                ).order_by(ScheduleTemplate.id).limit(TEMPLATE_ROLL_BATCH_SIZE)
+            )).all()
+            if not templates:
+                return 0, 0
+            added = 0
+            for template in templates:
+                added += (await expand_template(db, template, today))["slots_added"] # Also moves expanded_until to the horizon
+            for doctor_id in {template.doctor_id for template in templates}:
+                await refresh_next_free_slot(db, doctor_id)
+            await db.commit()
+        return len(templates), added
+
+    async def _roll_templates_forward(self, today: date) -> tuple:
+        rolled = added = 0
+        while True:
+            templates, slots = await self._roll_templates_batch(today)
+            rolled += templates
+            added += slots
+            if templates < TEMPLATE_ROLL_BATCH_SIZE:
+                return rolled, added
+            await asyncio.sleep(0) # Let requests in between batches
+
+    async def sweep(self) -> dict:
+        """One full run; returns how many rows each step touched."""
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        expired = await self._move_all(AppointmentStatus.PENDING, AppointmentStatus.EXPIRED, now)
+        completed = await self._move_all(AppointmentStatus.CONFIRMED, AppointmentStatus.COMPLETED, now - self.complete_after)
+        refreshed = await self._refresh_stale_next_free_slots(now)
+        templates_rolled, template_slots_added = await self._roll_templates_forward(clinic_today())
+        result = {
+            "expired": expired,
+            "slots_freed": expired, # One slot per appointment
+            "completed": completed,
+            "profiles_refreshed": refreshed,
+            "templates_rolled": templates_rolled,
+            "template_slots_added": template_slots_added,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.stats_counters["runs"] += 1
+        for key in ("expired", "slots_freed", "completed", "profiles_refreshed", "templates_rolled", "template_slots_added"):
+            self.stats_counters[key] += result[key]
+        self.last_run = result
+        return result
+
+    async def _sweep_forever(self):
+        while True:
+            try:
+                result = await self.sweep()
+                if result["expired"] or result["completed"] or result["profiles_refreshed"] or result["templates_rolled"]:
+                    logger.info("Appointment sweep: %s expired, %s completed, %s next free slots refreshed, "
+                                "%s schedule templates rolled forward (%s slots) in %s ms",
+                                result["expired"], result["completed"], result["profiles_refreshed"],
+                                result["templates_rolled"], result["template_slots_added"], result["duration_ms"])
+            except Exception as e: # Keep sweeping even if one run fails (e.g. DB briefly locked)
+                self.stats_counters["failed_runs"] += 1
+                logger.error("Error during appointment sweep: %s", e)
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        """Starts background sweeping (first run right away); call from the app lifespan."""
+        if self._task is None and self.interval_seconds > 0:
+            self._task = asyncio.create_task(self._sweep_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {**self.stats_counters, "interval_seconds": self.interval_seconds, "batch_size": self.batch_size, "last_run": self.last_run}
+
+
+appointment_sweeper = AppointmentSweeper()
@@ -0,0 +1,126 @@
+# backend/benchmarks/bench_appointment_sweeper.py
+"""
+A doctor with a long history: --appointments appointments whose slots have passed, most still
+PENDING or CONFIRMED because nothing ever moved them on, plus a few weeks of future ones.
+
+Times status-filtered reads before and after one run of the appointment sweeper: the doctor's
+pending request list (GET /appointments/requests?status=pending, already a keyset page) and a
+count of the doctor's live (pending/confirmed) appointments, which has to visit every live row.
+Also times the sweep itself in batches of --batch.
+
+    python -m benchmarks.bench_appointment_sweeper --appointments 50000 --batch 500
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import use_temp_database, summarize, Timer
+
+use_temp_database()
+
+import httpx
+from sqlalchemy import func, insert, select
+
+import main
+from appointment_sweeper import AppointmentSweeper
+from database import AsyncSessionLocal, SessionLocal, dispose_engines, create_db_tables
+from models import Appointment, AppointmentStatus, TimeSlot, User, UserRole
+from routers.auth import create_jwt_token
+
+create_db_tables() # Tables, indexes and search index in the temp database
+
+PATIENTS = 200
+FUTURE_APPOINTMENTS = 500
+TIMES = [f"{h:02d}:{m:02d}" for h in range(9, 17) for m in (0, 30)]
+
+
+def seed(appointments: int):
+    rng = random.Random(25)
+    first_day = date.today() - timedelta(days=appointments // len(TIMES) + 2)
+    with SessionLocal() as db:
+        doctor = User(username="long_serving_doctor", email="doctor@example.com", password="x", role=UserRole.doctor)
+        db.add(doctor)
+        db.flush()
+        db.execute(insert(User), [
+            {"username": f"patient{i}", "email": f"patient{i}@example.com", "password": "x", "role": UserRole.patient} for i in range(PATIENTS)
+        ])
+        patient_ids = db.scalars(select(User.id).where(User.role == UserRole.patient)).all()
+        total = appointments + FUTURE_APPOINTMENTS
+        days = [first_day + timedelta(days=i // len(TIMES)) for i in range(appointments)]
+        days += [date.today() + timedelta(days=1 + i // len(TIMES)) for i in range(FUTURE_APPOINTMENTS)]
+        db.execute(insert(TimeSlot), [
+            {"doctor_id": doctor.id, "date": day, "start_time": TIMES[i % len(TIMES)], "is_booked": True} for i, day in enumerate(days)
+        ])
+        slots = db.execute(select(TimeSlot.id, TimeSlot.date).order_by(TimeSlot.id)).all()
+        # Past: never swept, so a fifth are still "pending" and most of the rest "confirmed"
+        statuses = (AppointmentStatus.PENDING, AppointmentStatus.CONFIRMED, AppointmentStatus.REJECTED)
+        db.execute(insert(Appointment), [
+            {"patient_id": rng.choice(patient_ids), "doctor_id": doctor.id, "timeslot_id": slot.id, "appointment_date": slot.date,
+             "status": rng.choices(statuses, weights=(20, 70, 10))[0] if i < appointments else rng.choice(statuses[:2])}
+            for i, slot in enumerate(slots)
+        ])
+        db.commit()
+        token = create_jwt_token(data={"sub": doctor.username, "role": doctor.role.value, "user_id": doctor.id, "tv": doctor.token_version})
+    print(f"{total} appointments ({appointments} in the past, {FUTURE_APPOINTMENTS} upcoming)")
+    return doctor.id, token
+
+
+def live_counts():
+    with SessionLocal() as db:
+        return dict(db.execute(select(Appointment.status, func.count()).group_by(Appointment.status)).all())
+
+
+async def time_reads(client, headers, doctor_id: int, label: str, requests: int):
+    latencies = []
+    with Timer() as timer:
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = await client.get("/appointments/requests", params={"status": "pending", "limit": 50}, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+    summarize(f"{label}: pending requests", latencies, timer.elapsed)
+
+    latencies = []
+    live = (AppointmentStatus.PENDING, AppointmentStatus.CONFIRMED)
+    async with AsyncSessionLocal() as db:
+        with Timer() as timer:
+            for _ in range(requests):
+                started = time.perf_counter()
+                await db.scalar(select(func.count()).select_from(Appointment).where(Appointment.doctor_id == doctor_id, Appointment.status.in_(live)))
+                latencies.append(time.perf_counter() - started)
+    summarize(f"{label}: live count", latencies, timer.elapsed)
+
+
+async def bench(appointments: int, batch: int, requests: int):
+    doctor_id, token = seed(appointments)
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=main.app) # No lifespan here, so the app's own sweeper stays off
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'':<32} live before: { {s.value: n for s, n in live_counts().items()} }")
+        await time_reads(client, headers, doctor_id, "before sweep", requests)
+
+        sweeper = AppointmentSweeper(batch_size=batch, interval_seconds=0)
+        result = await sweeper.sweep()
+        print(f"{'sweep':<32} {result['expired']} expired, {result['completed']} completed, "
+              f"{result['profiles_refreshed']} profiles refreshed in {result['duration_ms']:.0f} ms "
+              f"({math.ceil(result['expired'] / batch) + math.ceil(result['completed'] / batch)} transactions of up to {batch})")
+        again = await sweeper.sweep()
+        print(f"{'sweep again (nothing to do)':<32} {again['duration_ms']:.1f} ms")
+
+        print(f"{'':<32} live after: { {s.value: n for s, n in live_counts().items()} }")
+        await time_reads(client, headers, doctor_id, "after sweep", requests)
+    counts = live_counts()
+    assert counts[AppointmentStatus.PENDING] + counts[AppointmentStatus.CONFIRMED] <= FUTURE_APPOINTMENTS, counts
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--appointments", type=int, default=50000, help="Appointments whose slot has passed")
+    parser.add_argument("--batch", type=int, default=500, help="Appointments per sweeper transaction")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(bench(args.appointments, args.batch, args.requests))
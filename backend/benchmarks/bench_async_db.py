@@ -0,0 +1,85 @@
+# backend/benchmarks/bench_async_db.py
+"""
+Concurrent-request throughput: sync Session inside `async def` (old get_db) vs AsyncSession (new get_db).
+
+Both endpoints run the same deliberately slow read. With the sync session the query blocks
+the event loop, so concurrent requests run one after another; with the async session the
+loop keeps serving other requests while the driver waits.
+
+Keep --concurrency below the sync pool limit (5 + 10 overflow): past it the sync path
+blocks the loop waiting for a connection that can only be returned by the loop, and hangs.
+
+    python -m benchmarks.bench_async_db --requests 200 --concurrency 10
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import use_temp_database, summarize, Timer
+
+use_temp_database()
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db, get_sync_db, dispose_engines
+
+# Recursive CTE that keeps SQLite busy for a few milliseconds per call
+SLOW_QUERY = text(
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < :n) SELECT count(*) FROM c"
+)
+
+app = FastAPI()
+
+
+@app.get("/sync")
+async def sync_endpoint(db: Session = Depends(get_sync_db), n: int = 50000):
+    return {"rows": db.execute(SLOW_QUERY, {"n": n}).scalar()}
+
+
+@app.get("/async")
+async def async_endpoint(db: AsyncSession = Depends(get_db), n: int = 50000):
+    return {"rows": (await db.execute(SLOW_QUERY, {"n": n})).scalar()}
+
+
+async def fire(client: httpx.AsyncClient, path: str, total: int, concurrency: int, rows: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(path, params={"n": rows})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    with Timer() as timer:
+        await asyncio.gather(*(one() for _ in range(total)))
+    return latencies, timer.elapsed
+
+
+async def main(total: int, concurrency: int, rows: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm both paths (connection pools, statement compilation)
+        await fire(client, "/sync", concurrency, concurrency, rows)
+        await fire(client, "/async", concurrency, concurrency, rows)
+
+        print(f"{total} requests, concurrency {concurrency}, CTE rows {rows}")
+        before = summarize("before: sync Session", *await fire(client, "/sync", total, concurrency, rows))
+        after = summarize("after: AsyncSession", *await fire(client, "/async", total, concurrency, rows))
+        if before["throughput_rps"]:
+            print(f"throughput change: x{after['throughput_rps'] / before['throughput_rps']:.2f}")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=50000, help="Rows generated by the slow query")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.rows))
@@ -0,0 +1,120 @@
+# backend/benchmarks/bench_batch_requests.py
+"""
+A doctor working through a backlog of pending appointment requests: one
+POST /appointments/requests/{id}/confirm|reject per appointment (what appointments.html did)
+vs one POST /appointments/requests/batch per --batch appointments.
+
+Half of the backlog is accepted and half declined each way. Prints wall-clock time per
+appointment and the SQL statements it took, then checks both ways left the same rows behind.
+
+    python -m benchmarks.bench_batch_requests --appointments 2000 --batch 50
+"""
+import argparse
+import asyncio
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import use_temp_database, summarize, Timer
+
+use_temp_database()
+
+import httpx
+from sqlalchemy import func, select
+
+import main
+from database import SessionLocal, dispose_engines, create_db_tables
+from models import Appointment, AppointmentStatus, Notification, TimeSlot, User, UserRole
+from routers.auth import create_jwt_token
+
+create_db_tables() # Tables, indexes and search index in the temp database
+
+PATIENTS = 100
+
+
+def seed(appointments: int):
+    """Two equal backlogs of pending requests for one doctor: one per way of clearing it."""
+    first_day = date.today() + timedelta(days=1)
+    with SessionLocal() as db:
+        doctor = User(username="busy_doctor", email="busy_doctor@example.com", password="x", role=UserRole.doctor)
+        patients = [User(username=f"patient{i}", email=f"patient{i}@example.com", password="x", role=UserRole.patient) for i in range(PATIENTS)]
+        db.add(doctor)
+        db.add_all(patients)
+        db.flush()
+        slots = [
+            TimeSlot(doctor_id=doctor.id, date=first_day + timedelta(days=i // 16), start_time=f"{9 + (i % 16) // 2:02d}:{(i % 2) * 30:02d}", is_booked=True)
+            for i in range(2 * appointments)
+        ]
+        db.add_all(slots)
+        db.flush()
+        db.add_all(
+            Appointment(patient_id=patients[i % PATIENTS].id, doctor_id=doctor.id, timeslot_id=slot.id, appointment_date=slot.date,
+                        status=AppointmentStatus.PENDING)
+            for i, slot in enumerate(slots)
+        )
+        db.commit()
+        ids = db.scalars(select(Appointment.id).order_by(Appointment.id)).all()
+        token = create_jwt_token(data={"sub": doctor.username, "role": doctor.role.value, "user_id": doctor.id, "tv": doctor.token_version})
+    return token, ids[:appointments], ids[appointments:]
+
+
+def outcome(ids):
+    """(confirmed, rejected, freed slots, notifications) among the given appointments."""
+    with SessionLocal() as db:
+        statuses = dict(db.execute(select(Appointment.status, func.count()).where(Appointment.id.in_(ids)).group_by(Appointment.status)).all())
+        freed = db.scalar(select(func.count()).select_from(Appointment).join(TimeSlot, TimeSlot.id == Appointment.timeslot_id)
+                          .where(Appointment.id.in_(ids), TimeSlot.is_booked == False))
+        notified = db.scalar(select(func.count()).select_from(Notification).where(Notification.appointment_id.in_(ids)))
+    return statuses.get(AppointmentStatus.CONFIRMED, 0), statuses.get(AppointmentStatus.REJECTED, 0), freed, notified
+
+
+async def bench(appointments: int, batch: int):
+    token, sequential_ids, batch_ids = seed(appointments)
+    headers = {"Authorization": f"Bearer {token}"}
+    print(f"doctor with 2 x {appointments} pending requests; batches of {batch}")
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Before: one request (and one transaction) per appointment
+        latencies, statements = [], 0
+        with Timer() as timer:
+            for i, appointment_id in enumerate(sequential_ids):
+                action = "confirm" if i % 2 == 0 else "reject"
+                started = time.perf_counter()
+                response = await client.post(f"/appointments/requests/{appointment_id}/{action}", headers=headers)
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+                statements += int(response.headers["X-DB-Query-Count"])
+        summarize("before: one per appointment", latencies, timer.elapsed)
+        print(f"{'':<32} {timer.elapsed / appointments * 1000:.2f} ms and {statements / appointments:.1f} SQL statements per appointment")
+
+        # After: the same split, `batch` appointments per request
+        confirms, rejects = batch_ids[0::2], batch_ids[1::2]
+        latencies, statements = [], 0
+        with Timer() as timer:
+            for action, ids in (("confirm", confirms), ("reject", rejects)):
+                for start in range(0, len(ids), batch):
+                    started = time.perf_counter()
+                    response = await client.post("/appointments/requests/batch", headers=headers,
+                                                 json={"action": action, "appointment_ids": ids[start:start + batch]})
+                    latencies.append(time.perf_counter() - started)
+                    response.raise_for_status()
+                    assert not response.json()["skipped"], response.json()["skipped"]
+                    statements += int(response.headers["X-DB-Query-Count"])
+        summarize("after: batch endpoint", latencies, timer.elapsed)
+        print(f"{'':<32} {timer.elapsed / appointments * 1000:.2f} ms and {statements / appointments:.1f} SQL statements per appointment")
+
+        # Replaying a batch changes nothing and says why
+        replay = (await client.post("/appointments/requests/batch", headers=headers, json={"action": "reject", "appointment_ids": confirms[:3]})).json()
+        assert replay["updated"] == [] and len(replay["skipped"]) == 3, replay
+
+    before, after = outcome(sequential_ids), outcome(batch_ids)
+    print(f"{'':<32} confirmed/rejected/freed/notified: before {before}, after {after}")
+    assert before == after, "the two ways left different rows behind"
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--appointments", type=int, default=2000, help="Pending requests cleared each way")
+    parser.add_argument("--batch", type=int, default=50, help="Appointments per batch request (at most 200)")
+    args = parser.parse_args()
+    asyncio.run(bench(args.appointments, args.batch))
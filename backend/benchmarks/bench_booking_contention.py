@@ -0,0 +1,144 @@
+# backend/benchmarks/bench_booking_contention.py
+"""
+Many patients booking a few hot slots at once: select-then-update booking (the previous
+implementation, mounted here as /bench/legacy-book) vs the single conditional UPDATE in
+POST /appointments/book.
+
+Each round resets the hot slots and fires --bookings requests concurrently, spread over
+--slots slots. Exactly one booking per slot should succeed; the rest should get a quick
+409. Reports throughput, latency of winners and of conflicts, status codes and whether
+any slot ended up with more than one appointment.
+
+    python -m benchmarks.bench_booking_contention --bookings 200 --slots 4 --rounds 5
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+from datetime import date, timedelta
+from typing import Annotated
+
+from benchmarks.common import use_temp_database, summarize, Timer
+
+use_temp_database()
+
+import httpx
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import delete, exc, func, select, update
+
+import main
+from database import SessionLocal, dispose_engines, create_db_tables
+from models import Appointment, AppointmentStatus, TimeSlot, User, UserRole
+from routers.appointments import AppointmentRequest, db_dependency
+from routers.auth import create_jwt_token, get_current_active_user
+
+create_db_tables() # Tables, indexes and search index in the temp database
+
+BOOK_DAY = date.today() + timedelta(days=7)
+
+
+async def legacy_book(request: AppointmentRequest, db: db_dependency, current_user: Annotated[User, Depends(get_current_active_user)]):
+    """The old flow: read a free slot, then flip it and insert; races are only caught by the unique timeslot_id."""
+    try:
+        available_slot = await db.scalar(select(TimeSlot).where(
+            TimeSlot.doctor_id == request.doctor_id, TimeSlot.date == BOOK_DAY,
+            TimeSlot.start_time == request.time, TimeSlot.is_booked == False,
+        ))
+        if not available_slot:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="This time slot has already been booked.")
+        available_slot.is_booked = True
+        new_appointment = Appointment(patient_id=current_user.id, doctor_id=request.doctor_id, timeslot_id=available_slot.id,
+                                      appointment_date=BOOK_DAY, status=AppointmentStatus.PENDING)
+        db.add(new_appointment)
+        await db.commit()
+        await db.refresh(new_appointment)
+        await db.refresh(available_slot)
+        return {"appointment_id": new_appointment.id}
+    except HTTPException:
+        await db.rollback()
+        raise
+    except exc.IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Booking conflict occurred.")
+    except Exception:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not process booking request.")
+
+
+main.app.add_api_route("/bench/legacy-book", legacy_book, methods=["POST"], status_code=201)
+
+
+def seed(patients: int, slots: int):
+    with SessionLocal() as db:
+        doctor = User(username="hot_doctor", email="hot_doctor@example.com", password="x", role=UserRole.doctor)
+        users = [User(username=f"patient{i}", email=f"patient{i}@example.com", password="x", role=UserRole.patient) for i in range(patients)]
+        db.add(doctor)
+        db.add_all(users)
+        db.flush()
+        times = [f"{9 + i // 2:02d}:{(i % 2) * 30:02d}" for i in range(slots)]
+        db.add_all(TimeSlot(doctor_id=doctor.id, date=BOOK_DAY, start_time=t, is_booked=False) for t in times)
+        db.commit()
+        tokens = [
+            create_jwt_token(data={"sub": u.username, "role": u.role.value, "user_id": u.id, "tv": u.token_version})
+            for u in users
+        ]
+        return doctor.id, times, tokens
+
+
+def reset_slots(doctor_id: int):
+    with SessionLocal() as db:
+        db.execute(delete(Appointment))
+        db.execute(update(TimeSlot).where(TimeSlot.doctor_id == doctor_id).values(is_booked=False))
+        db.commit()
+
+
+def double_bookings() -> int:
+    with SessionLocal() as db:
+        booked_slots = db.scalar(select(func.count()).select_from(TimeSlot).where(TimeSlot.is_booked == True))
+        appointments = db.scalar(select(func.count()).select_from(Appointment))
+        return appointments - booked_slots
+
+
+async def run_round(client, path, doctor_id, times, tokens, wins, conflicts, codes):
+    async def book(i: int):
+        body = {"doctor_id": doctor_id, "date": BOOK_DAY.isoformat(), "time": times[i % len(times)]}
+        started = time.perf_counter()
+        response = await client.post(path, json=body, headers={"Authorization": f"Bearer {tokens[i]}"})
+        latency = time.perf_counter() - started
+        codes[response.status_code] += 1
+        if response.status_code == 409 and response.json()["detail"].startswith("Booking conflict"):
+            codes["409 via IntegrityError"] += 1 # Raced past the availability check, undone by the unique constraint
+        (wins if response.status_code == 201 else conflicts).append(latency)
+
+    reset_slots(doctor_id)
+    with Timer() as timer:
+        await asyncio.gather(*(book(i) for i in range(len(tokens))))
+    return timer.elapsed
+
+
+async def bench(bookings: int, slots: int, rounds: int):
+    doctor_id, times, tokens = seed(bookings, slots)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{bookings} concurrent bookings over {slots} hot slots, {rounds} rounds")
+        for label, path in (("before: select then update", "/bench/legacy-book"), ("after: conditional UPDATE", "/appointments/book")):
+            await run_round(client, path, doctor_id, times, tokens[:slots * 2], [], [], Counter()) # warm-up
+            wins, conflicts, codes = [], [], Counter()
+            elapsed, doubled = 0.0, 0
+            for _ in range(rounds):
+                elapsed += await run_round(client, path, doctor_id, times, tokens, wins, conflicts, codes)
+                doubled += double_bookings()
+            summarize(f"{label} (all)", wins + conflicts, elapsed)
+            summarize("  booked (201)", wins, elapsed)
+            summarize("  rejected", conflicts, elapsed)
+            print(f"{'':<32} status codes {dict(codes)}, double bookings: {doubled}")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, default=200, help="Concurrent booking requests per round (one patient each)")
+    parser.add_argument("--slots", type=int, default=4, help="Number of hot slots they compete for")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(bench(args.bookings, args.slots, args.rounds))
@@ -0,0 +1,120 @@
+# backend/benchmarks/bench_doctor_directory.py
+"""
+GET /appointments/doctors with a few thousand doctors: the previous implementation (every
+doctor with joinedload of the profile, Pydantic objects rebuilt per call, mounted here as
+/bench/legacy-doctors) vs the cached, paginated directory.
+
+    cache miss     one page, cache cleared before every request
+    cache hit      one page from the cache
+    revalidate     If-None-Match with the page's ETag (304, empty body)
+    full list      every page of ?limit=200 (what request-appointment.html does), cached
+    specialty      ?specialty= one of 20 specialties, cached
+
+    python -m benchmarks.bench_doctor_directory --doctors 3000 --requests 200
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import use_temp_database, summarize, Timer
+
+use_temp_database()
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from typing import List
+
+import main
+from database import SessionLocal, dispose_engines, create_db_tables
+from doctor_directory_cache import doctor_directory_cache
+from models import DoctorProfile, User, UserRole
+from routers.appointments import Doctor, DoctorProfileInfo, read_db_dependency
+
+create_db_tables() # Tables, indexes and search index in the temp database
+
+SPECIALTIES = [f"Specialty {i}" for i in range(20)]
+
+
+async def legacy_doctors(db: read_db_dependency):
+    """The old flow: all doctors with their profiles, response objects built one by one."""
+    doctors = (await db.scalars(select(User).options(joinedload(User.doctor_profile)).where(
+        User.role == UserRole.doctor).order_by(User.username))).all()
+    return [
+        Doctor(id=doc.id, username=doc.username,
+               profile=DoctorProfileInfo.model_validate(doc.doctor_profile) if doc.doctor_profile else None)
+        for doc in doctors
+    ]
+
+
+main.app.add_api_route("/bench/legacy-doctors", legacy_doctors, methods=["GET"], response_model=List[Doctor])
+
+
+def seed(doctors: int):
+    rng = random.Random(21)
+    with SessionLocal() as db:
+        users = [User(username=f"doctor{i:05d}", email=f"doctor{i}@example.com", password="x", role=UserRole.doctor) for i in range(doctors)]
+        db.add_all(users)
+        db.flush()
+        db.add_all(
+            DoctorProfile(user_id=u.id, full_name=f"Dr {u.username}", specialty=rng.choice(SPECIALTIES),
+                          years_experience=rng.randrange(1, 40), about_me="Experienced clinician. " * rng.randrange(1, 8))
+            for u in users[: doctors * 9 // 10] # Some doctors have no profile yet
+        )
+        db.commit()
+
+
+async def fetch_all_pages(client) -> list:
+    rows, cursor = [], None
+    while True:
+        response = await client.get("/appointments/doctors", params={"limit": 200, **({"cursor": cursor} if cursor else {})})
+        response.raise_for_status()
+        rows += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return rows
+
+
+async def bench(doctors: int, requests: int):
+    seed(doctors)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{doctors} doctors, {requests} requests per mode")
+        assert (await client.get("/bench/legacy-doctors")).json() == await fetch_all_pages(client), "directories differ"
+        etag = (await client.get("/appointments/doctors")).headers["ETag"]
+
+        async def miss():
+            doctor_directory_cache.invalidate()
+            return await client.get("/appointments/doctors")
+
+        modes = (
+            ("before: whole list", lambda: client.get("/bench/legacy-doctors")),
+            ("after: cache miss", miss),
+            ("after: cache hit", lambda: client.get("/appointments/doctors")),
+            ("after: revalidate (304)", lambda: client.get("/appointments/doctors", headers={"If-None-Match": etag})),
+            ("after: full list", lambda: fetch_all_pages(client)),
+            ("after: specialty", lambda: client.get("/appointments/doctors", params={"specialty": random.choice(SPECIALTIES)})),
+        )
+        for label, request in modes:
+            latencies = []
+            with Timer() as timer:
+                for _ in range(requests):
+                    started = time.perf_counter()
+                    result = await request()
+                    latencies.append(time.perf_counter() - started)
+            summarize(label, latencies, timer.elapsed)
+            if isinstance(result, list):
+                print(f"{'':<32} {len(result)} doctors")
+            else:
+                print(f"{'':<32} {result.status_code}, {len(result.json()) if result.content else 0} doctors, {len(result.content) // 1024} KiB")
+        print(f"{'':<32} cache: {doctor_directory_cache.stats()}")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doctors", type=int, default=3000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(bench(args.doctors, args.requests))
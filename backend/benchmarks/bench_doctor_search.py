@@ -0,0 +1,143 @@
+# backend/benchmarks/bench_doctor_search.py
+"""
+GET /appointments/doctors/search over 50k doctors: the full-text index (FTS5 here) vs the
+obvious alternative without one, case-insensitive LIKE '%word%' over the four profile fields
+(mounted here as /bench/like-search), which has to scan every profile.
+
+    rare word       a surname shared by a handful of doctors
+    common word     a specialty word matching ~5% of doctors
+    two words       specialty + city from the bio
+    prefix          a partial word, as typed into a search box
+
+Also reports the time to insert the profiles with the sync triggers in place, a profile update
+and SQLite's plan for the search query.
+
+    python -m benchmarks.bench_doctor_search --doctors 50000 --requests 100
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import List
+
+from benchmarks.common import use_temp_database, summarize, Timer
+
+use_temp_database()
+
+import httpx
+from fastapi import Query
+from sqlalchemy import and_, insert, or_, select, text, update
+
+import main
+from database import SessionLocal, dispose_engines, engine, create_db_tables
+from doctor_search import doctor_search_query, search_terms
+from models import DoctorProfile, User, UserRole
+from routers.appointments import DoctorProfileInfo, DoctorSearchResult, read_db_dependency
+
+create_db_tables() # Tables, indexes and search index in the temp database
+
+SPECIALTIES = ["Cardiology", "Dermatology", "Neurology", "Oncology", "Pediatrics", "Psychiatry", "Orthopedics", "Radiology",
+               "Endocrinology", "Gastroenterology", "Nephrology", "Pulmonology", "Rheumatology", "Urology", "Ophthalmology",
+               "Otolaryngology", "Hematology", "Geriatrics", "Allergy", "Immunology"]
+CITIES = ["Chennai", "Mumbai", "Delhi", "Bangalore", "Hyderabad", "Kolkata", "Pune", "Jaipur", "Kochi", "Madurai"]
+FIRST = ["Asha", "Ravi", "Meera", "Arjun", "Priya", "Vikram", "Lakshmi", "Karthik", "Divya", "Suresh"]
+SURNAMES = [f"Surname{i:04d}" for i in range(5000)]
+SEARCHES = {
+    "rare word": "surname0042",
+    "common word": "neurology",
+    "two words": "cardiology chennai",
+    "prefix": "derma",
+}
+
+
+async def like_search(db: read_db_dependency, q: str = Query(...), limit: int = Query(20)):
+    """Every word somewhere in one of the four fields, case-insensitively; no ranking beyond name order."""
+    fields = (DoctorProfile.full_name, DoctorProfile.specialty, DoctorProfile.qualifications, DoctorProfile.about_me)
+    conditions = [or_(*(field.ilike(f"%{term}%") for field in fields)) for term in search_terms(q)]
+    rows = (await db.execute(select(User.id, User.username, DoctorProfile.full_name, DoctorProfile.specialty,
+                                    DoctorProfile.years_experience, DoctorProfile.about_me)
+                             .join(DoctorProfile, DoctorProfile.user_id == User.id)
+                             .where(User.role == UserRole.doctor, and_(*conditions)).order_by(DoctorProfile.full_name).limit(limit))).all()
+    return [
+        DoctorSearchResult(id=row.id, username=row.username, full_name=row.full_name, score=0.0,
+                           profile=DoctorProfileInfo(specialty=row.specialty, years_experience=row.years_experience, about_me=row.about_me))
+        for row in rows
+    ]
+
+
+main.app.add_api_route("/bench/like-search", like_search, methods=["GET"], response_model=List[DoctorSearchResult])
+
+
+def seed(doctors: int) -> float:
+    rng = random.Random(22)
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"username": f"doctor{i:06d}", "email": f"doctor{i}@example.com", "password": "x", "role": UserRole.doctor}
+            for i in range(doctors)
+        ])
+        ids = db.scalars(select(User.id).order_by(User.id)).all()
+        profiles = [
+            {
+                "user_id": user_id,
+                "full_name": f"Dr {rng.choice(FIRST)} {rng.choice(SURNAMES)}",
+                "specialty": rng.choice(SPECIALTIES),
+                "qualifications": rng.choice(["MBBS, MD", "MBBS, MS", "MBBS, DNB", "MBBS, MD, DM"]),
+                "about_me": f"Practising in {rng.choice(CITIES)} for {rng.randrange(2, 35)} years. "
+                            + " ".join(rng.choice(["Patient-centred", "evidence-based", "care", "with", "a", "focus", "on",
+                                                   "prevention", "and", "follow-up", "telemedicine", "clinics"]) for _ in range(30)),
+                "is_complete": True,
+            }
+            for user_id in ids
+        ]
+        started = time.perf_counter()
+        db.execute(insert(DoctorProfile), profiles) # The triggers index every row as it is inserted
+        db.commit()
+        return time.perf_counter() - started
+
+
+def explain_search():
+    query = doctor_search_query("sqlite", search_terms(SEARCHES["two words"]), [DoctorProfile.user_id]).limit(20)
+    compiled = query.compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as conn:
+        for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all():
+            print(f"{'':<32} plan: {row[-1]}")
+
+
+def time_profile_updates(count: int) -> float:
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        for user_id in range(1, count + 1):
+            db.execute(update(DoctorProfile).where(DoctorProfile.user_id == user_id).values(about_me=f"Now also consulting online ({user_id})."))
+            db.commit()
+        return (time.perf_counter() - started) / count
+
+
+async def bench(doctors: int, requests: int):
+    insert_seconds = seed(doctors)
+    print(f"{doctors} doctor profiles inserted and indexed in {insert_seconds:.2f} s, {requests} requests per search")
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, q in SEARCHES.items():
+            for label, path in (("before: LIKE scan", "/bench/like-search"), ("after: full-text", "/appointments/doctors/search")):
+                (await client.get(path, params={"q": q})).raise_for_status() # warm-up
+                latencies = []
+                with Timer() as timer:
+                    for _ in range(requests):
+                        started = time.perf_counter()
+                        response = await client.get(path, params={"q": q})
+                        latencies.append(time.perf_counter() - started)
+                        response.raise_for_status()
+                summarize(f"{label}: {name}", latencies, timer.elapsed)
+                top = response.json()[0] if response.json() else None
+                print(f"{'':<32} {len(response.json())} results for {q!r}, first: {top and (top['full_name'], top['profile']['specialty'])}")
+    print(f"{'':<32} profile update incl. index sync: {time_profile_updates(200) * 1000:.2f} ms")
+    explain_search()
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doctors", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(bench(args.doctors, args.requests))
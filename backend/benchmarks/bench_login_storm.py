@@ -0,0 +1,83 @@
+# backend/benchmarks/bench_login_storm.py
+"""
+p99 latency of an unrelated endpoint (GET /appointments/doctors) while a storm of
+logins is in flight, with password hashing inline on the event loop vs on the hashing pool.
+
+    python -m benchmarks.bench_login_storm --logins 40 --workers 4
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import use_temp_database, summarize, Timer
+
+use_temp_database()
+
+import httpx
+from werkzeug.security import generate_password_hash
+
+import main
+from database import SessionLocal, dispose_engines, create_db_tables
+from hashing import PasswordHasher
+from models import User, UserRole
+from routers import auth
+
+create_db_tables() # Tables, indexes and search index in the temp database
+
+USERNAME, PASSWORD = "storm_user", "storm-password"
+
+
+def seed_user():
+    with SessionLocal() as db:
+        db.add(User(username=USERNAME, email="storm@example.com", password=generate_password_hash(PASSWORD), role=UserRole.patient))
+        db.commit()
+
+
+async def run_storm(client: httpx.AsyncClient, logins: int, probe_interval: float):
+    probe_latencies = []
+    storm_done = asyncio.Event()
+
+    async def login():
+        response = await client.post("/auth/login", data={"username": USERNAME, "password": PASSWORD})
+        response.raise_for_status()
+
+    async def probe():
+        while not storm_done.is_set():
+            start = time.perf_counter()
+            (await client.get("/appointments/doctors")).raise_for_status()
+            probe_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(probe_interval)
+
+    prober = asyncio.create_task(probe())
+    with Timer() as timer:
+        await asyncio.gather(*(login() for _ in range(logins)))
+    storm_done.set()
+    await prober
+    return probe_latencies, timer.elapsed
+
+
+async def bench(logins: int, workers: int, probe_interval: float):
+    seed_user()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{logins} concurrent logins, probing /appointments/doctors every {probe_interval * 1000:.0f} ms")
+        for label, hasher in (
+            ("before: inline hashing", PasswordHasher(kind="inline")),
+            (f"after: thread pool x{workers}", PasswordHasher(kind="thread", workers=workers, max_queue=logins)),
+        ):
+            auth.password_hasher = hasher
+            await run_storm(client, 2, probe_interval) # warm-up
+            latencies, elapsed = await run_storm(client, logins, probe_interval)
+            summarize(f"{label} (probe)", latencies, elapsed)
+            print(f"{'':<32} storm finished in {elapsed * 1000:.0f} ms")
+            hasher.shutdown()
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--probe-interval", type=float, default=0.005, help="Seconds between probe requests")
+    args = parser.parse_args()
+    asyncio.run(bench(args.logins, args.workers, args.probe_interval))
@@ -0,0 +1,96 @@
+# backend/benchmarks/bench_mail_queue.py
+"""
+Forgot-password email: a fresh SMTP connection per mail inside the request (old send_email)
+vs enqueueing for the background MailQueue worker that reuses one connection.
+
+Uses a local aiosmtpd server as the SMTP stand-in (pip install aiosmtpd); add
+--delay-ms to simulate the handshake/login latency of a remote provider.
+
+    python -m benchmarks.bench_mail_queue --mails 200 --delay-ms 20
+"""
+import argparse
+import asyncio
+import smtplib
+import time
+from email.message import EmailMessage
+
+from benchmarks.common import summarize, Timer
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError: # Benchmark-only dependency
+    raise SystemExit("This benchmark needs aiosmtpd: pip install aiosmtpd")
+
+from mailer import MailQueue
+
+HOST, PORT = "127.0.0.1", 8025
+
+
+class CountingHandler:
+    def __init__(self, delay_s: float):
+        self.delay_s = delay_s
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        # Connection setup cost (TLS + auth on a real provider) is paid per connection
+        await asyncio.sleep(self.delay_s)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def send_direct(index: int):
+    """What send_email used to do for every mail: connect, (login), send, quit."""
+    msg = EmailMessage()
+    msg.set_content(f"Your OTP is: {index:06d}")
+    msg['Subject'] = "Password Reset OTP"
+    msg['From'] = "noreply@example.com"
+    msg['To'] = f"user{index}@example.com"
+    with smtplib.SMTP(HOST, PORT) as smtp:
+        smtp.send_message(msg)
+
+
+async def main(mails: int, delay_ms: float):
+    handler = CountingHandler(delay_ms / 1000)
+    controller = Controller(handler, hostname=HOST, port=PORT)
+    controller.start()
+    try:
+        print(f"{mails} mails, simulated connection setup {delay_ms:.0f} ms")
+
+        # Before: the request itself waits for the whole SMTP exchange (and blocks the loop)
+        latencies = []
+        with Timer() as timer:
+            for i in range(mails):
+                start = time.perf_counter()
+                send_direct(i) # Inline, exactly like the old handler (the server runs on its own thread)
+                latencies.append(time.perf_counter() - start)
+        summarize("before: request latency", latencies, timer.elapsed)
+        print(f"{'':<32} delivered {mails} in {timer.elapsed * 1000:.0f} ms")
+
+        # After: the request only enqueues; delivery happens in the background over one connection
+        queue = MailQueue(host=HOST, port=PORT, security="none", password="", sender="noreply@example.com", max_size=mails)
+        queue.start()
+        delivered_before = handler.received
+        latencies = []
+        with Timer() as timer:
+            for i in range(mails):
+                start = time.perf_counter()
+                queue.enqueue(f"user{i}@example.com", "Password Reset OTP", f"Your OTP is: {i:06d}")
+                latencies.append(time.perf_counter() - start)
+            await queue.stop(drain_timeout=120)
+        summarize("after: request latency", latencies, timer.elapsed)
+        print(f"{'':<32} delivered {handler.received - delivered_before} in {timer.elapsed * 1000:.0f} ms "
+              f"using {queue.stats()['connections']} connection(s), {queue.stats()['batches']} batches")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mails", type=int, default=200)
+    parser.add_argument("--delay-ms", type=float, default=20.0, help="Simulated per-connection setup latency")
+    args = parser.parse_args()
+    asyncio.run(main(args.mails, args.delay_ms))
@@ -0,0 +1,146 @@
+# backend/benchmarks/bench_patient_roster.py
+"""
+GET /appointments/my-confirmed-patients for a doctor with thousands of confirmed appointments:
+loading every appointment with its patient and de-duplicating in Python (mounted here as
+/bench/legacy-roster) vs the single grouped query paged in SQL.
+
+    first page   the default page (100 patients by name)
+    by visits    ?sort=visits&order=desc
+    full roster  every page of ?limit=500, following X-Next-Cursor (what the pages do)
+
+Also prints SQLite's plan for the grouped query.
+
+    python -m benchmarks.bench_patient_roster --appointments 20000 --patients 2000 --requests 100
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+from typing import Annotated, List
+
+from benchmarks.common import use_temp_database, summarize, Timer
+
+use_temp_database()
+
+import httpx
+from fastapi import Depends
+from sqlalchemy import select, text
+from sqlalchemy.orm import joinedload
+
+import main
+from database import SessionLocal, dispose_engines, engine, create_db_tables
+from models import Appointment, AppointmentStatus, PatientProfile, TimeSlot, User, UserRole
+from routers.appointments import MAX_ROSTER_PAGE_SIZE, ROSTER_STATUSES, RosterPatient, read_db_dependency
+from routers.auth import create_jwt_token, get_current_doctor
+
+create_db_tables() # Tables, indexes and search index in the temp database
+
+
+async def legacy_roster(db: read_db_dependency, current_doctor: Annotated[User, Depends(get_current_doctor)]):
+    """Every confirmed appointment with its patient, grouped per patient in Python."""
+    appointments = (await db.scalars(select(Appointment).options(
+        joinedload(Appointment.patient).joinedload(User.patient_profile)
+    ).where(Appointment.doctor_id == current_doctor.id, Appointment.status.in_(ROSTER_STATUSES)))).all()
+    today, roster = date.today(), {}
+    for appt in appointments:
+        entry = roster.setdefault(appt.patient_id, {
+            "id": appt.patient_id, "username": appt.patient.username, "visit_count": 0, "last_visit": None, "next_visit": None,
+            "full_name": appt.patient.patient_profile.full_name if appt.patient.patient_profile else None,
+        })
+        entry["visit_count"] += 1
+        if appt.appointment_date < today:
+            entry["last_visit"] = max(filter(None, (entry["last_visit"], appt.appointment_date)))
+        else:
+            entry["next_visit"] = min(filter(None, (entry["next_visit"], appt.appointment_date)))
+    return sorted(roster.values(), key=lambda entry: ((entry["full_name"] or entry["username"]).lower(), entry["id"]))
+
+
+main.app.add_api_route("/bench/legacy-roster", legacy_roster, methods=["GET"], response_model=List[RosterPatient])
+
+
+def token_for(user: User) -> str:
+    return create_jwt_token(data={"sub": user.username, "role": user.role.value, "user_id": user.id, "tv": user.token_version})
+
+
+def seed(appointments: int, patients: int):
+    rng = random.Random(20)
+    today = date.today()
+    with SessionLocal() as db:
+        doctor = User(username="family_doctor", email="family_doctor@example.com", password="x", role=UserRole.doctor)
+        users = [User(username=f"patient{i}", email=f"patient{i}@example.com", password="x", role=UserRole.patient) for i in range(patients)]
+        db.add(doctor)
+        db.add_all(users)
+        db.flush()
+        db.add_all(PatientProfile(user_id=u.id, full_name=f"Patient {rng.randrange(10 ** 6):06d}") for u in users[::2])
+        slots = [
+            TimeSlot(doctor_id=doctor.id, date=today + timedelta(days=i // 20 - appointments // 25), start_time=f"{8 + (i % 20) // 2:02d}:{(i % 2) * 30:02d}", is_booked=True)
+            for i in range(appointments)
+        ]
+        db.add_all(slots)
+        db.flush()
+        statuses = (AppointmentStatus.CONFIRMED, AppointmentStatus.COMPLETED, AppointmentStatus.REJECTED)
+        db.add_all(
+            Appointment(patient_id=rng.choice(users).id, doctor_id=doctor.id, timeslot_id=slot.id, appointment_date=slot.date,
+                        status=rng.choices(statuses, weights=(60, 30, 10))[0])
+            for slot in slots
+        )
+        db.commit()
+        return token_for(doctor)
+
+
+def explain_roster():
+    plan = ("EXPLAIN QUERY PLAN SELECT appointments.patient_id, users.username, patient_profiles.full_name, count(appointments.id), "
+            "max(appointments.appointment_date) FROM appointments JOIN users ON users.id = appointments.patient_id "
+            "LEFT OUTER JOIN patient_profiles ON patient_profiles.user_id = appointments.patient_id "
+            "WHERE appointments.doctor_id = 1 AND appointments.status IN ('CONFIRMED', 'COMPLETED') "
+            "GROUP BY appointments.patient_id, users.username, patient_profiles.full_name LIMIT 101")
+    with engine.connect() as conn:
+        for row in conn.execute(text(plan)).all():
+            print(f"{'':<32} plan: {row[-1]}")
+
+
+async def fetch_all_pages(client, path: str, headers: dict) -> list:
+    rows, cursor = [], None
+    while True:
+        response = await client.get(path, params={"limit": MAX_ROSTER_PAGE_SIZE, **({"cursor": cursor} if cursor else {})}, headers=headers)
+        response.raise_for_status()
+        rows += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return rows
+
+
+async def bench(appointments: int, patients: int, requests: int):
+    headers = {"Authorization": f"Bearer {seed(appointments, patients)}"}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"doctor with {appointments} appointments from {patients} patients, {requests} requests per mode")
+        legacy = (await client.get("/bench/legacy-roster", headers=headers)).json()
+        paged = await fetch_all_pages(client, "/appointments/my-confirmed-patients", headers)
+        assert legacy == paged, "rosters differ"
+        modes = (
+            ("first page", lambda: client.get("/appointments/my-confirmed-patients", headers=headers)),
+            ("by visits", lambda: client.get("/appointments/my-confirmed-patients", params={"sort": "visits", "order": "desc"}, headers=headers)),
+            ("full roster", lambda: fetch_all_pages(client, "/appointments/my-confirmed-patients", headers)),
+        )
+        for label, request in (("before: dedupe in Python", lambda: client.get("/bench/legacy-roster", headers=headers)),) + modes:
+            latencies = []
+            with Timer() as timer:
+                for _ in range(requests):
+                    started = time.perf_counter()
+                    result = await request()
+                    latencies.append(time.perf_counter() - started)
+            summarize(label if label.startswith("before") else f"after: {label}", latencies, timer.elapsed)
+            print(f"{'':<32} {len(result if isinstance(result, list) else result.json())} patients")
+    explain_roster()
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--appointments", type=int, default=20000, help="Appointments of the doctor")
+    parser.add_argument("--patients", type=int, default=2000, help="Distinct patients they are spread over")
+    parser.add_argument("--requests", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(bench(args.appointments, args.patients, args.requests))
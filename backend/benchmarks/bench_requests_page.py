@@ -0,0 +1,140 @@
+# backend/benchmarks/bench_requests_page.py
+"""
+GET /appointments/requests for a doctor with thousands of appointment requests: the previous
+implementation (every request as full ORM objects with eager loads, mounted here as
+/bench/legacy-requests) vs one column-projected page from the keyset index.
+
+    first page   the default page (newest 50)
+    deep page    a page far down the list, reached via ?cursor=
+    pending      ?status=PENDING (the filter the previous version silently ignored)
+
+Also prints SQLite's plan for a cursor page.
+
+    python -m benchmarks.bench_requests_page --appointments 10000 --requests 200
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import Annotated, List, Optional
+
+from benchmarks.common import use_temp_database, summarize, Timer
+
+use_temp_database()
+
+import httpx
+from fastapi import Depends, Query
+from sqlalchemy import select, text
+from sqlalchemy.orm import joinedload
+
+import main
+from database import SessionLocal, dispose_engines, engine, create_db_tables
+from models import Appointment, AppointmentStatus, TimeSlot, User, UserRole
+from routers.appointments import AppointmentRequestDetails, Doctor, PatientInfo, read_db_dependency
+from routers.auth import create_jwt_token, get_current_doctor
+
+create_db_tables() # Tables, indexes and search index in the temp database
+
+PATIENTS = 300
+
+
+async def legacy_requests(db: read_db_dependency, current_doctor: Annotated[User, Depends(get_current_doctor)], status: Optional[str] = Query(None)):
+    """The old flow: all of the doctor's requests, loaded with patient and time slot."""
+    query = select(Appointment).where(Appointment.doctor_id == current_doctor.id)
+    if status:
+        try:
+            query = query.where(Appointment.status == AppointmentStatus(status.upper()))
+        except ValueError:
+            pass
+    appointments = (await db.scalars(query.options(
+        joinedload(Appointment.patient), joinedload(Appointment.time_slot)
+    ).order_by(Appointment.created_at.desc()))).all()
+    return [
+        AppointmentRequestDetails(
+            id=appt.id, appointment_date=appt.appointment_date, status=appt.status, created_at=appt.created_at,
+            patient=PatientInfo.model_validate(appt.patient), start_time=appt.time_slot.start_time,
+            doctor=Doctor.model_validate(current_doctor),
+        )
+        for appt in appointments
+    ]
+
+
+main.app.add_api_route("/bench/legacy-requests", legacy_requests, methods=["GET"], response_model=List[AppointmentRequestDetails])
+
+
+def token_for(user: User) -> str:
+    return create_jwt_token(data={"sub": user.username, "role": user.role.value, "user_id": user.id, "tv": user.token_version})
+
+
+def seed(appointments: int):
+    rng = random.Random(19)
+    today = date.today()
+    created = datetime(2024, 1, 1)
+    with SessionLocal() as db:
+        doctor = User(username="popular_doctor", email="popular_doctor@example.com", password="x", role=UserRole.doctor)
+        patients = [User(username=f"patient{i}", email=f"patient{i}@example.com", password="x", role=UserRole.patient) for i in range(PATIENTS)]
+        db.add(doctor)
+        db.add_all(patients)
+        db.flush()
+        slots = [
+            TimeSlot(doctor_id=doctor.id, date=today + timedelta(days=i // 20 - 300), start_time=f"{8 + (i % 20) // 2:02d}:{(i % 2) * 30:02d}", is_booked=True)
+            for i in range(appointments)
+        ]
+        db.add_all(slots)
+        db.flush()
+        statuses = (AppointmentStatus.CONFIRMED, AppointmentStatus.REJECTED, AppointmentStatus.PENDING)
+        db.add_all(
+            Appointment(patient_id=patients[i % PATIENTS].id, doctor_id=doctor.id, timeslot_id=slot.id, appointment_date=slot.date,
+                        status=rng.choices(statuses, weights=(70, 20, 10))[0], created_at=created + timedelta(minutes=17 * i))
+            for i, slot in enumerate(slots)
+        )
+        db.commit()
+        # Cursor for a page about 80% of the way down the list
+        deep_cursor = db.scalar(select(Appointment.id).order_by(Appointment.created_at.desc(), Appointment.id.desc()).offset(appointments * 4 // 5))
+        return token_for(doctor), deep_cursor
+
+
+def explain_page():
+    plan = ("EXPLAIN QUERY PLAN SELECT appointments.id FROM appointments JOIN time_slots ON time_slots.id = appointments.timeslot_id "
+            "JOIN users ON users.id = appointments.patient_id WHERE appointments.doctor_id = 1 "
+            "AND (appointments.created_at, appointments.id) < ((SELECT created_at FROM appointments WHERE id = 500), 500) "
+            "ORDER BY appointments.created_at DESC, appointments.id DESC LIMIT 51")
+    with engine.connect() as conn:
+        for row in conn.execute(text(plan)).all():
+            print(f"{'':<32} plan: {row[-1]}")
+
+
+async def bench(appointments: int, requests: int):
+    token, deep_cursor = seed(appointments)
+    headers = {"Authorization": f"Bearer {token}"}
+    modes = (
+        ("first page", "/bench/legacy-requests", "/appointments/requests", {}),
+        ("deep page", "/bench/legacy-requests", "/appointments/requests", {"cursor": deep_cursor}),
+        ("pending", "/bench/legacy-requests", "/appointments/requests", {"status": "PENDING"}),
+    )
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"doctor with {appointments} appointment requests, {requests} requests per mode")
+        for mode, legacy_path, path, params in modes:
+            for label, url, query in (("before", legacy_path, {k: v for k, v in params.items() if k == "status"}), ("after", path, params)):
+                (await client.get(url, params=query, headers=headers)).raise_for_status() # warm-up
+                latencies = []
+                with Timer() as timer:
+                    for _ in range(requests):
+                        started = time.perf_counter()
+                        response = await client.get(url, params=query, headers=headers)
+                        latencies.append(time.perf_counter() - started)
+                        response.raise_for_status()
+                summarize(f"{label}: {mode}", latencies, timer.elapsed)
+                print(f"{'':<32} {len(response.json())} rows, {len(response.content) // 1024} KiB, {response.headers['X-DB-Query-Count']} SQL statements")
+    explain_page()
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--appointments", type=int, default=10000, help="Appointment requests of the doctor")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(bench(args.appointments, args.requests))
@@ -0,0 +1,120 @@
+# backend/benchmarks/bench_schedule_save.py
+"""
+PUT /appointments/schedule for a 96-slot day (every 15 minutes): per-slot checks and inserts
+(the previous implementation, mounted here as /bench/legacy-schedule) vs the set-based diff
+with bulk DELETE/INSERT.
+
+    new day     96 slots on an empty date
+    replace     a day of 96 slots swapped for 96 different times (96 deletes + 96 inserts)
+    unchanged   the same 96 slots saved again
+
+Reports latency and the SQL statements per save (X-DB-Query-Count).
+
+    python -m benchmarks.bench_schedule_save --saves 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Annotated
+
+from benchmarks.common import use_temp_database, summarize
+
+use_temp_database()
+
+import httpx
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import delete, func, select
+
+import main
+from database import SessionLocal, dispose_engines, create_db_tables
+from models import Appointment, TimeSlot, User, UserRole
+from routers.appointments import ScheduleSaveRequest, db_dependency
+from routers.auth import create_jwt_token, get_current_doctor
+
+create_db_tables() # Tables, indexes and search index in the temp database
+
+GRID = [f"{m // 60:02d}:{m % 60:02d}" for m in range(0, 24 * 60, 15)] # 96 slots
+SHIFTED = [f"{m // 60:02d}:{m % 60:02d}" for m in range(5, 24 * 60, 15)] # 96 other times
+
+
+async def legacy_save(schedule_request: ScheduleSaveRequest, db: db_dependency, current_doctor: Annotated[User, Depends(get_current_doctor)]):
+    """The old flow: one appointment lookup per removed slot, slots added one object at a time."""
+    target_date = schedule_request.date
+    existing_slots_on_day = (await db.scalars(select(TimeSlot).where(
+        TimeSlot.doctor_id == current_doctor.id, TimeSlot.date == target_date))).all()
+    new_schedule_start_times = {slot.start_time for slot in schedule_request.slots}
+    slots_to_actually_delete_ids = []
+    for es in existing_slots_on_day:
+        if es.start_time not in new_schedule_start_times:
+            if await db.scalar(select(Appointment.id).where(Appointment.timeslot_id == es.id)):
+                await db.rollback()
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Slot has an appointment.")
+            slots_to_actually_delete_ids.append(es.id)
+    if slots_to_actually_delete_ids:
+        await db.execute(delete(TimeSlot).where(TimeSlot.id.in_(slots_to_actually_delete_ids)).execution_options(synchronize_session=False))
+    final_existing_slot_times = {es.start_time for es in existing_slots_on_day if es.id not in slots_to_actually_delete_ids}
+    db.add_all(
+        TimeSlot(start_time=slot.start_time, date=target_date, doctor_id=current_doctor.id, is_booked=False)
+        for slot in schedule_request.slots if slot.start_time not in final_existing_slot_times
+    )
+    await db.commit()
+    final_slots_count = await db.scalar(select(func.count(TimeSlot.id)).where(
+        TimeSlot.doctor_id == current_doctor.id, TimeSlot.date == target_date))
+    return {"slots_in_schedule": final_slots_count}
+
+
+main.app.add_api_route("/bench/legacy-schedule", legacy_save, methods=["PUT"])
+
+
+def seed_doctor() -> str:
+    with SessionLocal() as db:
+        doctor = User(username="busy_doctor", email="busy_doctor@example.com", password="x", role=UserRole.doctor)
+        db.add(doctor)
+        db.commit()
+        return create_jwt_token(data={"sub": doctor.username, "role": doctor.role.value, "user_id": doctor.id, "tv": doctor.token_version})
+
+
+async def run_mode(client, path: str, headers: dict, mode: str, saves: int, first_day: date):
+    latencies, queries = [], []
+    started_all = time.perf_counter()
+    for i in range(saves):
+        if mode == "new day":
+            day, times = first_day + timedelta(days=i), GRID
+        else:
+            day = first_day
+            times = SHIFTED if (mode == "replace" and i % 2 == 0) else GRID
+        body = {"date": day.isoformat(), "slots": [{"start_time": t} for t in times]}
+        started = time.perf_counter()
+        response = await client.put(path, json=body, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+        assert response.json()["slots_in_schedule"] == len(GRID), response.text
+        queries.append(int(response.headers["X-DB-Query-Count"]))
+    return latencies, time.perf_counter() - started_all, queries
+
+
+async def bench(saves: int):
+    token = seed_doctor()
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{saves} saves of a {len(GRID)}-slot day per mode")
+        start = date.today() + timedelta(days=30)
+        for offset, mode in enumerate(("new day", "replace", "unchanged")):
+            for label, path in (("before", "/bench/legacy-schedule"), ("after", "/appointments/schedule")):
+                first_day = start + timedelta(days=offset * 1000 + (500 if label == "after" else 0))
+                if mode != "new day": # Start from a full day
+                    await client.put(path, json={"date": first_day.isoformat(), "slots": [{"start_time": t} for t in GRID]}, headers=headers)
+                latencies, elapsed, queries = await run_mode(client, path, headers, mode, saves, first_day)
+                summarize(f"{label}: {mode}", latencies, elapsed)
+                print(f"{'':<32} {statistics.mean(queries):.0f} SQL statements per save")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--saves", type=int, default=50, help="Saves per mode and implementation")
+    args = parser.parse_args()
+    asyncio.run(bench(args.saves))
@@ -0,0 +1,133 @@
+# backend/benchmarks/bench_soonest_available.py
+"""
+"Who in this specialty can see me first?" for --doctors doctors with four weeks of slots each:
+working it out from the schedules (what a client has to do today: one lookup per doctor, done
+here server-side as one query per doctor, mounted as /bench/legacy-soonest) vs
+GET /appointments/doctors/soonest reading the maintained DoctorProfile.next_free_slot_at.
+
+Also times a booking, which now also moves the doctor's next free slot on, and prints SQLite's
+plan for the soonest query.
+
+    python -m benchmarks.bench_soonest_available --doctors 2000 --requests 200
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from benchmarks.common import use_temp_database, summarize, Timer
+
+use_temp_database()
+
+import httpx
+from fastapi import Query
+from sqlalchemy import func, insert, select, text
+
+import main
+from database import SessionLocal, dispose_engines, engine, create_db_tables
+from doctor_availability import refresh_all_next_free_slots
+from models import DoctorProfile, TimeSlot, User, UserRole
+from routers.appointments import read_db_dependency
+from routers.auth import create_jwt_token
+
+create_db_tables() # Tables, indexes and search index in the temp database
+
+SPECIALTIES = [f"Specialty {i}" for i in range(20)]
+TIMES = [f"{h:02d}:{m:02d}" for h in range(9, 17) for m in (0, 30)]
+
+
+async def legacy_soonest(db: read_db_dependency, specialty: str = Query(...), limit: int = Query(10)):
+    """The doctors of the specialty, then each one's first free slot, sorted in Python."""
+    now = datetime.now(timezone.utc)
+    doctor_ids = (await db.scalars(select(DoctorProfile.user_id).where(DoctorProfile.specialty == specialty))).all()
+    soonest = []
+    for doctor_id in doctor_ids:
+        first_free = await db.scalar(select(func.min(TimeSlot.starts_at)).where(
+            TimeSlot.doctor_id == doctor_id, TimeSlot.starts_at >= now, TimeSlot.is_booked == False))
+        if first_free is not None:
+            soonest.append((first_free, doctor_id))
+    return [{"id": doctor_id, "next_free_slot_at": first_free} for first_free, doctor_id in sorted(soonest)[:limit]]
+
+
+main.app.add_api_route("/bench/legacy-soonest", legacy_soonest, methods=["GET"])
+
+
+def seed(doctors: int):
+    rng = random.Random(23)
+    first_day = date.today() + timedelta(days=1)
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"username": f"doctor{i:05d}", "email": f"doctor{i}@example.com", "password": "x", "role": UserRole.doctor}
+            for i in range(doctors)
+        ])
+        db.execute(insert(User), [{"username": "patient", "email": "patient@example.com", "password": "x", "role": UserRole.patient}])
+        ids = db.scalars(select(User.id).where(User.role == UserRole.doctor).order_by(User.id)).all()
+        db.execute(insert(DoctorProfile), [{"user_id": i, "specialty": rng.choice(SPECIALTIES), "is_complete": True} for i in ids])
+        slots = []
+        for doctor_id in ids: # Four weeks, a few working days a week, mostly booked
+            for offset in range(28):
+                if rng.random() < 0.4:
+                    day = first_day + timedelta(days=offset)
+                    slots += [{"doctor_id": doctor_id, "date": day, "start_time": t, "is_booked": rng.random() < 0.85} for t in TIMES]
+        db.execute(insert(TimeSlot), slots)
+        db.commit()
+        patient = db.scalar(select(User).where(User.username == "patient"))
+        token = create_jwt_token(data={"sub": patient.username, "role": patient.role.value, "user_id": patient.id, "tv": patient.token_version})
+    started = time.perf_counter()
+    refresh_all_next_free_slots(engine)
+    print(f"{doctors} doctors, {len(slots)} slots; next_free_slot_at computed for all in {time.perf_counter() - started:.2f} s")
+    return token
+
+
+def explain_soonest():
+    plan = ("EXPLAIN QUERY PLAN SELECT users.id FROM doctor_profiles JOIN users ON users.id = doctor_profiles.user_id "
+            "WHERE doctor_profiles.specialty = 'Specialty 3' AND doctor_profiles.next_free_slot_at >= '2000-01-01' "
+            "ORDER BY doctor_profiles.next_free_slot_at, doctor_profiles.user_id LIMIT 10")
+    with engine.connect() as conn:
+        for row in conn.execute(text(plan)).all():
+            print(f"{'':<32} plan: {row[-1]}")
+
+
+async def bench(doctors: int, requests: int):
+    token = seed(doctors)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, path in (("before: per-doctor lookups", "/bench/legacy-soonest"), ("after: next_free_slot_at", "/appointments/doctors/soonest")):
+            latencies, queries = [], 0
+            with Timer() as timer:
+                for i in range(requests):
+                    started = time.perf_counter()
+                    response = await client.get(path, params={"specialty": SPECIALTIES[i % len(SPECIALTIES)]})
+                    latencies.append(time.perf_counter() - started)
+                    response.raise_for_status()
+                    queries = max(queries, int(response.headers["X-DB-Query-Count"]))
+            summarize(label, latencies, timer.elapsed)
+            print(f"{'':<32} up to {queries} SQL statements per request")
+        legacy = (await client.get("/bench/legacy-soonest", params={"specialty": SPECIALTIES[0]})).json()
+        after = (await client.get("/appointments/doctors/soonest", params={"specialty": SPECIALTIES[0]})).json()
+        assert [d["id"] for d in legacy] == [d["id"] for d in after], "rankings differ"
+
+        # Book the soonest slot of the top doctors: each booking moves that doctor's value on
+        latencies = []
+        with Timer() as timer:
+            for doctor in after:
+                body = {"doctor_id": doctor["id"], "date": doctor["next_free_date"], "time": doctor["next_free_time"]}
+                started = time.perf_counter()
+                response = await client.post("/appointments/book", json=body, headers={"Authorization": f"Bearer {token}"})
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+        summarize("booking the soonest slot", latencies, timer.elapsed)
+        before_booking = {d["id"]: d["next_free_slot_at"] for d in after}
+        moved = (await client.get("/appointments/doctors/soonest", params={"specialty": SPECIALTIES[0], "limit": 50})).json()
+        assert all(d["next_free_slot_at"] > before_booking[d["id"]] for d in moved if d["id"] in before_booking), "next free slot not moved on"
+    explain_soonest()
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doctors", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(bench(args.doctors, args.requests))
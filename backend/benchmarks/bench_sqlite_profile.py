@@ -0,0 +1,110 @@
+# backend/benchmarks/bench_sqlite_profile.py
+"""
+Mixed read/write load on SQLite with stock settings vs the tuned profile
+(WAL, synchronous=NORMAL, busy_timeout, cache_size, mmap_size, temp_store).
+
+Worker threads each run a read-heavy mix against time_slots: schedule reads for a
+doctor/date, and writes that flip is_booked or add slots, one transaction per op.
+
+    python -m benchmarks.bench_sqlite_profile --threads 8 --seconds 5 --write-ratio 0.2
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import use_temp_database, summarize
+
+use_temp_database()
+
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import SQLITE_PRAGMAS, install_sqlite_profile
+from models import Base, TimeSlot, User, UserRole
+
+DOCTORS, DAYS, SLOTS_PER_DAY = 20, 30, 16
+
+
+def build_engine(path: str, tuned: bool):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False}, pool_size=32, max_overflow=0)
+    if tuned:
+        install_sqlite_profile(engine, SQLITE_PRAGMAS)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        doctors = [User(username=f"doc{i}", email=f"doc{i}@example.com", password="x", role=UserRole.doctor) for i in range(DOCTORS)]
+        db.add_all(doctors)
+        db.flush()
+        start = date.today()
+        db.add_all(
+            TimeSlot(doctor_id=doc.id, date=start + timedelta(days=d), start_time=f"{9 + s // 2:02d}:{(s % 2) * 30:02d}", is_booked=False)
+            for doc in doctors for d in range(DAYS) for s in range(SLOTS_PER_DAY)
+        )
+        db.commit()
+        doctor_ids = [doc.id for doc in doctors]
+    return engine, Session, doctor_ids
+
+
+def worker(Session, doctor_ids, deadline, write_ratio, latencies, errors, lock):
+    rng = random.Random()
+    today = date.today()
+    local_latencies, local_errors = [], 0
+    while time.perf_counter() < deadline:
+        doctor_id = rng.choice(doctor_ids)
+        day = today + timedelta(days=rng.randrange(DAYS))
+        started = time.perf_counter()
+        try:
+            with Session() as db:
+                if rng.random() < write_ratio:
+                    if rng.random() < 0.5:
+                        db.execute(update(TimeSlot).where(
+                            TimeSlot.doctor_id == doctor_id, TimeSlot.date == day,
+                            TimeSlot.start_time == f"{9 + rng.randrange(8):02d}:00"
+                        ).values(is_booked=~TimeSlot.is_booked))
+                    else:
+                        db.add(TimeSlot(doctor_id=doctor_id, date=day, start_time=f"{18 + rng.randrange(4):02d}:{rng.randrange(60):02d}", is_booked=False))
+                    db.commit()
+                else:
+                    db.execute(select(TimeSlot).where(
+                        TimeSlot.doctor_id == doctor_id, TimeSlot.date == day
+                    ).order_by(TimeSlot.start_time)).scalars().all()
+            local_latencies.append(time.perf_counter() - started)
+        except OperationalError: # "database is locked"
+            local_errors += 1
+    with lock:
+        latencies.extend(local_latencies)
+        errors.append(local_errors)
+
+
+def run(tuned: bool, threads: int, seconds: float, write_ratio: float):
+    path = os.path.join(tempfile.mkdtemp(prefix="easycare_sqlite_"), "profile.db")
+    engine, Session, doctor_ids = build_engine(path, tuned)
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.perf_counter() + seconds
+    pool = [threading.Thread(target=worker, args=(Session, doctor_ids, deadline, write_ratio, latencies, errors, lock)) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    label = "after: tuned profile" if tuned else "before: SQLite defaults"
+    summarize(label, latencies, elapsed)
+    print(f"{'':<32} lock errors: {sum(errors)}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+    print(f"{args.threads} threads, {args.seconds:.0f}s each, {args.write_ratio:.0%} writes")
+    run(False, args.threads, args.seconds, args.write_ratio)
+    run(True, args.threads, args.seconds, args.write_ratio)
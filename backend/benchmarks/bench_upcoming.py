@@ -0,0 +1,127 @@
+# backend/benchmarks/bench_upcoming.py
+"""
+GET /appointments/upcoming-confirmed for a doctor with thousands of past appointments:
+the previous implementation (date filter, full eager loads, mounted here as
+/bench/legacy-upcoming) vs the single starts_at-ordered query.
+
+The doctor has --history confirmed appointments spread over the past two years and a few
+upcoming ones; the patient side is measured too. Also prints SQLite's plans for the new query.
+
+    python -m benchmarks.bench_upcoming --history 5000 --requests 300
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+from typing import Annotated, Optional
+
+from benchmarks.common import use_temp_database, summarize, Timer
+
+use_temp_database()
+
+import httpx
+from fastapi import Depends
+from sqlalchemy import select, text
+from sqlalchemy.orm import joinedload
+
+import main
+from database import SessionLocal, dispose_engines, engine, create_db_tables
+from models import Appointment, AppointmentStatus, DoctorProfile, TimeSlot, User, UserRole
+from routers.appointments import AppointmentRequestDetails, Doctor, PatientInfo, read_db_dependency
+from routers.auth import create_jwt_token, get_current_active_user
+
+create_db_tables() # Tables, indexes and search index in the temp database
+
+PATIENTS, UPCOMING = 200, 10
+
+
+async def legacy_upcoming(db: read_db_dependency, current_user: Annotated[User, Depends(get_current_active_user)]):
+    """The old flow: every confirmed appointment from today on, ordered by date and HH:MM string."""
+    query = select(Appointment).join(Appointment.time_slot).options(
+        joinedload(Appointment.time_slot), joinedload(Appointment.patient), joinedload(Appointment.doctor)
+    ).where(Appointment.status == AppointmentStatus.CONFIRMED, Appointment.appointment_date >= date.today())
+    if current_user.role == UserRole.patient:
+        query = query.where(Appointment.patient_id == current_user.id)
+    else:
+        query = query.where(Appointment.doctor_id == current_user.id)
+    appt = await db.scalar(query.order_by(Appointment.appointment_date.asc(), TimeSlot.start_time.asc()))
+    if not appt:
+        return None
+    return AppointmentRequestDetails(
+        id=appt.id, appointment_date=appt.appointment_date, status=appt.status, created_at=appt.created_at,
+        patient=PatientInfo.model_validate(appt.patient), doctor=Doctor.model_validate(appt.doctor), start_time=appt.time_slot.start_time,
+    )
+
+
+main.app.add_api_route("/bench/legacy-upcoming", legacy_upcoming, methods=["GET"], response_model=Optional[AppointmentRequestDetails])
+
+
+def token_for(user: User) -> str:
+    return create_jwt_token(data={"sub": user.username, "role": user.role.value, "user_id": user.id, "tv": user.token_version})
+
+
+def seed(history: int):
+    rng = random.Random(7)
+    today = date.today()
+    with SessionLocal() as db:
+        doctor = User(username="long_serving_doctor", email="doc@example.com", password="x", role=UserRole.doctor)
+        patients = [User(username=f"patient{i}", email=f"patient{i}@example.com", password="x", role=UserRole.patient) for i in range(PATIENTS)]
+        db.add(doctor)
+        db.add_all(patients)
+        db.flush()
+        db.add(DoctorProfile(user_id=doctor.id, specialty="Cardiology", years_experience=20))
+        # Past days first, then the upcoming ones; one appointment per slot
+        days = [today - timedelta(days=rng.randrange(1, 730)) for _ in range(history)]
+        days += [today + timedelta(days=rng.randrange(1, 30)) for _ in range(UPCOMING)]
+        slots = [TimeSlot(doctor_id=doctor.id, date=d, start_time=f"{rng.randrange(8, 18):02d}:{rng.choice((0, 15, 30, 45)):02d}", is_booked=True) for d in days]
+        db.add_all(slots)
+        db.flush()
+        db.add_all(
+            Appointment(patient_id=patients[i % PATIENTS].id, doctor_id=doctor.id, timeslot_id=slot.id,
+                        appointment_date=slot.date, status=AppointmentStatus.CONFIRMED)
+            for i, slot in enumerate(slots)
+        )
+        db.commit()
+        return token_for(doctor), token_for(patients[0])
+
+
+def explain_queries():
+    base = ("EXPLAIN QUERY PLAN SELECT appointments.id FROM appointments JOIN time_slots ON time_slots.id = appointments.timeslot_id "
+            "WHERE appointments.status = 'CONFIRMED' AND time_slots.starts_at >= '2000-01-01' AND {} "
+            "ORDER BY time_slots.starts_at, time_slots.id LIMIT 1")
+    with engine.connect() as conn:
+        for role, condition in (("doctor", "time_slots.doctor_id = 1"), ("patient", "appointments.patient_id = 2")):
+            for row in conn.execute(text(base.format(condition))).all():
+                print(f"{'':<32} {role} plan: {row[-1]}")
+
+
+async def bench(history: int, requests: int):
+    doctor_token, patient_token = seed(history)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"doctor with {history} past and {UPCOMING} upcoming confirmed appointments, {requests} requests each")
+        for role, token in (("doctor", doctor_token), ("patient", patient_token)):
+            headers = {"Authorization": f"Bearer {token}"}
+            for label, path in (("before", "/bench/legacy-upcoming"), ("after", "/appointments/upcoming-confirmed")):
+                (await client.get(path, headers=headers)).raise_for_status() # warm-up
+                latencies, queries = [], 0
+                with Timer() as timer:
+                    for _ in range(requests):
+                        started = time.perf_counter()
+                        response = await client.get(path, headers=headers)
+                        latencies.append(time.perf_counter() - started)
+                        response.raise_for_status()
+                        queries = int(response.headers["X-DB-Query-Count"])
+                summarize(f"{label}: {role}", latencies, timer.elapsed)
+                print(f"{'':<32} next: {response.json()['appointment_date']} {response.json()['start_time']}, {queries} SQL statements")
+    explain_queries()
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, default=5000, help="Past confirmed appointments of the doctor")
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(bench(args.history, args.requests))
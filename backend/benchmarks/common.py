@@ -0,0 +1,51 @@
+# backend/benchmarks/common.py
+# Shared helpers for the benchmark scripts. Run benchmarks from the backend/ folder, e.g.
+#   python -m benchmarks.bench_async_db
+import os
+import statistics
+import tempfile
+import time
+
+
+def use_temp_database(name: str = "bench.db") -> str:
+    """
+    Points DATABASE_URL at a throwaway SQLite file.
+    Must be called BEFORE importing database/main, which connect at import time.
+    """
+    path = os.path.join(tempfile.mkdtemp(prefix="easycare_bench_"), name)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return path
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers (pct in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(label: str, latencies_s, elapsed_s: float) -> dict:
+    """Prints one result line and returns the numbers for further comparison."""
+    count = len(latencies_s)
+    result = {
+        "requests": count,
+        "throughput_rps": count / elapsed_s if elapsed_s else 0.0,
+        "p50_ms": statistics.median(latencies_s) * 1000 if latencies_s else 0.0,
+        "p99_ms": percentile(latencies_s, 99) * 1000,
+    }
+    print(f"{label:<32} {count:>6} req  {result['throughput_rps']:>9.1f} req/s  "
+          f"p50 {result['p50_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms")
+    return result
+
+
+class Timer:
+    """Context manager measuring wall-clock seconds."""
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        return False
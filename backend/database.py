@@ -1,45 +1,254 @@
 # backend/database.py
+import logging
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import Enum, create_engine, event, inspect, text
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from db_pool import PoolMetrics, instrument_engine, pool_options, timed_pool_class
+from query_stats import install_query_hooks
+from schedule_time import backfill_slot_starts_at
+from doctor_search import setup_doctor_search
+from doctor_availability import refresh_all_next_free_slots
 from models import Base # Ensure this is your Base from models.py and models.py is complete
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./data/site.db")
+# Which async driver to use for PostgreSQL URLs: "asyncpg" (default) or "psycopg" (psycopg 3 async)
+DB_ASYNC_DRIVER = os.environ.get("DB_ASYNC_DRIVER", "asyncpg").lower()
+# Whether the app creates/migrates the schema when it starts (see create_db_tables)
+DB_MIGRATE_ON_STARTUP = os.environ.get("DB_MIGRATE_ON_STARTUP", "true").lower() == "true"
+
+logger.info("Attempting to connect to database (details redacted for log): %s", DATABASE_URL.split('@')[-1] if '@' in DATABASE_URL else DATABASE_URL)
+
+
+def to_async_url(url: str) -> str:
+    """
+    Maps a sync SQLAlchemy URL to its async-driver equivalent.
+    sqlite:// -> sqlite+aiosqlite://, postgres(ql):// -> postgresql+asyncpg:// (or +psycopg).
+    URLs that already name a driver are left untouched.
+    """
+    scheme, sep, rest = url.partition("://")
+    if "+" in scheme:
+        # Explicit sync driver (e.g. postgresql+psycopg2) - swap it for the async one
+        base, _, driver = scheme.partition("+")
+        if base == "sqlite" and driver != "aiosqlite":
+            return f"sqlite+aiosqlite{sep}{rest}"
+        if base == "postgresql" and driver not in ("asyncpg", "psycopg"):
+            return f"postgresql+{DB_ASYNC_DRIVER}{sep}{rest}"
+        return url
+    if scheme == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if scheme in ("postgres", "postgresql"): # Render/Heroku style URLs use postgres://
+        return f"postgresql+{DB_ASYNC_DRIVER}{sep}{rest}"
+    return url
+
+# Async URL can be given explicitly, otherwise it is derived from DATABASE_URL
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# --- SQLite tuning profile ---
+# "tuned" applies SQLITE_PRAGMAS on every new connection; "default" keeps SQLite's stock settings
+SQLITE_PROFILE = os.environ.get("SQLITE_PROFILE", "tuned").lower()
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL", # Readers no longer wait for writers (and vice versa)
+    "synchronous": "NORMAL", # fsync at WAL checkpoints only; still crash-safe with WAL
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")), # Wait for locks instead of failing
+    "cache_size": -int(os.environ.get("SQLITE_CACHE_SIZE_KB", "65536")), # Negative value = KiB of page cache
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE_MB", "256")) * 1024 * 1024,
+    "temp_store": "MEMORY", # Sorts/temp indexes in RAM
+}
+
+def install_sqlite_profile(sync_engine, pragmas: dict = SQLITE_PRAGMAS):
+    """Registers a connect hook applying the pragmas (use async_engine.sync_engine for async engines)."""
+    @event.listens_for(sync_engine, "connect")
+    def apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+# --- Connection pools ---
+# Checkout counters and wait times per engine, served at /metrics/db-pool
+sync_pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
 
-print(f"Attempting to connect to database (details redacted for log): {DATABASE_URL.split('@')[-1] if '@' in DATABASE_URL else DATABASE_URL}")
+def timed_pool_options(base_pool, metrics: PoolMetrics, url: str) -> dict:
+    """poolclass override that records checkout waits (in-memory SQLite keeps its own pool)."""
+    if ":memory:" in url or url.split("?")[0].rstrip("/").endswith(":"): # sqlite:// = in-memory
+        return {}
+    return {"poolclass": timed_pool_class(base_pool, metrics)}
 
 if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-    print("Using SQLite database engine for local development.")
+    engine = create_engine(
+        DATABASE_URL, connect_args={"check_same_thread": False},
+        **timed_pool_options(QueuePool, sync_pool_metrics, DATABASE_URL),
+    )
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, **timed_pool_options(AsyncAdaptedQueuePool, async_pool_metrics, ASYNC_DATABASE_URL)
+    )
+    if SQLITE_PROFILE == "tuned":
+        install_sqlite_profile(engine)
+        install_sqlite_profile(async_engine.sync_engine)
+    logger.info("Using SQLite database engine for local development (profile: %s).", SQLITE_PROFILE)
 else:
-    engine = create_engine(DATABASE_URL)
-    print(f"Using non-SQLite database engine (PostgreSQL expected for {DATABASE_URL.split('@')[-1] if '@' in DATABASE_URL else DATABASE_URL}).")
+    # The sync engine still expects a postgresql:// scheme
+    # Each engine gets its own pool of DB_POOL_SIZE (+ DB_MAX_OVERFLOW) connections
+    engine = create_engine(
+        DATABASE_URL.replace("postgres://", "postgresql://", 1),
+        poolclass=timed_pool_class(QueuePool, sync_pool_metrics), **pool_options(),
+    )
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, poolclass=timed_pool_class(AsyncAdaptedQueuePool, async_pool_metrics), **pool_options(),
+    )
+    logger.info("Using non-SQLite database engine (PostgreSQL expected for %s).", DATABASE_URL.split('@')[-1] if '@' in DATABASE_URL else DATABASE_URL)
+    logger.info("Connection pool: %s", pool_options())
+instrument_engine(engine, sync_pool_metrics)
+instrument_engine(async_engine.sync_engine, async_pool_metrics)
+# Per-request query counts/timings (only recorded while a request is being handled)
+install_query_hooks(engine)
+install_query_hooks(async_engine.sync_engine)
+logger.info("Async driver for request handling: %s", async_engine.dialect.driver)
 
+# --- Read replica (optional) ---
+# GET endpoints that use get_read_db read from here; unset = everything goes to the primary
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL")
+ASYNC_DATABASE_REPLICA_URL = os.environ.get("ASYNC_DATABASE_REPLICA_URL") or (
+    to_async_url(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else None
+)
+replica_pool_metrics = PoolMetrics("replica")
+replica_async_engine = None
+if ASYNC_DATABASE_REPLICA_URL:
+    if ASYNC_DATABASE_REPLICA_URL.startswith("sqlite"):
+        replica_async_engine = create_async_engine(
+            ASYNC_DATABASE_REPLICA_URL,
+            **timed_pool_options(AsyncAdaptedQueuePool, replica_pool_metrics, ASYNC_DATABASE_REPLICA_URL),
+        )
+        if SQLITE_PROFILE == "tuned":
+            install_sqlite_profile(replica_async_engine.sync_engine)
+    else:
+        replica_async_engine = create_async_engine(
+            ASYNC_DATABASE_REPLICA_URL,
+            poolclass=timed_pool_class(AsyncAdaptedQueuePool, replica_pool_metrics), **pool_options(),
+        )
+    instrument_engine(replica_async_engine.sync_engine, replica_pool_metrics)
+    install_query_hooks(replica_async_engine.sync_engine)
+    logger.info("Read replica configured: %s", ASYNC_DATABASE_REPLICA_URL.split('@')[-1] if '@' in ASYNC_DATABASE_REPLICA_URL else ASYNC_DATABASE_REPLICA_URL)
+
+# Sync sessions: table creation, maintenance scripts and benchmarks
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Async sessions: used by every router through get_db
+# expire_on_commit=False so objects stay readable after commit without lazy (blocking) reloads
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+# Replica sessions: only for reads (see read_replica.get_read_db)
+ReplicaSessionLocal = (
+    async_sessionmaker(bind=replica_async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    if replica_async_engine is not None else None
+)
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 
-def get_db():
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
-def create_db_tables():
-    print("Attempting to create database tables if they don't exist...")
+def migrate_missing_columns():
+    """
+    Adds columns that exist on the models but not yet in the database.
+    create_all() only creates missing tables, it never alters existing ones.
+    New columns must be nullable or carry a server_default.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+                logger.info("Added missing column %s.%s", table.name, column.name)
+
+def migrate_missing_indexes():
+    """
+    Creates indexes that exist on the models but not yet in the database
+    (create_all() only creates indexes together with a new table), and rebuilds
+    ones whose uniqueness changed on the model.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_indexes = {index["name"]: index for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                existing = existing_indexes.get(index.name)
+                if existing is not None and bool(existing["unique"]) == bool(index.unique):
+                    continue
+                if existing is not None: # Uniqueness changed on the model: rebuild it
+                    index.drop(conn)
+                index.create(conn, checkfirst=True)
+                logger.info("Created %s index %s on %s", "missing" if existing is None else "changed", index.name, table.name)
+
+def migrate_missing_enum_values():
+    """
+    Adds values that were added to a model's Enum since its PostgreSQL type was created
+    (create_all() never alters an existing type). SQLite stores enums as plain strings.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    enum_types = {column.type.name: column.type for table in Base.metadata.sorted_tables
+                  for column in table.columns if isinstance(column.type, Enum) and column.type.native_enum}
+    # ALTER TYPE ... ADD VALUE must be committed before the value can be used
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, enum_type in enum_types.items():
+            for value in enum_type.enums:
+                conn.execute(text(f"ALTER TYPE {name} ADD VALUE IF NOT EXISTS '{value}'"))
+
+def create_db_tables(raise_errors: bool = False):
+    logger.debug("Attempting to create database tables if they don't exist...")
     try:
         Base.metadata.create_all(bind=engine)
-        print("Base.metadata.create_all() executed successfully.")
+        migrate_missing_columns()
+        migrate_missing_indexes()
+        migrate_missing_enum_values()
+        backfill_slot_starts_at(engine)
+        setup_doctor_search(engine)
+        refresh_all_next_free_slots(engine)
+        logger.debug("Base.metadata.create_all() executed successfully.")
     except Exception as e:
-        print(f"Error during Base.metadata.create_all(): {e}")
+        logger.error("Error during Base.metadata.create_all(): %s", e)
+        if raise_errors: # The migrate command must not report success
+            raise
         # You might want to raise this or handle it more robustly in production
         # For now, just printing the error.
 
-# Call this function when the application starts (e.g., when database.py is imported)
-# This ensures tables are created if connected to a new, empty database.
-'''if not DATABASE_URL.startswith("sqlite"): # Only run for cloud DB on app startup
-    print("Running create_db_tables for cloud database...")
-    create_db_tables()
-elif os.environ.get("CREATE_LOCAL_DB_TABLES") == "true": # Or a flag for local
-    print("Running create_db_tables for local SQLite database...")
-    create_db_tables()'''
-create_db_tables()
\ No newline at end of file
+async def dispose_engines():
+    """Closes pooled connections on shutdown."""
+    await async_engine.dispose()
+    if replica_async_engine is not None:
+        await replica_async_engine.dispose()
+    engine.dispose()
+
+# Schema creation and migrations are an explicit step, never an import side effect:
+# the app runs create_db_tables() in its lifespan (unless DB_MIGRATE_ON_STARTUP=false),
+# deployments with several workers can run it once beforehand with
+#   python -m database migrate
+if __name__ == "__main__":
+    import argparse
+    from logging_config import setup_logging
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Database schema management.")
+    parser.add_argument("command", choices=["migrate"], help="migrate: create missing tables/columns/indexes and backfill")
+    parser.parse_args()
+    create_db_tables(raise_errors=True)
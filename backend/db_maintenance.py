@@ -0,0 +1,54 @@
+# backend/db_maintenance.py
+"""
+Database maintenance command. Run from the backend folder, ideally off-peak:
+
+    python db_maintenance.py                 # optimize + analyze + vacuum
+    python db_maintenance.py --analyze       # only refresh planner statistics
+
+SQLite: PRAGMA optimize, ANALYZE, VACUUM, then a WAL checkpoint so the -wal file shrinks.
+PostgreSQL: ANALYZE / VACUUM (autovacuum normally covers this; useful after bulk loads).
+"""
+import argparse
+import time
+
+from sqlalchemy import text
+
+from database import engine
+
+
+def run_maintenance(optimize: bool = True, analyze: bool = True, vacuum: bool = True) -> dict:
+    """Runs the selected steps and returns how long each one took (seconds)."""
+    is_sqlite = engine.dialect.name == "sqlite"
+    steps = []
+    if optimize and is_sqlite:
+        steps.append(("optimize", "PRAGMA optimize"))
+    if analyze:
+        steps.append(("analyze", "ANALYZE"))
+    if vacuum:
+        steps.append(("vacuum", "VACUUM"))
+        if is_sqlite:
+            steps.append(("wal_checkpoint", "PRAGMA wal_checkpoint(TRUNCATE)"))
+
+    timings = {}
+    # VACUUM cannot run inside a transaction on either backend
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, statement in steps:
+            started = time.perf_counter()
+            conn.execute(text(statement))
+            timings[name] = time.perf_counter() - started
+            print(f"{name:<15} {timings[name] * 1000:8.1f} ms")
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--optimize", action="store_true", help="PRAGMA optimize (SQLite only)")
+    parser.add_argument("--analyze", action="store_true", help="Refresh query planner statistics")
+    parser.add_argument("--vacuum", action="store_true", help="Rebuild the database file / reclaim space")
+    args = parser.parse_args()
+    run_all = not (args.optimize or args.analyze or args.vacuum)
+    run_maintenance(
+        optimize=run_all or args.optimize,
+        analyze=run_all or args.analyze,
+        vacuum=run_all or args.vacuum,
+    )
@@ -0,0 +1,171 @@
+# backend/db_pool.py
+# Connection pool settings and instrumentation for the database engines.
+# Pool size/overflow/timeout/recycle/pre-ping come from the environment (PostgreSQL engines);
+# every engine gets checkout counters and wait timings, and the async pool can be pre-filled
+# at startup so the first requests don't pay for connection setup.
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event, exc as sqla_exc, text
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30")) # Seconds to wait for a free connection
+# Hosted Postgres (and proxies like pgbouncer) drop idle connections; recycle before they do
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Connections opened before the app accepts traffic (capped at the pool size, 0 disables)
+DB_POOL_WARMUP = int(os.environ.get("DB_POOL_WARMUP", str(DB_POOL_SIZE)))
+# Checkouts slower than this are counted as having waited for the pool
+POOL_SLOW_CHECKOUT_MS = float(os.environ.get("POOL_SLOW_CHECKOUT_MS", "100"))
+
+
+def pool_options() -> dict:
+    """Keyword arguments for create_engine/create_async_engine on server databases."""
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+class PoolMetrics:
+    """Counters for one engine's pool. Checkouts can happen on several threads, hence the lock."""
+
+    def __init__(self, name: str, slow_checkout_ms: float = POOL_SLOW_CHECKOUT_MS):
+        self.name = name
+        self.slow_checkout_s = slow_checkout_ms / 1000
+        self._lock = threading.Lock()
+        self.pool = None # Set by instrument_engine; follows the engine across dispose()
+        self.counters = {"checkouts": 0, "checkins": 0, "connects": 0, "invalidations": 0,
+                         "timeouts": 0, "slow_checkouts": 0}
+        self.waits = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.waits += 1
+            self.wait_total_s += seconds
+            self.wait_max_s = max(self.wait_max_s, seconds)
+            if timed_out:
+                self.counters["timeouts"] += 1
+            elif seconds >= self.slow_checkout_s:
+                self.counters["slow_checkouts"] += 1
+
+    def increment(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = {
+                **self.counters,
+                "wait_avg_ms": round(self.wait_total_s / self.waits * 1000, 3) if self.waits else 0.0,
+                "wait_max_ms": round(self.wait_max_s * 1000, 3),
+            }
+        pool = self.pool
+        if pool is not None and hasattr(pool, "checkedout"):
+            result.update({
+                "pool_class": type(pool).__name__,
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+            })
+        return result
+
+
+class _TimedCheckoutMixin:
+    """Times how long each checkout waits for a connection (including opening a new one)."""
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except sqla_exc.TimeoutError:
+            self.metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+
+def timed_pool_class(base, metrics: PoolMetrics):
+    """
+    QueuePool subclass bound to `metrics`. Binding it on the class (not the instance)
+    keeps it working after engine.dispose(), which recreates the pool via self.__class__.
+    """
+    # Same __module__ as the base so SQLAlchemy's pool logging stays under the "sqlalchemy" logger
+    return type(f"Timed{base.__name__}", (_TimedCheckoutMixin, base), {"metrics": metrics, "__module__": base.__module__})
+
+
+def instrument_engine(sync_engine, metrics: PoolMetrics):
+    """Attaches pool event counters (use async_engine.sync_engine for async engines)."""
+    metrics.pool = sync_engine.pool
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.increment("checkouts")
+        metrics.pool = sync_engine.pool
+
+    @event.listens_for(sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        metrics.increment("checkins")
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.increment("connects")
+
+    @event.listens_for(sync_engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        # Includes stale connections caught by pre-ping
+        metrics.increment("invalidations")
+
+
+async def warm_up_pool(async_engine, connections: int = DB_POOL_WARMUP) -> int:
+    """Opens up to `connections` pooled connections at once and returns them to the pool."""
+    pool_size = async_engine.pool.size() if hasattr(async_engine.pool, "size") else 1
+    count = min(connections, pool_size)
+    if count <= 0:
+        return 0
+
+    async def open_one():
+        conn = None
+        try:
+            conn = await async_engine.connect()
+            await conn.execute(text("SELECT 1"))
+        finally:
+            # Hold it until all are open, otherwise the same connection is reused every time
+            # (a failed attempt still arrives so the others are released)
+            await barrier.wait()
+            if conn is not None:
+                await conn.close()
+
+    barrier = _Barrier(count)
+    started = time.perf_counter()
+    await asyncio.gather(*(open_one() for _ in range(count)))
+    logger.info("Warmed up %s database connection(s) in %.0f ms", count, (time.perf_counter() - started) * 1000)
+    return count
+
+
+class _Barrier:
+    """Minimal asyncio barrier (asyncio.Barrier needs Python 3.11)."""
+
+    def __init__(self, parties: int):
+        self.parties = parties
+        self.arrived = 0
+        self.released = asyncio.Event()
+
+    async def wait(self):
+        self.arrived += 1
+        if self.arrived >= self.parties:
+            self.released.set()
+        await self.released.wait()
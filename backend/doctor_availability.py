@@ -0,0 +1,53 @@
+# backend/doctor_availability.py
+# DoctorProfile.next_free_slot_at: when each doctor's earliest free future slot starts, kept on
+# the profile so "who in this specialty can see me first" is one range scan of
+# ix_doctor_profiles_specialty_next_free instead of a schedule lookup per doctor.
+# Every write that books, frees, adds or removes slots refreshes it in the same transaction;
+# values that have slipped into the past (that slot started unbooked) are recomputed by the
+# appointment sweeper, and skipped by readers until then.
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import DoctorProfile, TimeSlot
+
+logger = logging.getLogger(__name__)
+
+
+def next_free_slot_subquery(now: datetime):
+    """Earliest free slot from `now` on of the doctor in the enclosing UPDATE (correlated)."""
+    return select(func.min(TimeSlot.starts_at)).where(
+        TimeSlot.doctor_id == DoctorProfile.user_id, # ix_time_slots_doctor_starts_at
+        TimeSlot.starts_at >= now,
+        TimeSlot.is_booked == False,
+    ).scalar_subquery()
+
+
+def refresh_statement(now: Optional[datetime] = None):
+    """UPDATE recomputing next_free_slot_at; callers add the WHERE for the profiles to refresh."""
+    now = now or datetime.now(timezone.utc)
+    return update(DoctorProfile).values(next_free_slot_at=next_free_slot_subquery(now)).execution_options(synchronize_session=False)
+
+
+async def refresh_next_free_slot(db: AsyncSession, doctor_id: int):
+    """Recomputes one doctor's value (no commit; run it in the transaction that changed the slots)."""
+    await db.execute(refresh_statement().where(DoctorProfile.user_id == doctor_id))
+
+
+async def slot_claimed(db: AsyncSession, doctor_id: int, starts_at: datetime):
+    """After booking the slot at `starts_at`: only recomputes if that was the doctor's next free slot."""
+    await db.execute(refresh_statement().where(
+        DoctorProfile.user_id == doctor_id,
+        DoctorProfile.next_free_slot_at == starts_at,
+    ))
+
+
+def refresh_all_next_free_slots(engine) -> int:
+    """Recomputes every profile's value (startup: fills the column and catches up on the past)."""
+    with engine.begin() as conn:
+        updated = conn.execute(refresh_statement()).rowcount
+    logger.info("Refreshed next free slot of %s doctor profiles", updated)
+    return updated
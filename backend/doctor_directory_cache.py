@@ -0,0 +1,110 @@
+# backend/doctor_directory_cache.py
+# In-process cache of serialized pages of the public doctor directory (GET /appointments/doctors).
+# The directory changes only when a doctor registers or edits their profile, but patients load it
+# on every visit to the booking page; a hit skips the query and the serialization entirely.
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Hashable, Optional
+
+# Seconds a cached page stays valid (0 disables the cache).
+# Changes made through this worker invalidate it at once; this bounds how stale other workers can be.
+DOCTOR_DIRECTORY_CACHE_TTL = float(os.environ.get("DOCTOR_DIRECTORY_CACHE_TTL", "60"))
+DOCTOR_DIRECTORY_CACHE_SIZE = int(os.environ.get("DOCTOR_DIRECTORY_CACHE_SIZE", "256"))
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag of a response body."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match request header covers this ETag (weak comparison, as for GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+
+@dataclass(frozen=True)
+class DirectoryPage:
+    body: bytes # Serialized JSON list
+    etag: str
+    next_cursor: Optional[str] = None
+
+
+class DoctorDirectoryCache:
+    """TTL + LRU cache of directory pages, dropped as a whole when any doctor changes."""
+
+    def __init__(self, ttl_seconds: float = DOCTOR_DIRECTORY_CACHE_TTL, max_size: int = DOCTOR_DIRECTORY_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, tuple[float, DirectoryPage]]" = OrderedDict()
+        self._lock = Lock()
+        # Bumped by invalidate(); a page built from data read before an invalidation is not stored
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_size > 0
+
+    def get(self, key: Hashable) -> Optional[DirectoryPage]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, page = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return page
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, page: DirectoryPage, generation: int):
+        """Stores the page unless the directory was invalidated since `generation` was read."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, page)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Call after committing a change to any doctor or doctor profile."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+doctor_directory_cache = DoctorDirectoryCache()
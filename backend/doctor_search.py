@@ -0,0 +1,97 @@
+# backend/doctor_search.py
+# Full-text search over doctor profiles (full name, specialty, qualifications, about me).
+# SQLite: an FTS5 table over doctor_profiles, kept in sync by triggers, ranked with bm25().
+# PostgreSQL: a generated tsvector column with a GIN index, ranked with ts_rank_cd().
+# Either way the index follows every write to doctor_profiles, whichever code path makes it.
+import logging
+import re
+from typing import List
+
+from sqlalchemy import Float, column, func, literal_column, select, table, text
+
+from models import DoctorProfile
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "doctor_profiles_fts"
+MAX_SEARCH_TERMS = 8
+
+# Relative weight of a match per field: a name or specialty hit counts most, the bio least
+FIELD_WEIGHTS = {"full_name": 10.0, "specialty": 10.0, "qualifications": 4.0, "about_me": 1.0}
+PG_FIELD_CLASSES = {"full_name": "A", "specialty": "A", "qualifications": "B", "about_me": "C"}
+
+_SQLITE_SETUP = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        full_name, specialty, qualifications, about_me,
+        content='doctor_profiles', content_rowid='user_id',
+        tokenize='porter unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON doctor_profiles BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, full_name, specialty, qualifications, about_me)
+        VALUES (new.user_id, new.full_name, new.specialty, new.qualifications, new.about_me);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON doctor_profiles BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, full_name, specialty, qualifications, about_me)
+        VALUES ('delete', old.user_id, old.full_name, old.specialty, old.qualifications, old.about_me);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF user_id, full_name, specialty, qualifications, about_me ON doctor_profiles BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, full_name, specialty, qualifications, about_me)
+        VALUES ('delete', old.user_id, old.full_name, old.specialty, old.qualifications, old.about_me);
+        INSERT INTO {FTS_TABLE}(rowid, full_name, specialty, qualifications, about_me)
+        VALUES (new.user_id, new.full_name, new.specialty, new.qualifications, new.about_me);
+    END""",
+]
+
+_PG_SEARCH_VECTOR = " || ".join(
+    f"setweight(to_tsvector('english', coalesce({field}, '')), '{weight}')" for field, weight in PG_FIELD_CLASSES.items()
+)
+_POSTGRES_SETUP = [
+    f"ALTER TABLE doctor_profiles ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({_PG_SEARCH_VECTOR}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_doctor_profiles_search ON doctor_profiles USING GIN (search_vector)",
+]
+
+
+def setup_doctor_search(engine):
+    """Creates the search index (and its sync triggers) if missing; fills it from existing profiles."""
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            exists = conn.scalar(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE})
+            for statement in _SQLITE_SETUP:
+                conn.execute(text(statement))
+            if not exists: # Index profiles written before the table existed
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+                logger.info("Created full-text index %s", FTS_TABLE)
+        elif engine.dialect.name == "postgresql":
+            for statement in _POSTGRES_SETUP: # The generated column is computed for existing rows too
+                conn.execute(text(statement))
+        else:
+            logger.warning("No full-text doctor search for the %s dialect", engine.dialect.name)
+
+
+def search_terms(query: str) -> List[str]:
+    """Words of a user's search box input; anything else (operators, quotes) is dropped."""
+    return re.findall(r"\w+", query.lower())[:MAX_SEARCH_TERMS]
+
+
+def doctor_search_query(dialect_name: str, terms: List[str], columns: list):
+    """
+    SELECT of `columns` plus a `score` (higher is better) for doctor profiles matching every term,
+    the last one as a prefix ("cardi" finds cardiology). Best matches first; callers add LIMIT.
+    """
+    if dialect_name == "sqlite":
+        match = " ".join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*' # Implicit AND
+        fts = table(FTS_TABLE, column("rowid"))
+        bm25 = literal_column(f"bm25({FTS_TABLE}, {', '.join(str(w) for w in FIELD_WEIGHTS.values())})", Float) # Lower is better
+        return select(*columns, (-bm25).label("score")).select_from(fts).join(
+            DoctorProfile, DoctorProfile.user_id == fts.c.rowid
+        ).where(text(f"{FTS_TABLE} MATCH :match").bindparams(match=match)).order_by(bm25, DoctorProfile.user_id)
+
+    if dialect_name == "postgresql":
+        tsquery = func.to_tsquery("english", " & ".join(terms[:-1] + [f"{terms[-1]}:*"]))
+        search_vector = literal_column("doctor_profiles.search_vector")
+        score = func.ts_rank_cd(search_vector, tsquery)
+        return select(*columns, score.label("score")).select_from(DoctorProfile).where(
+            search_vector.op("@@")(tsquery)
+        ).order_by(score.desc(), DoctorProfile.user_id)
+
+    raise NotImplementedError(f"Doctor search is not available on {dialect_name}")
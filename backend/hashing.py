@@ -0,0 +1,77 @@
+# backend/hashing.py
+# Runs werkzeug password hashing off the event loop.
+# scrypt/pbkdf2 hashing costs tens of milliseconds of CPU per call; done inline in an
+# async handler it stalls every other request on the worker during a burst of logins.
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# "thread" (default; hashlib releases the GIL while hashing), "process", or
+# "inline" (hash on the calling thread - only for benchmarks/debugging)
+HASH_POOL_KIND = os.environ.get("HASH_POOL_KIND", "thread").lower()
+# Hashes allowed to run at the same time
+HASH_POOL_WORKERS = int(os.environ.get("HASH_POOL_WORKERS", min(4, os.cpu_count() or 1)))
+# Extra hashes allowed to wait for a worker before new ones are refused
+HASH_POOL_MAX_QUEUE = int(os.environ.get("HASH_POOL_MAX_QUEUE", "64"))
+
+
+class HashingPoolBusy(Exception):
+    """Raised when the hashing queue is full; callers should answer 503 and let the client retry."""
+
+
+class PasswordHasher:
+    """
+    Bounded executor for password hashing.
+    At most `workers` hashes run concurrently and at most `max_queue` more wait;
+    anything beyond that is rejected immediately instead of piling up latency.
+    """
+
+    def __init__(self, kind: str = HASH_POOL_KIND, workers: int = HASH_POOL_WORKERS, max_queue: int = HASH_POOL_MAX_QUEUE):
+        if kind not in ("thread", "process", "inline"):
+            raise ValueError(f"Unknown HASH_POOL_KIND '{kind}' (expected thread, process or inline)")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor: Optional[Executor] = None
+        self._pending = 0 # Running + waiting jobs; only touched from the event loop thread
+
+    def _get_executor(self) -> Executor:
+        # Created lazily so importing this module never forks/spawns anything
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pwhash")
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self.kind == "inline":
+            return func(*args)
+        if self._pending >= self.workers + self.max_queue:
+            raise HashingPoolBusy(f"{self._pending} password hashes already queued")
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(generate_password_hash, password)
+
+    async def verify(self, password_hash: str, password: str) -> bool:
+        return await self._run(check_password_hash, password_hash, password)
+
+    def stats(self) -> dict:
+        return {"kind": self.kind, "workers": self.workers, "max_queue": self.max_queue, "pending": self._pending}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
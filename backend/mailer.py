@@ -0,0 +1,232 @@
+# backend/mailer.py
+# Outbound email queue.
+# Requests only enqueue; one background worker keeps a single authenticated SMTP connection
+# open, sends queued mails in batches over it and retries failures with exponential backoff.
+# smtplib is blocking, so all SMTP I/O runs on one dedicated thread (which also makes the
+# shared connection safe to reuse).
+import asyncio
+import logging
+import os
+import smtplib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.message import EmailMessage
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SMTP_HOST = os.environ.get("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "465"))
+SMTP_SECURITY = os.environ.get("SMTP_SECURITY", "ssl").lower() # "ssl", "starttls" or "none" (local test servers)
+SMTP_TIMEOUT_SECONDS = float(os.environ.get("SMTP_TIMEOUT_SECONDS", "10"))
+MAIL_QUEUE_SIZE = int(os.environ.get("MAIL_QUEUE_SIZE", "1000"))
+MAIL_BATCH_SIZE = int(os.environ.get("MAIL_BATCH_SIZE", "20"))
+MAIL_MAX_RETRIES = int(os.environ.get("MAIL_MAX_RETRIES", "3"))
+MAIL_RETRY_BASE_DELAY_SECONDS = float(os.environ.get("MAIL_RETRY_BASE_DELAY_SECONDS", "1"))
+# Close the SMTP connection after this long without mail (servers drop idle sessions anyway)
+MAIL_IDLE_TIMEOUT_SECONDS = float(os.environ.get("MAIL_IDLE_TIMEOUT_SECONDS", "60"))
+
+
+# Errors about one message; the SMTP session stays usable after them
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class MailQueueFull(Exception):
+    """Raised by enqueue() when MAIL_QUEUE_SIZE mails are already waiting."""
+
+
+@dataclass
+class MailJob:
+    to_email: str
+    subject: str
+    body: str
+    attempts: int = 0
+
+
+class MailQueue:
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT, security: str = SMTP_SECURITY,
+                 username: Optional[str] = None, password: Optional[str] = None, sender: Optional[str] = None,
+                 max_size: int = MAIL_QUEUE_SIZE, batch_size: int = MAIL_BATCH_SIZE,
+                 max_retries: int = MAIL_MAX_RETRIES, retry_base_delay: float = MAIL_RETRY_BASE_DELAY_SECONDS,
+                 idle_timeout: float = MAIL_IDLE_TIMEOUT_SECONDS, timeout: float = SMTP_TIMEOUT_SECONDS):
+        if security not in ("ssl", "starttls", "none"):
+            raise ValueError(f"Unknown SMTP_SECURITY '{security}' (expected ssl, starttls or none)")
+        self.host = host
+        self.port = port
+        self.security = security
+        # Credentials default to the same variables send_email always used
+        self.username = username if username is not None else os.environ.get("EMAIL_ADDRESS")
+        self.password = password if password is not None else os.environ.get("EMAIL_PASSWORD")
+        self.sender = sender if sender is not None else self.username
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._queue: "asyncio.Queue[MailJob]" = asyncio.Queue(maxsize=max_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+        self._smtp: Optional[smtplib.SMTP] = None # Only touched from the executor thread
+        self._worker: Optional[asyncio.Task] = None
+        self._retry_tasks: set = set()
+        self.stats_counters = {"enqueued": 0, "sent": 0, "retried": 0, "dropped": 0, "batches": 0, "connections": 0}
+
+    # --- Producer side ---
+
+    def enqueue(self, to_email: str, subject: str, body: str):
+        """Queues a mail without blocking. Raises MailQueueFull when the queue is saturated."""
+        try:
+            self._queue.put_nowait(MailJob(to_email, subject, body))
+        except asyncio.QueueFull:
+            raise MailQueueFull(f"{self._queue.qsize()} mails already queued")
+        self.stats_counters["enqueued"] += 1
+
+    # --- SMTP connection (executor thread only) ---
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.security == "ssl":
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.security == "starttls":
+                smtp.starttls()
+            if self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close() # Refused TLS/login: don't leak the socket
+            raise
+        self.stats_counters["connections"] += 1
+        return smtp
+
+    def _close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def _build_message(self, job: MailJob) -> EmailMessage:
+        msg = EmailMessage()
+        msg.set_content(job.body)
+        msg['Subject'] = job.subject
+        msg['From'] = self.sender
+        msg['To'] = job.to_email
+        return msg
+
+    def _send_batch(self, jobs: List[MailJob]) -> List[Tuple[MailJob, Exception]]:
+        """Sends every job over the shared connection; returns the ones that failed."""
+        failures = []
+        connect_error: Optional[Exception] = None
+        for job in jobs:
+            if connect_error is not None:
+                # Couldn't connect/log in during this batch; don't reconnect once per mail
+                failures.append((job, connect_error))
+                continue
+            message = self._build_message(job)
+            try:
+                if self._smtp is None:
+                    self._smtp = self._connect()
+            except Exception as e:
+                connect_error = e
+                failures.append((job, e))
+                continue
+            try:
+                try:
+                    self._smtp.send_message(message)
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    # Server dropped the idle connection; reconnect once without spending a retry
+                    self._close()
+                    try:
+                        self._smtp = self._connect()
+                    except Exception as e:
+                        connect_error = e
+                        raise
+                    self._smtp.send_message(message)
+                self.stats_counters["sent"] += 1
+            except MESSAGE_ERRORS as e:
+                # Refused for this mail only (bad address, content); smtplib has reset the
+                # transaction, so the rest of the batch goes out over the same connection
+                failures.append((job, e))
+            except Exception as e:
+                self._close() # Don't reuse a connection in an unknown state
+                failures.append((job, e))
+        return failures
+
+    # --- Worker ---
+
+    async def _retry_later(self, job: MailJob, delay: float):
+        await asyncio.sleep(delay)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.stats_counters["dropped"] += 1
+            logger.warning("Mail queue full, dropping retry of mail to %s", job.to_email)
+
+    def _handle_failure(self, job: MailJob, error: Exception):
+        job.attempts += 1
+        if job.attempts > self.max_retries:
+            self.stats_counters["dropped"] += 1
+            logger.error("Giving up on mail to %s after %s attempts: %s", job.to_email, job.attempts, error)
+            return
+        delay = self.retry_base_delay * (2 ** (job.attempts - 1))
+        self.stats_counters["retried"] += 1
+        logger.warning("Error sending mail to %s (attempt %s), retrying in %.1fs: %s", job.to_email, job.attempts, delay, error)
+        task = asyncio.create_task(self._retry_later(job, delay))
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                first = await asyncio.wait_for(self._queue.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                await loop.run_in_executor(self._executor, self._close) # Release idle connection
+                continue
+            batch = [first]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                failures = await loop.run_in_executor(self._executor, self._send_batch, batch)
+                self.stats_counters["batches"] += 1
+                for job, error in failures:
+                    self._handle_failure(job, error)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def start(self):
+        """Starts the background worker; call from the app lifespan."""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Tries to flush queued mail (including pending retries), then stops the worker."""
+        if self._worker is None:
+            return
+        try:
+            async def drain():
+                while True:
+                    await self._queue.join()
+                    if not self._retry_tasks:
+                        return
+                    await asyncio.gather(*self._retry_tasks, return_exceptions=True)
+            await asyncio.wait_for(drain(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Mail queue stopped with %s unsent mails", self._queue.qsize())
+        for task in list(self._retry_tasks):
+            task.cancel()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+
+    def stats(self) -> dict:
+        return {**self.stats_counters, "queued": self._queue.qsize(), "pending_retries": len(self._retry_tasks)}
+
+
+mail_queue = MailQueue()
@@ -1,18 +1,57 @@
 # main.py
+import logging
+from logging_config import setup_logging, RequestIdMiddleware
+setup_logging() # Before the other imports: database.py already logs while connecting
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routers import auth
-from database import engine
-from models import Base
+from database import async_engine, replica_async_engine, create_db_tables, dispose_engines, DB_MIGRATE_ON_STARTUP
+from db_pool import warm_up_pool
+from read_replica import read_your_writes_middleware
+from query_stats import query_stats_middleware
+from request_metrics import RequestMetricsMiddleware
+from hashing import password_hasher
+from otp_store import otp_store
+from mailer import mail_queue
+from appointment_sweeper import appointment_sweeper
 from routers import appointments
 from routers import notifications  # Import the new router
 from routers import profile, health_data
 from routers import auth, appointments, notifications, profile, video, prescriptions
+from routers import metrics
+from routers import schedule_templates
  # Add video
 
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup work goes before the yield, shutdown work after it
+    if DB_MIGRATE_ON_STARTUP:
+        create_db_tables() # Missing tables/columns/indexes, backfills, search index (before any request)
+    try:
+        await warm_up_pool(async_engine) # Open pooled connections before serving traffic
+        if replica_async_engine is not None:
+            await warm_up_pool(replica_async_engine)
+    except Exception as e: # The pool still fills lazily; don't refuse to start over it
+        logger.warning("Error warming up database connection pool: %s", e)
+    otp_store.start() # Background sweeping of expired OTPs
+    mail_queue.start() # Background SMTP sender
+    appointment_sweeper.start() # Background expiry/completion of appointments whose slot has passed
+    yield
+    await appointment_sweeper.stop()
+    await mail_queue.stop() # Flush queued mail before exiting
+    await otp_store.stop()
+    password_hasher.shutdown() # Stop password hashing workers
+    await dispose_engines() # Close pooled DB connections cleanly
+
+app = FastAPI(lifespan=lifespan)
+
+# Pins a client's reads to the primary for a few seconds after it writes (read replica only)
+app.middleware("http")(read_your_writes_middleware)
+# Query count / DB time per request as response headers, N+1 warnings, /metrics/db aggregates
+app.middleware("http")(query_stats_middleware)
 
 # CORS middleware
 app.add_middleware(
@@ -24,15 +63,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"], # Pagination cursor (GET /appointments/requests, /my-confirmed-patients, /doctors)
 )
 
+# Latency histograms / status codes per route for /metrics (outermost, so it times everything)
+app.add_middleware(RequestMetricsMiddleware)
+# Correlation id for every log line of a request (outermost, so all other layers see it)
+app.add_middleware(RequestIdMiddleware)
+
 #app.add_middleware(cookie_backend.middleware) # Added for function correctly
 
 app.include_router(auth.router)
 app.include_router(appointments.router)  # Include the new router
+app.include_router(schedule_templates.router) # Weekly schedule templates
 app.include_router(notifications.router) # Include the new router
 app.include_router(profile.router)
 app.include_router(video.router)
 app.include_router(prescriptions.router) # Include the new video router
 app.include_router(health_data.router)
-print("--- MAIN.PY - Routers Included ---")
\ No newline at end of file
+app.include_router(metrics.router)
+logger.debug("--- MAIN.PY - Routers Included ---")
\ No newline at end of file
@@ -1,9 +1,10 @@
 # backend/models.py
-from sqlalchemy import (Column, Integer, String, Enum, ForeignKey,Date, Boolean, DateTime, Text,Float,func)
+from sqlalchemy import (Column, Integer, String, Enum, ForeignKey,Date, Boolean, DateTime, Text,Float,func,Index,text)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import enum
 from datetime import datetime,timezone
+from schedule_time import UTCDateTime, default_starts_at
 
 
 Base = declarative_base()
@@ -49,6 +50,8 @@ class User(Base):
     email = Column(String, unique=True, index=True) # Add unique=True, index=True
     role = Column(Enum(UserRole), default=UserRole.patient, nullable=False) # Add nullable=False
     license_number = Column(String, nullable=True)  # Only for doctors
+    # Bumped on password reset / role change; tokens carrying an older version are rejected
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
 
     # Relationships
     time_slots = relationship("TimeSlot", back_populates="doctor", cascade="all, delete-orphan") # ADD cascade
@@ -80,6 +83,18 @@ class TimeSlot(Base):
     # day_of_week = Column(String) # Keep if used elsewhere, but primary logic uses date
     doctor_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     is_booked = Column(Boolean, default=False, nullable=False, index=True) # Add this line
+    # date + start_time as one UTC instant (start_time is local to SCHEDULE_TZ_OFFSET). Filled in on
+    # insert; NULL only for legacy rows until backfill_slot_starts_at() has run at startup.
+    starts_at = Column(UTCDateTime, nullable=True, default=default_starts_at)
+    # Weekly template this slot was generated from (NULL for slots saved by hand)
+    template_id = Column(Integer, ForeignKey("schedule_templates.id", ondelete="SET NULL"), nullable=True, index=True)
+
+    # Serves "free slots of doctor X between two dates" (per-day schedule and month availability)
+    __table_args__ = (
+        Index("ix_time_slots_doctor_date_booked", "doctor_id", "date", "is_booked"),
+        # Chronological per-doctor scans: ordering, next slot, booking by exact start
+        Index("ix_time_slots_doctor_starts_at", "doctor_id", "starts_at"),
+    )
 
     # Relationship
     doctor = relationship("User", back_populates="time_slots")
@@ -87,6 +102,23 @@ class TimeSlot(Base):
     # appointment = relationship("Appointment", back_populates="time_slot", uselist=False)
 
 
+class ScheduleTemplate(Base):
+    """A recurring weekly block (e.g. Mondays 09:00-12:00 in 30 minute slots) expanded into TimeSlot rows."""
+    __tablename__ = "schedule_templates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    doctor_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    weekday = Column(Integer, nullable=False) # 0 = Monday ... 6 = Sunday, like date.weekday()
+    start_time = Column(String, nullable=False) # HH:MM, first slot
+    end_time = Column(String, nullable=False) # HH:MM, the last slot ends by then
+    slot_minutes = Column(Integer, nullable=False)
+    effective_from = Column(Date, nullable=False)
+    effective_until = Column(Date, nullable=True) # NULL = open ended
+    expanded_until = Column(Date, nullable=True) # Slots exist up to this date; the appointment sweeper rolls it forward
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
 # Add near other models in models.py
 class AppointmentStatus(str, enum.Enum):
     PENDING = "pending"
@@ -94,6 +126,13 @@ class AppointmentStatus(str, enum.Enum):
     REJECTED = "rejected"
     CANCELLED = "cancelled" # Optional: if patient can cancel
     COMPLETED = "completed" # Optional: after the session
+    EXPIRED = "expired" # Still pending when its slot started (set by the appointment sweeper)
+
+# Statuses in which an appointment holds its time slot. Rejected, cancelled and expired ones have
+# released it (is_booked is false again), so the slot can be booked by someone else.
+SLOT_HOLDING_STATUSES = (AppointmentStatus.PENDING, AppointmentStatus.CONFIRMED, AppointmentStatus.COMPLETED)
+# Enum columns store the member names
+_SLOT_HOLDING_CONDITION = "status IN (" + ", ".join(f"'{s.name}'" for s in SLOT_HOLDING_STATUSES) + ")"
 
 class Appointment(Base):
     __tablename__ = "appointments"
@@ -101,7 +140,7 @@ class Appointment(Base):
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     doctor_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
-    timeslot_id = Column(Integer, ForeignKey("time_slots.id"), unique=True, nullable=False, index=True) # Unique ensures one booking per slot
+    timeslot_id = Column(Integer, ForeignKey("time_slots.id"), nullable=False, index=True) # One live booking per slot: uq_appointments_active_timeslot
     appointment_date = Column(Date, nullable=False) # Store the specific date again for querying ease
     # appointment_time = Column(String, nullable=False) # Store start time again, or rely on timeslot link
     status = Column(Enum(AppointmentStatus), default=AppointmentStatus.PENDING, nullable=False, index=True)
@@ -112,7 +151,17 @@ class Appointment(Base):
      # *** UPDATED back_populates names ***
     patient = relationship("User", foreign_keys=[patient_id], back_populates="patient_appointments")
     doctor = relationship("User", foreign_keys=[doctor_id], back_populates="doctor_appointments")
-    time_slot = relationship("TimeSlot") # One-to-one relationship with TimeSlot via unique=True FK   
+    time_slot = relationship("TimeSlot") # A slot has at most one appointment in SLOT_HOLDING_STATUSES
+
+    # Doctor's request list, newest first (keyset pagination on created_at, id)
+    __table_args__ = (
+        Index("ix_appointments_doctor_created", "doctor_id", "created_at"),
+        # Doctor's patient roster: grouped by patient straight from the index (GET /my-confirmed-patients)
+        Index("ix_appointments_doctor_status_patient", "doctor_id", "status", "patient_id", "appointment_date"),
+        # At most one appointment holding each slot; released (rejected/expired) ones don't count
+        Index("uq_appointments_active_timeslot", "timeslot_id", unique=True,
+              sqlite_where=text(_SLOT_HOLDING_CONDITION), postgresql_where=text(_SLOT_HOLDING_CONDITION)),
+    )
 
 # models.py
 # Add near other models
@@ -164,11 +213,25 @@ class DoctorProfile(Base):
     qualifications = Column(Text, nullable=True) # Use Text
     about_me = Column(Text, nullable=True) # Use Text
     is_complete = Column(Boolean, default=False, nullable=False) # Track completion here
+    # Start of the earliest free future slot; maintained by doctor_availability.py
+    next_free_slot_at = Column(UTCDateTime, nullable=True)
 
     # Relationship back to User
     user = relationship("User", back_populates="doctor_profile")
+
+    # "Soonest available in a specialty" (GET /appointments/doctors/soonest)
+    __table_args__ = (Index("ix_doctor_profiles_specialty_next_free", "specialty", "next_free_slot_at"),)
 # --- *** END Doctor Profile Table *** ---
 
+class PasswordResetOTP(Base):
+    __tablename__ = "password_reset_otps"
+
+    # One live OTP per email; a new forgot-password request replaces the old one
+    email = Column(String, primary_key=True)
+    otp = Column(String, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True) # Swept once passed
+
 class HealthDataEntry(Base):
     __tablename__ = "health_data_entries"
 
@@ -0,0 +1,170 @@
+# backend/otp_store.py
+# Storage for password-reset OTPs.
+# "memory": per-process dict with TTL expiry, a size cap and background sweeping (single worker).
+# "database": rows in password_reset_otps, shared by every worker/process using the same DB.
+import asyncio
+import logging
+import os
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, select
+
+from database import AsyncSessionLocal
+from models import PasswordResetOTP
+
+logger = logging.getLogger(__name__)
+
+OTP_STORE_BACKEND = os.environ.get("OTP_STORE", "database").lower() # "database" or "memory"
+OTP_TTL_SECONDS = int(os.environ.get("OTP_TTL_SECONDS", "600"))
+OTP_MAX_ENTRIES = int(os.environ.get("OTP_MAX_ENTRIES", "10000")) # Memory store only
+OTP_SWEEP_INTERVAL_SECONDS = int(os.environ.get("OTP_SWEEP_INTERVAL_SECONDS", "60"))
+
+
+@dataclass
+class OTPRecord:
+    otp: str
+    user_id: int
+    expires_at: datetime
+
+
+class OTPStore(ABC):
+    """Interface every OTP store implements. Expired records must never be returned by get()."""
+
+    def __init__(self, ttl_seconds: int = OTP_TTL_SECONDS, sweep_interval_seconds: int = OTP_SWEEP_INTERVAL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def _new_expiry(self) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+
+    @abstractmethod
+    async def put(self, email: str, otp: str, user_id: int) -> None:
+        """Stores a fresh OTP for the email, replacing any previous one."""
+
+    @abstractmethod
+    async def get(self, email: str) -> Optional[OTPRecord]:
+        """Returns the live OTP for the email, or None if missing/expired."""
+
+    @abstractmethod
+    async def delete(self, email: str) -> None:
+        """Removes the OTP for the email (after a successful reset)."""
+
+    @abstractmethod
+    async def sweep(self) -> int:
+        """Drops expired OTPs and returns how many were removed."""
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval_seconds)
+            try:
+                removed = await self.sweep()
+                if removed:
+                    logger.info("OTP sweep removed %s expired entries", removed)
+            except Exception as e: # Keep sweeping even if one run fails (e.g. DB briefly unavailable)
+                logger.error("Error during OTP sweep: %s", e)
+
+    def start(self):
+        """Starts background sweeping; call from the app lifespan."""
+        if self._sweeper is None and self.sweep_interval_seconds > 0:
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+
+class InMemoryOTPStore(OTPStore):
+    """Process-local store. Oldest entries are evicted once max_entries is reached."""
+
+    def __init__(self, ttl_seconds: int = OTP_TTL_SECONDS, max_entries: int = OTP_MAX_ENTRIES,
+                 sweep_interval_seconds: int = OTP_SWEEP_INTERVAL_SECONDS):
+        super().__init__(ttl_seconds, sweep_interval_seconds)
+        self.max_entries = max_entries
+        self._records: "OrderedDict[str, OTPRecord]" = OrderedDict()
+
+    async def put(self, email: str, otp: str, user_id: int) -> None:
+        self._records.pop(email, None)
+        self._records[email] = OTPRecord(otp=otp, user_id=user_id, expires_at=self._new_expiry())
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+
+    async def get(self, email: str) -> Optional[OTPRecord]:
+        record = self._records.get(email)
+        if record is None:
+            return None
+        if record.expires_at <= datetime.now(timezone.utc):
+            del self._records[email]
+            return None
+        return record
+
+    async def delete(self, email: str) -> None:
+        self._records.pop(email, None)
+
+    async def sweep(self) -> int:
+        now = datetime.now(timezone.utc)
+        expired = [email for email, record in self._records.items() if record.expires_at <= now]
+        for email in expired:
+            del self._records[email]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._records)
+
+
+class DatabaseOTPStore(OTPStore):
+    """Shared store backed by the password_reset_otps table."""
+
+    def __init__(self, session_factory=AsyncSessionLocal, ttl_seconds: int = OTP_TTL_SECONDS,
+                 sweep_interval_seconds: int = OTP_SWEEP_INTERVAL_SECONDS):
+        super().__init__(ttl_seconds, sweep_interval_seconds)
+        self.session_factory = session_factory
+
+    async def put(self, email: str, otp: str, user_id: int) -> None:
+        async with self.session_factory() as db:
+            await db.execute(delete(PasswordResetOTP).where(PasswordResetOTP.email == email))
+            db.add(PasswordResetOTP(email=email, otp=otp, user_id=user_id, expires_at=self._new_expiry()))
+            await db.commit()
+
+    async def get(self, email: str) -> Optional[OTPRecord]:
+        async with self.session_factory() as db:
+            row = (await db.execute(
+                select(PasswordResetOTP.otp, PasswordResetOTP.user_id, PasswordResetOTP.expires_at).where(
+                    PasswordResetOTP.email == email,
+                    PasswordResetOTP.expires_at > datetime.now(timezone.utc)
+                )
+            )).first()
+        return OTPRecord(otp=row.otp, user_id=row.user_id, expires_at=row.expires_at) if row else None
+
+    async def delete(self, email: str) -> None:
+        async with self.session_factory() as db:
+            await db.execute(delete(PasswordResetOTP).where(PasswordResetOTP.email == email))
+            await db.commit()
+
+    async def sweep(self) -> int:
+        async with self.session_factory() as db:
+            result = await db.execute(
+                delete(PasswordResetOTP).where(PasswordResetOTP.expires_at <= datetime.now(timezone.utc))
+            )
+            await db.commit()
+        return result.rowcount or 0
+
+
+def create_otp_store(backend: str = OTP_STORE_BACKEND) -> OTPStore:
+    if backend == "memory":
+        return InMemoryOTPStore()
+    if backend == "database":
+        return DatabaseOTPStore()
+    raise ValueError(f"Unknown OTP_STORE '{backend}' (expected 'database' or 'memory')")
+
+
+otp_store = create_otp_store()
@@ -0,0 +1,104 @@
+# backend/principal_cache.py
+# In-process cache of authenticated users ("principals"), keyed by user id.
+# Saves loading and snapshotting the full users row on every authenticated request; hits still
+# re-check the token version with a one-column primary-key read (see routers.auth.load_principal),
+# so a password reset revokes tokens in every worker immediately.
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from models import User
+
+# Seconds a cached principal stays valid (0 disables the cache).
+# Bounds how stale the other cached columns (e.g. email) can be in another worker.
+PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", "10000"))
+
+
+def snapshot_user(user: User) -> User:
+    """
+    Copies the column values of a User into a new detached instance.
+    The copy is not tied to any request's session, so it can be shared safely;
+    relationships are not loaded on it (routers only read column attributes of the principal).
+    """
+    copy = User(**{column.key: getattr(user, column.key) for column in User.__mapper__.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+
+class PrincipalCache:
+    """TTL + LRU cache of user snapshots with hit/miss counters."""
+
+    def __init__(self, ttl_seconds: float = PRINCIPAL_CACHE_TTL, max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, tuple[float, User]]" = OrderedDict()
+        self._lock = Lock() # Sync dependencies/benchmarks may touch it from threads
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_size > 0
+
+    def get(self, user_id: int, token_version: int) -> Optional[User]:
+        """Returns the cached principal if present, fresh and issued for the same token version."""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                expires_at, user = entry
+                if expires_at > now and user.token_version == token_version:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return user
+                del self._entries[user_id] # Expired or superseded by a newer token version
+            self.misses += 1
+            return None
+
+    def put(self, user: User) -> User:
+        """Stores (a snapshot of) the user and returns the snapshot."""
+        snapshot = snapshot_user(user)
+        if not self.enabled:
+            return snapshot
+        with self._lock:
+            self._entries[snapshot.id] = (time.monotonic() + self.ttl_seconds, snapshot)
+            self._entries.move_to_end(snapshot.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return snapshot
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+principal_cache = PrincipalCache()
@@ -0,0 +1,167 @@
+# backend/query_stats.py
+# Per-request SQL instrumentation.
+# The middleware puts a RequestQueryStats in a context variable; the cursor hooks installed on each
+# engine (see database.py) add every statement executed while handling that request. Afterwards the
+# totals go out as response headers, requests that look like N+1 loops are logged, and per-route
+# aggregates are kept for /metrics/db.
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# More statements than this in one request is flagged as a likely N+1
+SQL_QUERY_BUDGET = int(os.environ.get("SQL_QUERY_BUDGET", "20"))
+# ...as is the same statement running this many times with different parameters
+SQL_REPEAT_THRESHOLD = int(os.environ.get("SQL_REPEAT_THRESHOLD", "5"))
+SQL_SLOW_STATEMENT_MS = float(os.environ.get("SQL_SLOW_STATEMENT_MS", "100"))
+SQL_STATS_HEADERS = os.environ.get("SQL_STATS_HEADERS", "true").lower() in ("1", "true", "yes")
+STATEMENT_PREVIEW_CHARS = 200
+
+
+class RequestQueryStats:
+    """Statements executed while handling one request."""
+    __slots__ = ("count", "total_s", "slowest_s", "slowest_statement", "statement_counts")
+
+    def __init__(self):
+        self.count = 0
+        self.total_s = 0.0
+        self.slowest_s = 0.0
+        self.slowest_statement = None
+        self.statement_counts = Counter()
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.total_s += seconds
+        self.statement_counts[statement] += 1
+        if seconds > self.slowest_s:
+            self.slowest_s = seconds
+            self.slowest_statement = statement
+
+    def n_plus_one_reason(self, budget: int = SQL_QUERY_BUDGET, repeat_threshold: int = SQL_REPEAT_THRESHOLD) -> Optional[str]:
+        """Why this request looks like an N+1, or None."""
+        if self.statement_counts:
+            statement, repeats = self.statement_counts.most_common(1)[0]
+            if repeats >= repeat_threshold:
+                return f"same statement ran {repeats} times: {preview(statement)}"
+        if self.count > budget:
+            return f"{self.count} queries (budget {budget})"
+        return None
+
+
+current_query_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def preview(statement: Optional[str]) -> Optional[str]:
+    if statement is None:
+        return None
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= STATEMENT_PREVIEW_CHARS else statement[:STATEMENT_PREVIEW_CHARS] + "..."
+
+
+def install_query_hooks(sync_engine):
+    """Times every cursor execution made inside a request (use async_engine.sync_engine for async engines)."""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_query_stats.get() is not None:
+            conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_query_stats.get()
+        started = conn.info.get("query_started_at")
+        if stats is not None and started:
+            stats.record(statement, time.perf_counter() - started.pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        # after_cursor_execute doesn't run for failed statements
+        started = exception_context.connection.info.get("query_started_at") if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+def route_template(request: Request) -> str:
+    """Path pattern of the matched route, e.g. /appointments/doctors/{doctor_id}/schedule."""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class RouteQueryStats:
+    """Aggregates per "METHOD /route/template" across requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route: str, stats: RequestQueryStats, n_plus_one: Optional[str]):
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = {
+                    "requests": 0, "queries": 0, "max_queries": 0, "db_time_ms": 0.0,
+                    "max_db_time_ms": 0.0, "n_plus_one_requests": 0,
+                    "slowest_statement_ms": 0.0, "slowest_statement": None, "last_n_plus_one": None,
+                }
+            entry["requests"] += 1
+            entry["queries"] += stats.count
+            entry["max_queries"] = max(entry["max_queries"], stats.count)
+            entry["db_time_ms"] += stats.total_s * 1000
+            entry["max_db_time_ms"] = max(entry["max_db_time_ms"], stats.total_s * 1000)
+            if n_plus_one:
+                entry["n_plus_one_requests"] += 1
+                entry["last_n_plus_one"] = n_plus_one
+            if stats.slowest_s * 1000 > entry["slowest_statement_ms"]:
+                entry["slowest_statement_ms"] = stats.slowest_s * 1000
+                entry["slowest_statement"] = preview(stats.slowest_statement)
+
+    def stats(self) -> dict:
+        with self._lock:
+            routes = {route: dict(entry) for route, entry in self._routes.items()}
+        for entry in routes.values():
+            entry["avg_queries"] = round(entry["queries"] / entry["requests"], 2)
+            entry["avg_db_time_ms"] = round(entry["db_time_ms"] / entry["requests"], 3)
+            for key in ("db_time_ms", "max_db_time_ms", "slowest_statement_ms"):
+                entry[key] = round(entry[key], 3)
+        # Heaviest routes first
+        return dict(sorted(routes.items(), key=lambda item: item[1]["db_time_ms"], reverse=True))
+
+
+route_query_stats = RouteQueryStats()
+
+
+async def query_stats_middleware(request: Request, call_next):
+    stats = RequestQueryStats()
+    token = current_query_stats.set(stats)
+    try:
+        response = await call_next(request)
+    finally:
+        current_query_stats.reset(token)
+
+    route = f"{request.method} {route_template(request)}"
+    n_plus_one = stats.n_plus_one_reason()
+    route_query_stats.record(route, stats, n_plus_one)
+    db_time_ms = stats.total_s * 1000
+    if SQL_STATS_HEADERS:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{db_time_ms:.2f}"
+        response.headers.append("Server-Timing", f'db;dur={db_time_ms:.2f};desc="{stats.count} queries"')
+        if n_plus_one:
+            response.headers["X-DB-Warning"] = "possible-n+1"
+    if n_plus_one:
+        logger.warning("Possible N+1 on %s", route, extra={
+            "route": route, "queries": stats.count, "db_time_ms": round(db_time_ms, 1), "reason": n_plus_one,
+        })
+    if stats.slowest_s * 1000 >= SQL_SLOW_STATEMENT_MS:
+        logger.warning("Slow SQL on %s", route, extra={
+            "route": route, "statement_ms": round(stats.slowest_s * 1000, 1), "statement": preview(stats.slowest_statement),
+        })
+    return response
@@ -0,0 +1,112 @@
+# backend/read_replica.py
+# Routing of read-only requests to the replica (DATABASE_REPLICA_URL).
+# get_read_db hands out a replica session unless:
+#   - no replica is configured, or it can't be reached (falls back to the primary), or
+#   - the same client wrote something in the last REPLICA_READ_YOUR_WRITES_SECONDS, so a lagging
+#     replica could hide that write (read-your-writes).
+# A client is recognised by its bearer token (this worker) or by the rw_until cookie (any worker).
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy.exc import DBAPIError
+
+from database import AsyncSessionLocal, ReplicaSessionLocal
+
+logger = logging.getLogger(__name__)
+
+REPLICA_READ_YOUR_WRITES_SECONDS = float(os.environ.get("REPLICA_READ_YOUR_WRITES_SECONDS", "10"))
+RECENT_WRITERS_MAX = int(os.environ.get("RECENT_WRITERS_MAX", "10000"))
+READ_YOUR_WRITES_COOKIE = "rw_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class RecentWriters:
+    """Clients that wrote recently, with the time until which their reads stay on the primary."""
+
+    def __init__(self, window_seconds: float = REPLICA_READ_YOUR_WRITES_SECONDS, max_entries: int = RECENT_WRITERS_MAX):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._until: "OrderedDict[str, float]" = OrderedDict()
+
+    @staticmethod
+    def client_key(request: Request) -> Optional[str]:
+        authorization = request.headers.get("authorization")
+        if not authorization:
+            return None
+        # Don't keep raw tokens around
+        return hashlib.sha256(authorization.encode()).hexdigest()
+
+    def mark(self, request: Request) -> float:
+        until = time.time() + self.window_seconds
+        key = self.client_key(request)
+        if key is not None:
+            self._until.pop(key, None)
+            self._until[key] = until
+            while len(self._until) > self.max_entries:
+                self._until.popitem(last=False)
+        return until
+
+    def wrote_recently(self, request: Request) -> bool:
+        now = time.time()
+        cookie = request.cookies.get(READ_YOUR_WRITES_COOKIE)
+        if cookie:
+            try:
+                if float(cookie) > now:
+                    return True
+            except ValueError:
+                pass
+        key = self.client_key(request)
+        if key is None:
+            return False
+        until = self._until.get(key)
+        if until is None:
+            return False
+        if until <= now:
+            del self._until[key]
+            return False
+        return True
+
+
+recent_writers = RecentWriters()
+read_routing_stats = {"replica": 0, "primary_recent_write": 0, "primary_no_replica": 0, "replica_fallback": 0}
+
+
+async def get_read_db(request: Request):
+    """Session dependency for endpoints that only read. Never commit through it."""
+    if ReplicaSessionLocal is None:
+        read_routing_stats["primary_no_replica"] += 1
+        session = AsyncSessionLocal()
+    elif recent_writers.wrote_recently(request):
+        read_routing_stats["primary_recent_write"] += 1
+        session = AsyncSessionLocal()
+    else:
+        session = ReplicaSessionLocal()
+        try:
+            await session.connection() # Fail over now rather than in the middle of the endpoint
+            read_routing_stats["replica"] += 1
+        except (DBAPIError, OSError) as e:
+            logger.warning("Read replica unavailable, reading from primary: %s", e)
+            await session.close()
+            read_routing_stats["replica_fallback"] += 1
+            session = AsyncSessionLocal()
+    async with session as db:
+        yield db
+
+
+async def read_your_writes_middleware(request: Request, call_next):
+    """After a successful mutation, pins the client's reads to the primary for the window."""
+    response = await call_next(request)
+    if (ReplicaSessionLocal is not None and REPLICA_READ_YOUR_WRITES_SECONDS > 0
+            and request.method not in SAFE_METHODS and response.status_code < 400):
+        until = recent_writers.mark(request)
+        secure = request.url.scheme == "https"
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE, f"{until:.3f}", max_age=int(REPLICA_READ_YOUR_WRITES_SECONDS) + 1,
+            httponly=True, secure=secure, samesite="none" if secure else "lax", # Frontend is cross-site
+        )
+    return response
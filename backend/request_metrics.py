@@ -0,0 +1,155 @@
+# backend/request_metrics.py
+# Request latency histograms, in-flight gauges and status code counters per route template
+# (e.g. /appointments/doctors/{doctor_id}/schedule), exported in Prometheus text format at /metrics.
+# Written as plain ASGI middleware: it only wraps `send` to catch the status code, so the
+# per-request cost is one regex substitution, a dict lookup, two perf_counter() calls and a bisect.
+import os
+import re
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds in seconds (Prometheus "le" buckets); +Inf is implicit
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LATENCY_BUCKETS = tuple(
+    float(bound) for bound in os.environ.get("METRICS_LATENCY_BUCKETS", "").split(",") if bound.strip()
+) or DEFAULT_LATENCY_BUCKETS
+# Distinct (method, path) pairs remembered when resolving route templates
+ROUTE_CACHE_SIZE = 10000
+UNMATCHED_ROUTE = "unmatched" # 404s share one series instead of one per requested path
+# Numeric path segments (ids) never change which route matches, so they share a cache entry
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class RouteHistogram:
+    __slots__ = ("bucket_counts", "total_s", "count")
+
+    def __init__(self, bucket_count: int):
+        self.bucket_counts = [0] * (bucket_count + 1) # Last slot is +Inf
+        self.total_s = 0.0
+        self.count = 0
+
+
+class RequestMetrics:
+    """
+    Counters keyed by (method, route template). Everything is updated from the event loop
+    thread only, so no locking is needed.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.histograms: Dict[Tuple[str, str], RouteHistogram] = {}
+        self.status_counts: Dict[Tuple[str, str, int], int] = {}
+        self.in_flight: Dict[Tuple[str, str], int] = {}
+
+    def started(self, key: Tuple[str, str]):
+        self.in_flight[key] = self.in_flight.get(key, 0) + 1
+
+    def finished(self, key: Tuple[str, str], status_code: int, seconds: float):
+        self.in_flight[key] -= 1
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = RouteHistogram(len(self.buckets))
+        histogram.bucket_counts[bisect_left(self.buckets, seconds)] += 1
+        histogram.total_s += seconds
+        histogram.count += 1
+        status_key = (key[0], key[1], status_code)
+        self.status_counts[status_key] = self.status_counts.get(status_key, 0) + 1
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = [
+            "# HELP http_request_duration_seconds Request latency by route template.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in sorted(self.histograms.items()):
+            labels = f'method="{method}",route="{_escape(route)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram.bucket_counts):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {histogram.total_s:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {histogram.count}")
+
+        lines += [
+            "# HELP http_requests_total Completed requests by route template and status code.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status_code), count in sorted(self.status_counts.items()):
+            lines.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status_code}"}} {count}')
+
+        lines += [
+            "# HELP http_requests_in_flight Requests currently being handled.",
+            "# TYPE http_requests_in_flight gauge",
+        ]
+        for (method, route), count in sorted(self.in_flight.items()):
+            lines.append(f'http_requests_in_flight{{method="{method}",route="{_escape(route)}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+request_metrics = RequestMetrics()
+
+
+class RequestMetricsMiddleware:
+    """Add with app.add_middleware(RequestMetricsMiddleware); route templates come from the app's routes."""
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+        self._routes = None # Resolved on first request, once every router is included
+        self._normalize_ids = True
+        self._templates: Dict[Tuple[str, str], str] = {}
+
+    def _route_template(self, scope) -> str:
+        if self._routes is None:
+            self._routes = [route for route in scope["app"].routes if hasattr(route, "path_regex")]
+            # ...unless some route has a literal numeric segment
+            self._normalize_ids = not any(_ID_SEGMENT.search(route.path) for route in self._routes)
+        path = scope["path"]
+        cache_key = (scope["method"], _ID_SEGMENT.sub("/0", path) if self._normalize_ids else path)
+        template = self._templates.get(cache_key)
+        if template is not None:
+            return template
+        template = self._match(scope["method"], path) or UNMATCHED_ROUTE
+        if len(self._templates) >= ROUTE_CACHE_SIZE:
+            self._templates.clear() # Cheap bound; non-numeric path parameters keep the key space open
+        self._templates[cache_key] = template
+        return template
+
+    def _match(self, method: str, path: str) -> Optional[str]:
+        # Same rules as the router: first route whose path and method match; a path-only
+        # match (405) is still reported under that route
+        partial = None
+        for route in self._routes:
+            if route.path_regex.match(path):
+                methods = getattr(route, "methods", None)
+                if not methods or method in methods:
+                    return route.path
+                partial = partial or route.path
+        return partial
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        key = (scope["method"], self._route_template(scope))
+        status_code = 500 # If the app fails before starting a response
+        metrics = self.metrics
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metrics.started(key)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.finished(key, status_code, time.perf_counter() - started)
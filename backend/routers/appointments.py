@@ -1,26 +1,63 @@
 # backend/routers/appointments.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
-from pydantic import BaseModel, field_validator
-from sqlalchemy.orm import Session, joinedload, selectinload
-from sqlalchemy import distinct
-from typing import Annotated, List, Optional
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
+from sqlalchemy.orm import contains_eager, joinedload, load_only, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import distinct, select, delete, insert, update
+from typing import Annotated, List, Literal, Optional
 from database import get_db
-from models import TimeSlot, User, UserRole, Appointment, AppointmentStatus # Ensure correct import
-from sqlalchemy import exc, and_,func
+from read_replica import get_read_db
+from models import TimeSlot, User, UserRole, Appointment, AppointmentStatus, DoctorProfile, PatientProfile # Ensure correct import
+from sqlalchemy import exc, and_,func, tuple_, case, or_
 from datetime import datetime, date as py_date
-from datetime import timezone
+from datetime import timedelta, timezone
 # Import the new dependency
 from routers.auth import get_current_doctor, get_current_active_user
+from schedule_time import clinic_today, local_start, slot_starts_at
+from doctor_directory_cache import DirectoryPage, doctor_directory_cache, etag_matches, make_etag
+from doctor_search import doctor_search_query, search_terms
+from doctor_availability import refresh_next_free_slot, slot_claimed
 from models import Notification #import notification model
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/appointments",
     tags=["appointments"],
 )
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+# Read-only endpoints: served by the read replica when one is configured
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 # Dependency for endpoints managed by the logged-in doctor
 current_doctor_dependency = Annotated[User, Depends(get_current_doctor)]
+# Longest period DELETE /schedule/range clears in one request
+MAX_SCHEDULE_RANGE_DAYS = 366
+# Longest period GET /doctors/{doctor_id}/availability covers (a month view plus leading/trailing weeks)
+MAX_AVAILABILITY_RANGE_DAYS = 62
+# An appointment stays "upcoming" this long after it starts (it can still be joined, see routers/video.py)
+UPCOMING_GRACE_MINUTES = 60
+MAX_UPCOMING_LIMIT = 50
+# GET /requests pagination
+DEFAULT_REQUESTS_PAGE_SIZE = 50
+MAX_REQUESTS_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# GET /doctors
+DEFAULT_DIRECTORY_PAGE_SIZE = 50
+MAX_DIRECTORY_PAGE_SIZE = 200
+# GET /doctors/search
+DEFAULT_SEARCH_RESULTS = 20
+MAX_SEARCH_RESULTS = 50
+# GET /doctors/soonest
+DEFAULT_SOONEST_RESULTS = 10
+MAX_SOONEST_RESULTS = 50
+# POST /requests/batch
+MAX_BATCH_ACTION_SIZE = 200
+# GET /my-confirmed-patients
+DEFAULT_ROSTER_PAGE_SIZE = 100
+MAX_ROSTER_PAGE_SIZE = 500
+ROSTER_STATUSES = (AppointmentStatus.CONFIRMED, AppointmentStatus.COMPLETED) # Appointments that make someone "my patient"
 
 # --- Pydantic Models (NO end_time) ---
 
@@ -45,6 +82,18 @@ class Doctor(BaseModel): # For listing doctors
     class Config:
         from_attributes = True
 
+DOCTOR_LIST_ADAPTER = TypeAdapter(List[Doctor]) # Serializes directory pages straight to JSON bytes
+
+class SoonestAvailableDoctor(Doctor): # Response model for GET /doctors/soonest
+    full_name: Optional[str] = None
+    next_free_slot_at: datetime # UTC
+    next_free_date: py_date # The same instant in the clinic's timezone, as the schedule shows it
+    next_free_time: str # HH:MM
+
+class DoctorSearchResult(Doctor): # Response model for GET /doctors/search
+    full_name: Optional[str] = None
+    score: float # Relevance, higher is better (only comparable within one search)
+
 
 class TimeSlotBase(BaseModel): # Base for input/output
     start_time: str # Expect HH:MM (24hr)
@@ -53,19 +102,24 @@ class TimeSlotBase(BaseModel): # Base for input/output
     @classmethod
     def validate_time_format(cls, value):
         try:
-            # Validate format strictly HH:MM
-            datetime.strptime(value, "%H:%M")
-            return value
+            # Validate format strictly HH:MM and zero-pad it ("9:00" -> "09:00")
+            return datetime.strptime(value, "%H:%M").strftime("%H:%M")
         except ValueError:
             raise ValueError("Time must be in HH:MM (24-hour) format")
 
 class TimeSlotResponse(TimeSlotBase): # For returning saved slots
     id: int
     date: py_date # Return date object
+    starts_at: Optional[datetime] = None # Same instant as date + start_time, in UTC
 
     class Config:
         from_attributes = True
 
+class DayAvailability(BaseModel): # One day of GET /doctors/{doctor_id}/availability
+    date: py_date
+    free_slots: int
+    slots: Optional[List[TimeSlotResponse]] = None # Only with include_slots=true
+
 class ScheduleSaveSlot(TimeSlotBase): # For receiving slots to save
     pass # Only needs start_time
 
@@ -95,6 +149,27 @@ class PatientInfo(BaseModel): # For embedding patient details
     class Config:
         from_attributes = True
 
+class AppointmentBatchAction(BaseModel): # Request body for POST /requests/batch
+    action: Literal["confirm", "reject"]
+    appointment_ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_ACTION_SIZE)
+
+class SkippedAppointment(BaseModel):
+    id: int
+    reason: str
+
+class AppointmentBatchResult(BaseModel): # Response model for POST /requests/batch
+    action: str
+    updated: List[int] # Appointments that were pending and now are confirmed/rejected
+    skipped: List[SkippedAppointment] # Left unchanged, with why
+
+class RosterPatient(BaseModel): # Response model for GET /my-confirmed-patients
+    id: int # Patient user ID
+    username: str
+    full_name: Optional[str] = None
+    visit_count: int # Confirmed (or completed) appointments with this doctor
+    last_visit: Optional[py_date] = None # Most recent one before today (clinic calendar)
+    next_visit: Optional[py_date] = None # Soonest one from today on
+
 class AppointmentRequestDetails(BaseModel): # Response model for GET /requests
     id: int # Appointment ID
     appointment_date: py_date
@@ -103,6 +178,7 @@ class AppointmentRequestDetails(BaseModel): # Response model for GET /requests
     # Include related data
     patient: PatientInfo # Embed patient info
     start_time: str # Get start time from the related timeslot
+    starts_at: Optional[datetime] = None # Start as a UTC timestamp (from the timeslot)
     doctor: Doctor
 
     class Config:
@@ -117,51 +193,157 @@ def format_time_ampm(time_str_24: str) -> str:
         time_obj = datetime.strptime(time_str_24, "%H:%M")
         return time_obj.strftime("%I:%M %p").lstrip('0') # Format and remove leading 0 from hour
     except ValueError:
-        print(f"Warning: Could not format time '{time_str_24}' to AM/PM.")
+        logger.warning("Could not format time '%s' to AM/PM.", time_str_24)
         return time_str_24 # Return original on error
 
+def format_slot_time(slot: Optional[TimeSlot]) -> str:
+    """h:mm AM/PM of a slot in the clinic's timezone, from starts_at (no string parsing)."""
+    if slot is None:
+        return "N/A"
+    if slot.starts_at is None: # Legacy row not backfilled yet
+        return format_time_ampm(slot.start_time)
+    return local_start(slot.starts_at).strftime("%I:%M %p").lstrip('0')
+
 # --- API Endpoints ---
 
 @router.get("/doctors", response_model=List[Doctor]) # Response uses NEW Doctor model
-async def get_doctors(db: db_dependency):
+async def get_doctors(
+    db: read_db_dependency,
+    request: Request,
+    specialty: Optional[str] = Query(None, description="Only doctors with exactly this specialty"),
+    limit: int = Query(DEFAULT_DIRECTORY_PAGE_SIZE, ge=1, le=MAX_DIRECTORY_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page")
+):
+    """
+    Lists users with the doctor role, including selected profile info, ordered by username and
+    paged with a keyset cursor. Pages are cached serialized (doctor_directory_cache) until a
+    doctor registers or edits their profile, and carry an ETag: a client sending it back in
+    If-None-Match gets an empty 304 when nothing changed.
     """
-    Lists all users with the doctor role, including selected profile info.
+    cache_key = (specialty, limit, cursor)
+    page = doctor_directory_cache.get(cache_key)
+    if page is None:
+        generation = doctor_directory_cache.generation # Read before the query, see DoctorDirectoryCache.put
+        page = await load_directory_page(db, specialty, limit, cursor)
+        doctor_directory_cache.put(cache_key, page, generation)
+
+    headers = {"ETag": page.etag, "Cache-Control": "no-cache"} # Browsers may keep it but must revalidate
+    if page.next_cursor is not None:
+        headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    if etag_matches(request.headers.get("if-none-match"), page.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=page.body, media_type="application/json", headers=headers)
+
+async def load_directory_page(db: AsyncSession, specialty: Optional[str], limit: int, cursor: Optional[str]) -> DirectoryPage:
+    """One page of the directory from the database, serialized. Only the listed columns are read."""
+    logger.debug("Loading doctor directory page (specialty %s, cursor %s)", specialty, cursor)
+    query = select(
+        User.id, User.username, DoctorProfile.user_id.label("profile_id"),
+        DoctorProfile.specialty, DoctorProfile.years_experience, DoctorProfile.about_me,
+    ).outerjoin(DoctorProfile, DoctorProfile.user_id == User.id).where(User.role == UserRole.doctor)
+    if specialty:
+        query = query.where(DoctorProfile.specialty == specialty) # ix_doctor_profiles_specialty
+    if cursor:
+        query = query.where(User.username > cursor) # Usernames are unique, so they make the keyset
+    rows = (await db.execute(query.order_by(User.username).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].username
+    doctors = [
+        Doctor(
+            id=row.id,
+            username=row.username,
+            profile=DoctorProfileInfo(specialty=row.specialty, years_experience=row.years_experience, about_me=row.about_me)
+                if row.profile_id is not None else None,
+        )
+        for row in rows
+    ]
+    body = DOCTOR_LIST_ADAPTER.dump_json(doctors)
+    logger.debug("Found %s doctors.", len(doctors))
+    return DirectoryPage(body=body, etag=make_etag(body), next_cursor=next_cursor)
+
+@router.get("/doctors/search", response_model=List[DoctorSearchResult])
+async def search_doctors(
+    db: read_db_dependency,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to look for in name, specialty, qualifications and bio"),
+    limit: int = Query(DEFAULT_SEARCH_RESULTS, ge=1, le=MAX_SEARCH_RESULTS, description="How many results to return")
+):
     """
-    print("Fetching list of doctors with profiles...")
-    doctors_query = db.query(User).options(
-        joinedload(User.doctor_profile) # Eagerly load DoctorProfile relationship from User model
-    ).filter(User.role == UserRole.doctor).order_by(User.username)
-
-    doctors_result = doctors_query.all()
-    print(f"Found {len(doctors_result)} doctors.")
-
-    # Manually construct response to ensure correct nesting and field selection
-    response_list: List[Doctor] = []
-    for doc in doctors_result:
-         profile_info_subset = None
-         if doc.doctor_profile: # Check if the eager-loaded profile exists
-             # Create the DoctorProfileInfo subset from the full profile
-             profile_info_subset = DoctorProfileInfo.model_validate(doc.doctor_profile)
-
-         # Create the main Doctor response object including the profile subset
-         response_list.append(
-             Doctor(
-                 id=doc.id,
-                 username=doc.username,
-                 # email=doc.email, # Uncomment if needed
-                 # license_number=doc.license_number, # Uncomment if needed
-                 profile=profile_info_subset # Assign the subset object
-             )
-         )
-
-    return response_list
+    Full-text search over doctor profiles, best matches first. Every word has to match; the last
+    one also matches as a prefix, so it works while typing. Served from the text index set up in
+    doctor_search.py (FTS5 on SQLite, tsvector/GIN on PostgreSQL).
+    """
+    terms = search_terms(q)
+    if not terms:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Search needs at least one letter or digit.")
+
+    query = doctor_search_query(db.get_bind().dialect.name, terms, [
+        User.id, User.username, DoctorProfile.full_name,
+        DoctorProfile.specialty, DoctorProfile.years_experience, DoctorProfile.about_me,
+    ]).join(User, User.id == DoctorProfile.user_id).where(User.role == UserRole.doctor).limit(limit)
+    rows = (await db.execute(query)).all()
+    logger.debug("Doctor search %s: %s results", terms, len(rows))
+
+    return [
+        DoctorSearchResult(
+            id=row.id,
+            username=row.username,
+            full_name=row.full_name,
+            profile=DoctorProfileInfo(specialty=row.specialty, years_experience=row.years_experience, about_me=row.about_me),
+            score=row.score,
+        )
+        for row in rows
+    ]
+
+@router.get("/doctors/soonest", response_model=List[SoonestAvailableDoctor])
+async def get_soonest_available_doctors(
+    db: read_db_dependency,
+    specialty: str = Query(..., min_length=1, description="Specialty, exactly as on the doctor profiles"),
+    limit: int = Query(DEFAULT_SOONEST_RESULTS, ge=1, le=MAX_SOONEST_RESULTS, description="How many doctors to return")
+):
+    """
+    Doctors of a specialty who have a free slot, whoever can see the patient first listed first.
+    Reads the maintained DoctorProfile.next_free_slot_at in one range scan of
+    ix_doctor_profiles_specialty_next_free; doctors without a free slot are left out.
+    Read-only: a value that has slipped into the past is skipped here and recomputed by the
+    appointment sweeper on its next run.
+    """
+    now = datetime.now(timezone.utc)
+
+    rows = (await db.execute(
+        select(
+            User.id, User.username, DoctorProfile.full_name, DoctorProfile.next_free_slot_at,
+            DoctorProfile.specialty, DoctorProfile.years_experience, DoctorProfile.about_me,
+        ).join(User, User.id == DoctorProfile.user_id).where(
+            DoctorProfile.specialty == specialty,
+            DoctorProfile.next_free_slot_at >= now,
+            User.role == UserRole.doctor,
+        ).order_by(DoctorProfile.next_free_slot_at, DoctorProfile.user_id).limit(limit)
+    )).all()
+    logger.debug("Soonest available in %s: %s doctors", specialty, len(rows))
+
+    results = []
+    for row in rows:
+        local = local_start(row.next_free_slot_at)
+        results.append(SoonestAvailableDoctor(
+            id=row.id,
+            username=row.username,
+            full_name=row.full_name,
+            profile=DoctorProfileInfo(specialty=row.specialty, years_experience=row.years_experience, about_me=row.about_me),
+            next_free_slot_at=row.next_free_slot_at,
+            next_free_date=local.date(),
+            next_free_time=local.strftime("%H:%M"),
+        ))
+    return results
 
 # --- Schedule Management for Logged-in Doctor ---
 
 @router.get("/schedule", response_model=List[TimeSlotResponse])
 async def get_my_schedule_for_date(
     current_doctor: current_doctor_dependency, # Use auth dependency
-    db: db_dependency, # <<< CORRECTED
+    db: read_db_dependency, # <<< CORRECTED
     date: str = Query(..., description="Date in YYYY-MM-DD format") # Date from query param
 ):
     """Gets the logged-in doctor's schedule for a specific date."""
@@ -171,10 +353,10 @@ async def get_my_schedule_for_date(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date format. Use YYYY-MM-DD.")
 
     # Fetch slots for *this* doctor on *this* date
-    time_slots = db.query(TimeSlot).filter(
+    time_slots = (await db.scalars(select(TimeSlot).where(
         TimeSlot.doctor_id == current_doctor.id,
         TimeSlot.date == query_date
-    ).order_by(TimeSlot.start_time).all()
+    ).order_by(TimeSlot.starts_at))).all()
 
     return time_slots # Returns empty list if no schedule found
 
@@ -185,80 +367,69 @@ async def save_my_schedule(
     db: db_dependency
 ):
     target_date = schedule_request.date
-    print(f"Attempting to save schedule for doctor {current_doctor.id} on {target_date}") # DEBUG
+    logger.debug("Attempting to save schedule for doctor %s on %s", current_doctor.id, target_date)
 
     try:
-        # 1. Identify slots to be potentially removed
-        # Get IDs of all existing slots for the doctor on that day
-        existing_slots_on_day = db.query(TimeSlot).filter(
-            TimeSlot.doctor_id == current_doctor.id,
-            TimeSlot.date == target_date
-        ).all()
-
-        new_schedule_start_times = {slot.start_time for slot in schedule_request.slots}
-        slots_to_actually_delete_ids = []
+        # 1. Diff the day against the request with one query: every existing slot and whether
+        # any appointment (pending, confirmed, rejected, etc.) points at it
+        has_appointment = select(Appointment.id).where(Appointment.timeslot_id == TimeSlot.id).exists()
+        existing_slots_on_day = (await db.execute(
+            select(TimeSlot.id, TimeSlot.start_time, has_appointment.label("has_appointment"))
+            .where(TimeSlot.doctor_id == current_doctor.id, TimeSlot.date == target_date)
+            .order_by(TimeSlot.starts_at)
+        )).all()
+
+        # Requested times in request order, duplicates dropped
+        new_schedule_start_times = list(dict.fromkeys(slot.start_time for slot in schedule_request.slots))
+        requested = set(new_schedule_start_times)
+        slots_to_actually_delete_ids = set()
+        kept_slot_ids = set()
 
         for es in existing_slots_on_day:
-            if es.start_time not in new_schedule_start_times: # This slot is being removed by the new schedule
-                # Check if this slot has ANY appointments (pending, confirmed, etc.)
-                appointment_linked = db.query(Appointment.id).filter(Appointment.timeslot_id == es.id).first()
-                if appointment_linked:
-                    # If an appointment is linked, we cannot delete this TimeSlot due to FK constraint
-                    db.rollback() # Important to rollback before raising
-                    raise HTTPException(
-                        status_code=status.HTTP_409_CONFLICT,
-                        detail=f"Cannot update schedule. Time slot {es.start_time} on {target_date} has an existing appointment. Please manage the appointment first."
-                    )
-                else:
-                    # No appointment linked, safe to mark for deletion
-                    slots_to_actually_delete_ids.append(es.id)
-
-        # 2. Delete the identified old slots that are safe to delete
+            if es.start_time in requested:
+                kept_slot_ids.add(es.id)
+            elif es.has_appointment:
+                # If an appointment is linked, we cannot delete this TimeSlot due to FK constraint
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Cannot update schedule. Time slot {es.start_time} on {target_date} has an existing appointment. Please manage the appointment first.")
+            else:
+                # No appointment linked, safe to mark for deletion
+                slots_to_actually_delete_ids.add(es.id)
+
+        # 2. Delete the identified old slots in one statement
         if slots_to_actually_delete_ids:
-            print(f"Deleting time slots with IDs: {slots_to_actually_delete_ids}") # DEBUG
-            db.query(TimeSlot).filter(
+            logger.debug("Deleting time slots with IDs: %s", sorted(slots_to_actually_delete_ids))
+            await db.execute(delete(TimeSlot).where(
                 TimeSlot.id.in_(slots_to_actually_delete_ids)
-            ).delete(synchronize_session=False)
+            ).execution_options(synchronize_session=False))
             # No commit here yet, do it once at the end
 
-        # 3. Add the new slots from the request
-        # We only need to add slots that are not already in the existing_slots_on_day
-        # (unless their properties like is_booked were to change, but here they are always new/available)
-        final_existing_slot_times = {es.start_time for es in existing_slots_on_day if es.id not in slots_to_actually_delete_ids}
-        new_slots_to_add_db = []
-        for slot_data in schedule_request.slots:
-            if slot_data.start_time not in final_existing_slot_times:
-                # This slot is genuinely new or was one of the deletable ones
-                new_time_slot = TimeSlot(
-                    start_time=slot_data.start_time,
-                    date=target_date,
-                    doctor_id=current_doctor.id,
-                    is_booked=False # New slots created by doctor are available
-                )
-                new_slots_to_add_db.append(new_time_slot)
-
+        # 3. Add the slots that don't exist yet with one bulk INSERT
+        # (existing slots keep their id and booking state; new ones are always available)
+        final_existing_slot_times = {es.start_time for es in existing_slots_on_day if es.id in kept_slot_ids}
+        new_slots_to_add_db = [
+            {"start_time": start_time, "date": target_date, "doctor_id": current_doctor.id, "is_booked": False}
+            for start_time in new_schedule_start_times if start_time not in final_existing_slot_times
+        ]
         if new_slots_to_add_db:
-            print(f"Adding new time slots: {[s.start_time for s in new_slots_to_add_db]}") #DEBUG
-            db.add_all(new_slots_to_add_db)
+            logger.debug("Adding new time slots: %s", [s["start_time"] for s in new_slots_to_add_db])
+            await db.execute(insert(TimeSlot), new_slots_to_add_db)
 
         # 4. Commit all changes (deletions and additions)
-        db.commit()
-        print(f"Schedule for {target_date} saved successfully.") # DEBUG
+        await refresh_next_free_slot(db, current_doctor.id)
+        await db.commit()
+        logger.info("Schedule for %s saved successfully.", target_date)
 
     except HTTPException as http_exc: # Re-raise specific HTTPExceptions
-        # db.rollback() # Already handled before raising if inside this block
+        await db.rollback() # Nothing written yet, but don't leave the transaction open
         raise http_exc
     except Exception as e:
-        db.rollback() # Rollback on any other unexpected error
-        print(f"Error saving schedule for doctor {current_doctor.id} on {target_date}: {e}")
+        await db.rollback() # Rollback on any other unexpected error
+        logger.error("Error saving schedule for doctor %s on %s: %s", current_doctor.id, target_date, e)
         # Be careful not to expose too much detail from 'e' if it's a generic Exception
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to save schedule due to a server error.")
 
-    # Determine number of slots in the final schedule for the day
-    final_slots_count = db.query(TimeSlot).filter(
-        TimeSlot.doctor_id == current_doctor.id,
-        TimeSlot.date == target_date
-    ).count()
+    # Number of slots in the final schedule for the day (known from the diff, no need to count again)
+    final_slots_count = len(kept_slot_ids) + len(new_slots_to_add_db)
 
     return {"message": f"Schedule for {target_date.strftime('%Y-%m-%d')} updated successfully.", "slots_in_schedule": final_slots_count}
 
@@ -274,65 +445,96 @@ async def delete_my_schedule_for_date(
     except ValueError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date format. Use YYYY-MM-DD.")
 
-    print(f"Attempting to delete schedule for doctor {current_doctor.id} on {target_date}") # DEBUG
+    logger.debug("Attempting to delete schedule for doctor %s on %s", current_doctor.id, target_date)
+
+    deleted_count = await delete_schedule_between(db, current_doctor.id, target_date, target_date)
+    if not deleted_count:
+        return {"message": f"No schedule found for {target_date.strftime('%Y-%m-%d')} to delete."}
+    return {"message": f"Schedule for {target_date.strftime('%Y-%m-%d')} deleted successfully."}
+
+
+@router.delete("/schedule/range", status_code=status.HTTP_200_OK)
+async def delete_my_schedule_for_range(
+    current_doctor: current_doctor_dependency,
+    db: db_dependency,
+    start_date: str = Query(..., description="First date to clear, YYYY-MM-DD"),
+    end_date: str = Query(..., description="Last date to clear (inclusive), YYYY-MM-DD")
+):
+    """Clears every slot between two dates, e.g. for a leave period. Fails as a whole if any slot has an appointment."""
+    try:
+        first_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+        last_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date format. Use YYYY-MM-DD.")
+    if last_date < first_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end_date must not be before start_date.")
+    if (last_date - first_date).days >= MAX_SCHEDULE_RANGE_DAYS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Date range cannot exceed {MAX_SCHEDULE_RANGE_DAYS} days.")
+
+    logger.debug("Attempting to delete schedule for doctor %s from %s to %s", current_doctor.id, first_date, last_date)
+
+    deleted_count = await delete_schedule_between(db, current_doctor.id, first_date, last_date)
+    return {
+        "message": f"Schedule from {first_date.strftime('%Y-%m-%d')} to {last_date.strftime('%Y-%m-%d')} deleted successfully.",
+        "deleted_slots": deleted_count
+    }
 
+
+async def delete_schedule_between(db: AsyncSession, doctor_id: int, first_date: py_date, last_date: py_date) -> int:
+    """
+    Deletes a doctor's slots from first_date to last_date (inclusive) in one statement and
+    returns how many went. Raises 409 without deleting anything if any slot has an appointment.
+    """
+    in_range = (
+        TimeSlot.doctor_id == doctor_id,
+        TimeSlot.date >= first_date,
+        TimeSlot.date <= last_date,
+    )
     try:
-        # 1. Find all slots for the doctor on that date
-        slots_to_delete = db.query(TimeSlot).filter(
-            TimeSlot.doctor_id == current_doctor.id,
-            TimeSlot.date == target_date
-        ).all()
-
-        if not slots_to_delete:
-            return {"message": f"No schedule found for {target_date.strftime('%Y-%m-%d')} to delete."}
-
-        # 2. Check if any of these slots have linked appointments
-        for slot in slots_to_delete:
-            appointment_linked = db.query(Appointment.id).filter(Appointment.timeslot_id == slot.id).first()
-            if appointment_linked:
-                db.rollback() # Important
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail=f"Cannot delete schedule: Time slot {slot.start_time} on {target_date} has an existing appointment. Please manage appointments first."
-                )
-
-        # 3. If no linked appointments, proceed with deletion
-        deleted_count = 0
-        if slots_to_delete: # Should always be true if we passed the 'if not slots_to_delete' check
-            for slot in slots_to_delete: # Delete them individually or by ID list
-                db.delete(slot)
-            # Or more efficiently:
-            # slot_ids_to_delete = [s.id for s in slots_to_delete]
-            # deleted_count_result = db.query(TimeSlot).filter(TimeSlot.id.in_(slot_ids_to_delete)).delete(synchronize_session=False)
-            # deleted_count = deleted_count_result if deleted_count_result is not None else len(slot_ids_to_delete)
-            # For simplicity with individual delete then commit:
-            deleted_count = len(slots_to_delete)
-
-
-        db.commit()
-        print(f"Deleted {deleted_count} time slots for doctor {current_doctor.id} on {target_date}.") # DEBUG
-
-        return {"message": f"Schedule for {target_date.strftime('%Y-%m-%d')} deleted successfully."}
+        # 1. One query for the first slot in the range that has a linked appointment (any status)
+        conflict = (await db.execute(
+            select(TimeSlot.date, TimeSlot.start_time)
+            .join(Appointment, Appointment.timeslot_id == TimeSlot.id)
+            .where(*in_range)
+            .order_by(TimeSlot.starts_at)
+            .limit(1)
+        )).first()
+        if conflict:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Cannot delete schedule: Time slot {conflict.start_time} on {conflict.date} has an existing appointment. Please manage appointments first.")
+
+        # 2. Delete the whole range in one statement. The NOT EXISTS guard keeps a slot that
+        # got booked after the check above instead of orphaning its appointment.
+        has_appointment = select(Appointment.id).where(Appointment.timeslot_id == TimeSlot.id).exists()
+        result = await db.execute(
+            delete(TimeSlot).where(*in_range, ~has_appointment).execution_options(synchronize_session=False)
+        )
+        deleted_count = result.rowcount
+
+        await refresh_next_free_slot(db, doctor_id)
+        await db.commit()
+        logger.info("Deleted %s time slots for doctor %s from %s to %s.", deleted_count, doctor_id, first_date, last_date)
+        return deleted_count
 
     except HTTPException as http_exc: # Re-raise specific HTTPExceptions
+        await db.rollback()
         raise http_exc
     except Exception as e:
-        db.rollback()
-        print(f"Error deleting schedule for doctor {current_doctor.id} on {target_date}: {e}")
+        await db.rollback()
+        logger.error("Error deleting schedule for doctor %s from %s to %s: %s", doctor_id, first_date, last_date, e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to delete schedule due to a server error.")
-    
+
 # --- Patient Facing Endpoint ---
 
 @router.get("/doctors/{doctor_id}/schedule", response_model=List[TimeSlotResponse])
 async def get_doctor_schedule_for_patient(
     doctor_id: int,
-    db: db_dependency ,
+    db: read_db_dependency ,
     date: str = Query(..., description="Date in YYYY-MM-DD format"), # Date from query param
     
 ):
     """Gets a specific doctor's available schedule for a specific date (for patient viewing)."""
     # Validate doctor exists first
-    doctor = db.query(User).filter(User.id == doctor_id, User.role == UserRole.doctor).first()
+    doctor = await db.scalar(select(User.id).where(User.id == doctor_id, User.role == UserRole.doctor))
     if not doctor:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Doctor not found")
 
@@ -344,15 +546,67 @@ async def get_doctor_schedule_for_patient(
     # Fetch slots for the specific doctor and date
     # In future, add filter like `.filter(TimeSlot.is_booked == False)` if you add booking status
    # Inside get_doctor_schedule_for_patient function
-    time_slots = db.query(TimeSlot).filter(
+    time_slots = (await db.scalars(select(TimeSlot).where(
     TimeSlot.doctor_id == doctor_id,
     TimeSlot.date == query_date,
     TimeSlot.is_booked == False # <<< ADD THIS FILTER
-    ).order_by(TimeSlot.start_time).all()
+    ).order_by(TimeSlot.starts_at))).all()
 
     # Returns an empty list if no slots are scheduled or available (HTTP 200)
     return time_slots
 
+@router.get("/doctors/{doctor_id}/availability", response_model=List[DayAvailability])
+async def get_doctor_availability(
+    doctor_id: int,
+    db: read_db_dependency,
+    start_date: str = Query(..., description="First date, YYYY-MM-DD"),
+    end_date: str = Query(..., description="Last date (inclusive), YYYY-MM-DD"),
+    include_slots: bool = Query(False, description="Also return the free slots of each day")
+):
+    """
+    Free-slot counts per day for a doctor over a date range (e.g. a calendar month), so the
+    booking calendar can mark bookable days without one schedule request per day.
+    Days without free slots are left out.
+    """
+    try:
+        first_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+        last_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date format. Use YYYY-MM-DD.")
+    if last_date < first_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end_date must not be before start_date.")
+    if (last_date - first_date).days >= MAX_AVAILABILITY_RANGE_DAYS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Date range cannot exceed {MAX_AVAILABILITY_RANGE_DAYS} days.")
+
+    doctor = await db.scalar(select(User.id).where(User.id == doctor_id, User.role == UserRole.doctor))
+    if not doctor:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Doctor not found")
+
+    # Both queries are answered from ix_time_slots_doctor_date_booked
+    free_in_range = (
+        TimeSlot.doctor_id == doctor_id,
+        TimeSlot.date >= first_date,
+        TimeSlot.date <= last_date,
+        TimeSlot.is_booked == False,
+    )
+    if not include_slots:
+        rows = (await db.execute(
+            select(TimeSlot.date, func.count(TimeSlot.id).label("free_slots"))
+            .where(*free_in_range)
+            .group_by(TimeSlot.date)
+            .order_by(TimeSlot.date)
+        )).all()
+        return [DayAvailability(date=row.date, free_slots=row.free_slots) for row in rows]
+
+    # With slots: one ordered read, grouped per day here
+    days: List[DayAvailability] = []
+    for slot in (await db.scalars(select(TimeSlot).where(*free_in_range).order_by(TimeSlot.starts_at))).all():
+        if not days or days[-1].date != slot.date:
+            days.append(DayAvailability(date=slot.date, free_slots=0, slots=[]))
+        days[-1].free_slots += 1
+        days[-1].slots.append(TimeSlotResponse.model_validate(slot))
+    return days
+
 # --- Booking Endpoint (Basic Validation) ---
 
 # --- REPLACED Booking Endpoint ---
@@ -377,76 +631,71 @@ async def book_appointment(
     current_patient_id = current_user.id # Get ID from the authenticated user object
 
     # 2. Validate Input Data
-    # Validate doctor exists
-    doctor = db.query(User).filter(User.id == request.doctor_id, User.role == UserRole.doctor).first()
-    if not doctor:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Selected doctor not found.")
-
     # Validate date and time format
     try:
         appointment_date = datetime.strptime(request.date, "%Y-%m-%d").date()
-        appointment_time_str = request.time
-        datetime.strptime(appointment_time_str, "%H:%M") # Validate HH:MM format
+        appointment_starts_at = slot_starts_at(appointment_date, request.time) # Also validates HH:MM
     except ValueError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date (YYYY-MM-DD) or time (HH:MM) format provided.")
 
-    # 3. Transaction: Check Slot Availability & Perform Booking
+    # 3. Transaction: Claim the slot & create the appointment
     try:
-        # Find the specific timeslot, ensuring it's for the correct doctor/date/time AND is not already booked
-        # Note: For high concurrency, adding .with_for_update() might be needed,
-        # but requires careful handling depending on DB backend (less critical for SQLite usually)
-        available_slot = db.query(TimeSlot).filter(
+        # Plain read first (takes no locks): most requests for a slot that is already gone stop
+        # here with a 409 instead of queueing for the write lock behind the winner.
+        # Matched on the exact start instant (ix_time_slots_doctor_starts_at), so "9:00" finds "09:00".
+        slot = (await db.execute(select(TimeSlot.id, TimeSlot.is_booked).where(
             TimeSlot.doctor_id == request.doctor_id,
-            TimeSlot.date == appointment_date,
-            TimeSlot.start_time == appointment_time_str,
-            TimeSlot.is_booked == False # *** The crucial availability check ***
-        ).first()
-
-        # If no available slot is found
-        if not available_slot:
-            # Check if the slot exists but is already booked to give a more specific error
-            already_booked = db.query(TimeSlot.id).filter(
+            TimeSlot.starts_at == appointment_starts_at,
+        ).order_by(TimeSlot.is_booked, TimeSlot.id).limit(1))).first() # A free slot sorts first
+        if slot is None:
+            # Legacy slot whose starts_at hasn't been backfilled yet (migrations not run): match it on
+            # the wall-clock date and time instead. Only reached on a miss, so the usual path stays indexed.
+            slot = (await db.execute(select(TimeSlot.id, TimeSlot.is_booked).where(
                 TimeSlot.doctor_id == request.doctor_id,
                 TimeSlot.date == appointment_date,
-                TimeSlot.start_time == appointment_time_str,
-                TimeSlot.is_booked == True
-            ).scalar() # Use scalar() to efficiently check existence
-
-            if already_booked:
-                # 409 Conflict is appropriate for trying to book an already booked slot
-                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="This time slot has already been booked.")
-            else:
-                # 404 Not Found if the slot never existed or wasn't scheduled by the doctor
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Selected time slot is not available or does not exist for this doctor on this date.")
-
-        # --- Slot is available, proceed with booking ---
-
-        # 4. Mark the TimeSlot as booked
-        print(f"Marking TimeSlot {available_slot.id} as booked.") # Log action
-        available_slot.is_booked = True
-        db.add(available_slot) # Add to session to stage the change
+                TimeSlot.start_time == local_start(appointment_starts_at).strftime("%H:%M"),
+                TimeSlot.starts_at.is_(None),
+            ).order_by(TimeSlot.is_booked, TimeSlot.id).limit(1))).first()
+
+        if slot is None:
+            doctor = await db.scalar(select(User.id).where(User.id == request.doctor_id, User.role == UserRole.doctor))
+            if not doctor:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Selected doctor not found.")
+            # 404 Not Found if the slot never existed or wasn't scheduled by the doctor
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Selected time slot is not available or does not exist for this doctor on this date.")
+
+        # Claim the slot with one conditional UPDATE. The database re-checks "is_booked = false"
+        # atomically, so of two concurrent bookings that both saw it free exactly one gets the id
+        # back; the other gets nothing and is told the slot is taken.
+        claimed_slot_id = None
+        if not slot.is_booked:
+            claimed_slot_id = await db.scalar(
+                update(TimeSlot)
+                .where(TimeSlot.id == slot.id, TimeSlot.is_booked == False)
+                .values(is_booked=True)
+                .returning(TimeSlot.id)
+                .execution_options(synchronize_session=False)
+            )
+        if claimed_slot_id is None:
+            # 409 Conflict is appropriate for trying to book an already booked slot
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="This time slot has already been booked.")
 
-        # 5. Create the new Appointment record
-        print(f"Creating Appointment record for patient {current_patient_id}.") # Log action
+        # --- Slot is ours (row locked until commit), create the appointment ---
+        logger.debug("Claimed TimeSlot %s for patient %s.", claimed_slot_id, current_patient_id)
         new_appointment = Appointment(
             patient_id=current_patient_id, # Use the authenticated patient's ID
             doctor_id=request.doctor_id,
-            timeslot_id=available_slot.id, # Link to the specific TimeSlot
+            timeslot_id=claimed_slot_id, # Link to the specific TimeSlot
             appointment_date=appointment_date, # Store date on appointment too
             status=AppointmentStatus.PENDING # Initial status
             # created_at/updated_at usually handled by DB default/onupdate
         )
         db.add(new_appointment)
+        await slot_claimed(db, request.doctor_id, appointment_starts_at) # Moves the doctor's "next free" on if this was it
 
-        # 6. Commit the transaction (saves both TimeSlot update and Appointment creation)
-        db.commit()
-        print("Booking transaction committed.") # Log action
-
-        # 7. Refresh objects to get DB-generated values (like ID, default timestamps)
-        db.refresh(new_appointment)
-        db.refresh(available_slot)
-
-        print(f"Appointment {new_appointment.id} created successfully.") # Log success
+        # 4. Commit the transaction (saves both TimeSlot update and Appointment creation)
+        await db.commit() # The flush assigns new_appointment.id; no refresh needed
+        logger.info("Appointment %s created successfully.", new_appointment.id) # Log success
 
         # Return success response
         return {
@@ -455,19 +704,18 @@ async def book_appointment(
             }
 
     except HTTPException as http_exc:
-         db.rollback() # Rollback on known HTTP errors raised above
-         print(f"HTTP Exception during booking: {http_exc.detail}") # Log action
+         await db.rollback() # Rollback on known HTTP errors raised above
+         logger.debug("HTTP Exception during booking: %s", http_exc.detail) # Log action
          raise http_exc # Re-raise the exception
 
-    except exc.IntegrityError as e: # Catch potential unique constraint violations (e.g., on timeslot_id)
-        db.rollback()
-        print(f"Database Integrity Error during booking: {e}") # Log action
-        # This can happen in race conditions if two requests try to book the exact same slot simultaneously
+    except exc.IntegrityError as e: # e.g. the slot still has an (old) appointment row pointing at it
+        await db.rollback() # Also releases the claimed slot
+        logger.warning("Database Integrity Error during booking: %s", e) # Log action
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Booking conflict occurred. The slot may have just been booked. Please try again.")
 
     except Exception as e:
-        db.rollback() # Rollback on any other unexpected error
-        print(f"Unexpected error during booking commit: {e}") # Log action
+        await db.rollback() # Rollback on any other unexpected error
+        logger.error("Unexpected error during booking commit: %s", e) # Log action
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not process booking request due to an internal server error.")
     
 
@@ -475,69 +723,161 @@ async def book_appointment(
 
 @router.get("/requests", response_model=List[AppointmentRequestDetails])
 async def get_my_appointment_requests(
-    db: db_dependency,
+    db: read_db_dependency,
+    response: Response,
     current_doctor: current_doctor_dependency, # Ensures only logged-in doctor can access
-    status: Optional[str] = Query(None, description="Filter by status (e.g., PENDING, CONFIRMED, REJECTED)") # Optional filter
+    status: Optional[str] = Query(None, description="Filter by status (e.g., PENDING, CONFIRMED, REJECTED)"), # Optional filter
+    limit: int = Query(DEFAULT_REQUESTS_PAGE_SIZE, ge=1, le=MAX_REQUESTS_PAGE_SIZE, description="Page size"),
+    cursor: Optional[int] = Query(None, description="X-Next-Cursor value from the previous page"),
+    from_date: Optional[py_date] = Query(None, description="Only appointments on or after this date (YYYY-MM-DD)"),
+    to_date: Optional[py_date] = Query(None, description="Only appointments on or before this date (YYYY-MM-DD)")
 ):
-    """Fetches appointment requests for the logged-in doctor."""
-    print(f"Fetching appointment requests for doctor {current_doctor.id}, string filter status: '{status}'") # DEBUG
-
-    query = db.query(Appointment).filter(Appointment.doctor_id == current_doctor.id)
+    """
+    Fetches appointment requests for the logged-in doctor, newest first, one page at a time.
+    When there are more, the response carries an X-Next-Cursor header to pass as ?cursor= for
+    the next page. Each page is an index range scan from the cursor, however many requests exist.
+    """
+    logger.debug("Fetching appointment requests for doctor %s, status filter '%s', cursor %s", current_doctor.id, status, cursor)
+
+    # Only the columns the response needs; no ORM objects are built
+    query = select(
+        Appointment.id, Appointment.appointment_date, Appointment.status, Appointment.created_at,
+        TimeSlot.start_time, TimeSlot.starts_at,
+        User.id.label("patient_id"), User.username.label("patient_username"),
+    ).join(TimeSlot, TimeSlot.id == Appointment.timeslot_id).join(User, User.id == Appointment.patient_id).where(
+        Appointment.doctor_id == current_doctor.id
+    )
 
     if status:
         try:
-            # Attempt to convert the incoming string (e.g., "PENDING") to the Enum member
-            status_enum = AppointmentStatus(status.upper()) # Convert to uppercase for robustness
-            query = query.filter(Appointment.status == status_enum) # Use the Enum member in the query
-            print(f"Applied filter for status: {status_enum}") # DEBUG
+            # Enum values are lowercase; accept any case (the frontend sends e.g. "PENDING")
+            status_enum = AppointmentStatus(status.lower())
+            query = query.where(Appointment.status == status_enum) # Use the Enum member in the query
+            logger.debug("Applied filter for status: %s", status_enum)
         except ValueError:
             # Handle case where the provided status string is not a valid enum member
-            print(f"Warning: Invalid status filter value received: '{status}'. Ignoring filter.") # DEBUG WARNING
-            # Optionally raise HTTPException 400 Bad Request? Or just ignore the filter? Ignore for now.
-            # raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid status value: {status}")
-            pass # Ignore invalid status filter
-
-    # Order by creation time or appointment date as preferred
-    appointments = query.options(
-        joinedload(Appointment.patient), # Load patient data
-        joinedload(Appointment.time_slot) # Load time_slot data (for start_time)
-        # No need to explicitly load doctor here, as current_doctor already has it,
-        # BUT Pydantic needs the data structured correctly for validation.
-        # We can pass the current_doctor object or extract relevant fields.
-    ).order_by(Appointment.created_at.desc()).all()
-
-    # Prepare response data, including necessary related info
-    response_data = []
-    for appt in appointments:
-        # Check if required relationships were loaded successfully
-        if appt.time_slot and appt.patient:
-             try: # Add try-except around model validation for robustness
-                response_data.append(
-                    AppointmentRequestDetails(
-                        id=appt.id,
-                        appointment_date=appt.appointment_date,
-                        status=appt.status,
-                        created_at=appt.created_at,
-                        patient=PatientInfo.model_validate(appt.patient),
-                        start_time=appt.time_slot.start_time,
-                        # *** ADD DOCTOR INFO HERE ***
-                        # Since current_doctor IS the doctor for these requests,
-                        # we can use the Doctor model to validate/structure it.
-                        doctor=Doctor.model_validate(current_doctor)
-                        # *** END ADDED DOCTOR INFO ***
-                    )
-                )
-             except Exception as e:
-                 # Log if Pydantic validation fails for a specific appointment
-                 print(f"Warning: Could not validate Appointment {appt.id} for response. Error: {e}")
-        else:
-             print(f"Warning: Appointment {appt.id} is missing related Patient or TimeSlot data.")
-
+            logger.warning("Invalid status filter value received: '%s'. Ignoring filter.", status)
+    if from_date:
+        query = query.where(Appointment.appointment_date >= from_date)
+    if to_date:
+        query = query.where(Appointment.appointment_date <= to_date)
+    if cursor is not None:
+        # Keyset: rows strictly after the cursor row in (created_at DESC, id DESC) order. The cursor
+        # row's created_at is read in SQL so no timestamp has to round-trip through the client.
+        cursor_created_at = select(Appointment.created_at).where(Appointment.id == cursor).scalar_subquery()
+        query = query.where(tuple_(Appointment.created_at, Appointment.id) < tuple_(cursor_created_at, cursor))
+
+    # One extra row tells whether another page exists
+    rows = (await db.execute(query.order_by(Appointment.created_at.desc(), Appointment.id.desc()).limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = str(rows[-1].id)
+
+    # The doctor is the same for every row
+    doctor = Doctor.model_validate(current_doctor)
+    response_data = [
+        AppointmentRequestDetails(
+            id=row.id,
+            appointment_date=row.appointment_date,
+            status=row.status,
+            created_at=row.created_at,
+            patient=PatientInfo(id=row.patient_id, username=row.patient_username),
+            start_time=row.start_time,
+            starts_at=row.starts_at,
+            doctor=doctor,
+        )
+        for row in rows
+    ]
 
-    print(f"Found {len(response_data)} requests matching filter.")
+    logger.debug("Found %s requests matching filter.", len(response_data))
     return response_data
 
 
+def confirmation_message(doctor_username: str, appointment_date: py_date, formatted_time: str) -> str:
+    return f"Confirmed: Your appointment with Dr. {doctor_username} on {appointment_date} at {formatted_time} is confirmed."
+
+def rejection_message(doctor_username: str, appointment_date: py_date) -> str:
+    return f"Rejected: Your appointment request for {appointment_date} with Dr. {doctor_username} was rejected."
+
+@router.post("/requests/batch", response_model=AppointmentBatchResult)
+async def batch_update_appointment_requests(
+    batch: AppointmentBatchAction,
+    db: db_dependency,
+    current_doctor: current_doctor_dependency
+):
+    """
+    Confirms or rejects several pending appointment requests at once, in one transaction:
+    one UPDATE for the appointments, one for their slots (reject), one bulk INSERT for the
+    notifications. Ids that are not the doctor's or no longer pending are skipped and reported.
+    """
+    appointment_ids = list(dict.fromkeys(batch.appointment_ids)) # Duplicates dropped, order kept
+    confirming = batch.action == "confirm"
+    new_status = AppointmentStatus.CONFIRMED if confirming else AppointmentStatus.REJECTED
+    logger.debug("Batch %s of %s appointments for doctor %s", batch.action, len(appointment_ids), current_doctor.id)
+
+    try:
+        # 1. Move every still-pending appointment of this doctor in one statement. The status
+        # condition is re-checked by the database, so a concurrent single confirm/reject can't
+        # make an appointment change twice.
+        changed = (await db.execute(
+            update(Appointment)
+            .where(
+                Appointment.id.in_(appointment_ids),
+                Appointment.doctor_id == current_doctor.id,
+                Appointment.status == AppointmentStatus.PENDING,
+            )
+            .values(status=new_status)
+            .returning(Appointment.id, Appointment.patient_id, Appointment.appointment_date, Appointment.timeslot_id)
+            .execution_options(synchronize_session=False)
+        )).all()
+        slot_ids = [row.timeslot_id for row in changed]
+
+        # 2. Rejected requests free their slots
+        slots = {}
+        if changed and not confirming:
+            await db.execute(update(TimeSlot).where(TimeSlot.id.in_(slot_ids)).values(is_booked=False).execution_options(synchronize_session=False))
+            await refresh_next_free_slot(db, current_doctor.id)
+        elif changed: # Confirmation messages include the time
+            slots = {slot.id: slot for slot in (await db.execute(
+                select(TimeSlot.id, TimeSlot.start_time, TimeSlot.starts_at).where(TimeSlot.id.in_(slot_ids))
+            )).all()}
+
+        # 3. One notification per patient and appointment, inserted together
+        notifications = [
+            {
+                "user_id": row.patient_id,
+                "appointment_id": row.id,
+                "message": confirmation_message(current_doctor.username, row.appointment_date, format_slot_time(slots.get(row.timeslot_id)))
+                    if confirming else rejection_message(current_doctor.username, row.appointment_date),
+            }
+            for row in changed
+        ]
+        if notifications:
+            await db.execute(insert(Notification), notifications)
+
+        # 4. Explain the ones left alone
+        skipped = []
+        updated_ids = {row.id for row in changed}
+        remaining = [appointment_id for appointment_id in appointment_ids if appointment_id not in updated_ids]
+        if remaining:
+            current = dict((await db.execute(select(Appointment.id, Appointment.status).where(
+                Appointment.id.in_(remaining), Appointment.doctor_id == current_doctor.id
+            ))).all())
+            skipped = [
+                SkippedAppointment(id=appointment_id, reason=f"Appointment is already {current[appointment_id].value}." if appointment_id in current
+                                   else "Appointment request not found or you are not authorized.")
+                for appointment_id in remaining
+            ]
+
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error("Error in batch %s of appointments for doctor %s: %s", batch.action, current_doctor.id, e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to {batch.action} appointments.")
+
+    logger.info("Batch %s by doctor %s: %s updated, %s skipped.", batch.action, current_doctor.id, len(changed), len(skipped))
+    return AppointmentBatchResult(action=batch.action, updated=[row.id for row in changed], skipped=skipped)
+
 @router.post("/requests/{appointment_id}/confirm", status_code=status.HTTP_200_OK)
 async def confirm_appointment_request(
     appointment_id: int,
@@ -545,13 +885,15 @@ async def confirm_appointment_request(
     current_doctor: current_doctor_dependency
 ):
     """Confirms a pending appointment request."""
-    print(f"Attempting to confirm appointment {appointment_id} for doctor {current_doctor.id}") # DEBUG
+    logger.debug("Attempting to confirm appointment %s for doctor %s", appointment_id, current_doctor.id)
 
     # Find the appointment, ensure it belongs to this doctor and is pending
-    appointment = db.query(Appointment).filter(
+    appointment = await db.scalar(select(Appointment).options(
+        joinedload(Appointment.time_slot) # Needed for the notification time (no lazy loads in async)
+    ).where(
         Appointment.id == appointment_id,
         Appointment.doctor_id == current_doctor.id
-    ).first()
+    ))
 
     if not appointment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Appointment request not found or you are not authorized.")
@@ -562,26 +904,25 @@ async def confirm_appointment_request(
     # Update status to confirmed
     appointment.status = AppointmentStatus.CONFIRMED
 
-    appointment_time_str = appointment.time_slot.start_time if appointment.time_slot else "N/A"
-    formatted_time = format_time_ampm(appointment_time_str) # Format the time
+    formatted_time = format_slot_time(appointment.time_slot) # Format the time
 
 
     # --- Create Notification ---
      # Use the formatted time in the message
-    notification_message = f"Confirmed: Your appointment with Dr. {current_doctor.username} on {appointment.appointment_date} at {formatted_time} is confirmed."
+    notification_message = confirmation_message(current_doctor.username, appointment.appointment_date, formatted_time)
     new_notification = Notification(
         user_id=appointment.patient_id,
         message=notification_message,
         appointment_id=appointment.id
     )
     db.add(new_notification)
-    print(f"Created confirmation notification for user {appointment.patient_id}") # DEBUG
+    logger.debug("Created confirmation notification for user %s", appointment.patient_id)
     # --- End Create Notification ---
 
 
-    db.commit()
-    db.refresh(appointment)
-    print(f"Appointment {appointment_id} confirmed.") # DEBUG
+    await db.commit()
+    await db.refresh(appointment)
+    logger.info("Appointment %s confirmed.", appointment_id)
 
     # +++ TODO: Implement Notification Logic +++
 # Example: send_notification(user_id=appointment.patient_id, message=f"Your appointment request for {appointment.appointment_date} with Dr. {current_doctor.username} has been confirmed.")
@@ -597,13 +938,13 @@ async def reject_appointment_request(
     current_doctor: current_doctor_dependency
 ):
     """Rejects a pending appointment request and makes the timeslot available again."""
-    print(f"Attempting to reject appointment {appointment_id} for doctor {current_doctor.id}") # DEBUG
+    logger.debug("Attempting to reject appointment %s for doctor %s", appointment_id, current_doctor.id)
 
     # Find the appointment, ensure it belongs to this doctor and is pending
-    appointment = db.query(Appointment).filter(
+    appointment = await db.scalar(select(Appointment).where(
         Appointment.id == appointment_id,
         Appointment.doctor_id == current_doctor.id
-    ).first()
+    ))
 
     if not appointment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Appointment request not found or you are not authorized.")
@@ -613,20 +954,20 @@ async def reject_appointment_request(
 
     try:
         # Find the related timeslot to make it available again
-        time_slot = db.query(TimeSlot).filter(TimeSlot.id == appointment.timeslot_id).first()
+        time_slot = await db.get(TimeSlot, appointment.timeslot_id)
 
         if time_slot:
             time_slot.is_booked = False # Make slot available again
-            print(f"Timeslot {time_slot.id} marked as available.") # DEBUG
+            logger.debug("Timeslot %s marked as available.", time_slot.id)
         else:
              # This shouldn't happen if FK constraint is working, but log it
-             print(f"Warning: Could not find TimeSlot {appointment.timeslot_id} for rejected appointment {appointment_id}")
+             logger.warning("Could not find TimeSlot %s for rejected appointment %s", appointment.timeslot_id, appointment_id)
 
         # Update appointment status to rejected
         appointment.status = AppointmentStatus.REJECTED
 
         # --- Create Notification ---
-        notification_message = f"Rejected: Your appointment request for {appointment.appointment_date} with Dr. {current_doctor.username} was rejected."
+        notification_message = rejection_message(current_doctor.username, appointment.appointment_date)
         # Add reason later if available
         new_notification = Notification(
             user_id=appointment.patient_id,
@@ -634,14 +975,15 @@ async def reject_appointment_request(
             appointment_id=appointment.id
         )
         db.add(new_notification)
-        print(f"Created rejection notification for user {appointment.patient_id}") # DEBUG
+        logger.debug("Created rejection notification for user %s", appointment.patient_id)
         # --- End Create Notification ---
 
-
-        db.commit()
-        db.refresh(appointment)
-        if time_slot: db.refresh(time_slot)
-        print(f"Appointment {appointment_id} rejected.") # DEBUG
+        await db.flush() # Write is_booked before recomputing from the slots
+        await refresh_next_free_slot(db, current_doctor.id)
+        await db.commit()
+        await db.refresh(appointment)
+        if time_slot: await db.refresh(time_slot)
+        logger.info("Appointment %s rejected.", appointment_id)
 
          # +++ TODO: Implement Notification Logic +++
     # Example: send_notification(user_id=appointment.patient_id, message=f"Your appointment request for {appointment.appointment_date} with Dr. {current_doctor.username} has been rejected.")
@@ -650,154 +992,131 @@ async def reject_appointment_request(
         return {"message": "Appointment rejected successfully.", "appointment_status": appointment.status}
 
     except Exception as e:
-        db.rollback()
-        print(f"Error rejecting appointment {appointment_id}: {e}")
+        await db.rollback()
+        logger.error("Error rejecting appointment %s: %s", appointment_id, e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to reject appointment.")
     
     #test comment 123
 
     #add new endpoint
 
+def doctor_summary(doctor: User) -> Doctor:
+    """Doctor response object including the profile subset (doctor_profile must be loaded)."""
+    profile = DoctorProfileInfo.model_validate(doctor.doctor_profile) if doctor.doctor_profile else None
+    return Doctor(id=doctor.id, username=doctor.username, profile=profile)
+
+async def next_confirmed_appointments(db: AsyncSession, user: User, limit: int) -> List[AppointmentRequestDetails]:
+    """
+    The user's next confirmed appointments (as patient or doctor) in chronological order.
+    One query: ordered by TimeSlot.starts_at and cut off with LIMIT in SQL. For a doctor it is a
+    range scan of ix_time_slots_doctor_starts_at from "now", so past appointments are never read.
+    Only the columns the response uses are loaded.
+    """
+    if user.role not in (UserRole.patient, UserRole.doctor):
+        return []
+    # Keep an appointment that has started but can still be joined (video join window)
+    earliest_start = datetime.now(timezone.utc) - timedelta(minutes=UPCOMING_GRACE_MINUTES)
+
+    query = select(Appointment).join(Appointment.time_slot).options(
+        load_only(Appointment.id, Appointment.appointment_date, Appointment.status, Appointment.created_at),
+        contains_eager(Appointment.time_slot).load_only(TimeSlot.start_time, TimeSlot.starts_at),
+        joinedload(Appointment.patient).load_only(User.id, User.username),
+        joinedload(Appointment.doctor).load_only(User.id, User.username)
+            .joinedload(User.doctor_profile).load_only(DoctorProfile.specialty, DoctorProfile.years_experience, DoctorProfile.about_me),
+    ).where(
+        Appointment.status == AppointmentStatus.CONFIRMED,
+        TimeSlot.starts_at >= earliest_start,
+    )
+    if user.role == UserRole.doctor:
+        query = query.where(TimeSlot.doctor_id == user.id) # Same doctor as the appointment, but indexed by start
+    else:
+        query = query.where(Appointment.patient_id == user.id)
+
+    appointments = (await db.scalars(query.order_by(TimeSlot.starts_at, TimeSlot.id).limit(limit))).all()
+    return [
+        AppointmentRequestDetails(
+            id=appt.id,
+            appointment_date=appt.appointment_date,
+            status=appt.status,
+            created_at=appt.created_at,
+            patient=PatientInfo.model_validate(appt.patient),
+            doctor=doctor_summary(appt.doctor),
+            start_time=appt.time_slot.start_time,
+            starts_at=appt.time_slot.starts_at,
+        )
+        for appt in appointments
+    ]
+
 @router.get("/upcoming-confirmed", response_model=Optional[AppointmentRequestDetails]) # Return one or none
 async def get_my_next_confirmed_appointment(
-    db: db_dependency,
+    db: read_db_dependency,
     current_user: Annotated[User, Depends(get_current_active_user)]
 ):
     """
     Fetches the next upcoming confirmed appointment for the logged-in user
     (either as patient or doctor).
     """
-    
-    now_date = datetime.utcnow().date() # Use a distinct variable name
-
-    # --- MODIFIED QUERY with JOIN ---
-    query = db.query(Appointment).join(Appointment.time_slot).filter( # Join Appointment to TimeSlot
-        Appointment.status == AppointmentStatus.CONFIRMED,
-        Appointment.appointment_date >= now_date
-    )
-
-    # Filter based on user role
-    if current_user.role == UserRole.patient:
-        query = query.filter(Appointment.patient_id == current_user.id)
-    elif current_user.role == UserRole.doctor:
-        query = query.filter(Appointment.doctor_id == current_user.id)
-    else:
-        return None # Should not happen
-
-    # Correct ORDER BY using the joined table
-    upcoming_appointment = query.order_by(
-        Appointment.appointment_date.asc(),
-        TimeSlot.start_time.asc() # <<< CORRECTED: Order by TimeSlot.start_time directly
-    ).first()
-    # --- END MODIFIED QUERY ---
-
-    if not upcoming_appointment:
-        print(f"No upcoming confirmed appointments found for user {current_user.id}")
-        return None
-
-    # Prepare response data (should be okay now)
-    if upcoming_appointment.time_slot and upcoming_appointment.patient and upcoming_appointment.doctor:
-         # ... (rest of response preparation logic - make sure model_validate is correct for Pydantic v2) ...
-          response_data = AppointmentRequestDetails(
-                id=upcoming_appointment.id,
-                appointment_date=upcoming_appointment.appointment_date,
-                status=upcoming_appointment.status,
-                created_at=upcoming_appointment.created_at,
-                patient=PatientInfo.model_validate(upcoming_appointment.patient), # Correct for Pydantic v2+
-                doctor=Doctor.model_validate(upcoming_appointment.doctor), # <<< ADD THIS
-                start_time=upcoming_appointment.time_slot.start_time
-             )
-          print(f"Found upcoming appointment {response_data.id} for user {current_user.id}")
-          return response_data
-    else:
-        # This might indicate missing relationship data if the join succeeded but related objects are None
-        print(f"Warning: Upcoming appointment {upcoming_appointment.id if upcoming_appointment else 'N/A'} missing expected related data (patient, doctor, or timeslot info).")
+    upcoming = await next_confirmed_appointments(db, current_user, limit=1)
+    if not upcoming:
+        logger.debug("No upcoming confirmed appointments found for user %s", current_user.id)
         return None
-    
-@router.get("/upcoming-confirmed", response_model=Optional[AppointmentRequestDetails])
-async def get_my_next_confirmed_appointment(
-    db: db_dependency,
-    current_user: Annotated[User, Depends(get_current_active_user)]
+    logger.debug("Found upcoming appointment %s for user %s", upcoming[0].id, current_user.id)
+    return upcoming[0]
+
+@router.get("/upcoming", response_model=List[AppointmentRequestDetails])
+async def get_my_upcoming_confirmed_appointments(
+    db: read_db_dependency,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    limit: int = Query(5, ge=1, le=MAX_UPCOMING_LIMIT, description="How many appointments to return")
 ):
-    print(f"\n--- [DEBUG] ENTERING /upcoming-confirmed for User ID: {current_user.id}, Role: {current_user.role.value} ---") # DEBUG
-
-    now_date_utc = datetime.now(timezone.utc).date()
-    print(f"[DEBUG] Current UTC Date for query: {now_date_utc}") # DEBUG
+    """The next confirmed appointments of the logged-in patient or doctor, soonest first."""
+    return await next_confirmed_appointments(db, current_user, limit)
 
-    # Base query
-    query = db.query(Appointment).options(
-        joinedload(Appointment.time_slot), # Eager load time_slot
-        joinedload(Appointment.patient).joinedload(User.patient_profile), # Eager load patient and their profile
-        joinedload(Appointment.doctor).joinedload(User.doctor_profile) # Eager load doctor and their profile
-    ).filter(
-        Appointment.status == AppointmentStatus.CONFIRMED,
-        Appointment.appointment_date >= now_date_utc
+@router.get("/my-confirmed-patients", response_model=List[RosterPatient])
+async def get_my_confirmed_patients(
+    db: read_db_dependency,
+    response: Response,
+    current_doctor: current_doctor_dependency,
+    sort: str = Query("name", pattern="^(name|visits|last_visit|next_visit)$", description="name, visits, last_visit or next_visit"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(DEFAULT_ROSTER_PAGE_SIZE, ge=1, le=MAX_ROSTER_PAGE_SIZE, description="Page size"),
+    cursor: int = Query(0, ge=0, description="X-Next-Cursor value from the previous page"),
+    q: Optional[str] = Query(None, min_length=1, max_length=100, description="Only patients whose name or username contains this")
+):
+    """
+    The logged-in doctor's patients: everyone with a confirmed or completed appointment, once,
+    with their visit count and last/next visit date. One grouped query (read from
+    ix_appointments_doctor_status_patient) sorted and paged in SQL. The sort keys are aggregates,
+    so the cursor is a row offset; a roster has one row per patient, which keeps that cheap.
+    `q` narrows the roster in the same query (the prescription page's patient picker).
+    """
+    today = clinic_today() # appointment_date is a clinic-calendar date
+    visit_count = func.count(Appointment.id).label("visit_count")
+    last_visit = func.max(case((Appointment.appointment_date < today, Appointment.appointment_date))).label("last_visit")
+    next_visit = func.min(case((Appointment.appointment_date >= today, Appointment.appointment_date))).label("next_visit")
+    display_name = func.lower(func.coalesce(PatientProfile.full_name, User.username))
+
+    sort_column = {"name": display_name, "visits": visit_count, "last_visit": last_visit, "next_visit": next_visit}[sort]
+    sort_order = sort_column.desc() if order == "desc" else sort_column.asc()
+
+    query = select(
+        Appointment.patient_id.label("id"), User.username, PatientProfile.full_name, visit_count, last_visit, next_visit,
+    ).join(User, User.id == Appointment.patient_id).outerjoin(PatientProfile, PatientProfile.user_id == Appointment.patient_id).where(
+        Appointment.doctor_id == current_doctor.id,
+        Appointment.status.in_(ROSTER_STATUSES),
     )
-    print(f"[DEBUG] Base query constructed. Filtering by status=CONFIRMED and date>={now_date_utc}") # DEBUG
-
-    # Filter based on user role
-    if current_user.role == UserRole.patient:
-        query = query.filter(Appointment.patient_id == current_user.id)
-        print(f"[DEBUG] Applied PATIENT filter: patient_id = {current_user.id}") # DEBUG
-    elif current_user.role == UserRole.doctor:
-        query = query.filter(Appointment.doctor_id == current_user.id)
-        print(f"[DEBUG] Applied DOCTOR filter: doctor_id = {current_user.id}") # DEBUG
-    else:
-        print(f"[DEBUG] User role '{current_user.role.value}' is not patient or doctor. Returning None.") # DEBUG
-        return None
-
-    # Order to get the earliest upcoming appointment
-    # Ensure TimeSlot is imported if using TimeSlot.start_time directly
-    # The join was removed as it might overcomplicate if options() works as expected
-    # If TimeSlot.start_time sort fails, we can add join(Appointment.time_slot) back
-    upcoming_appointment = query.order_by(
-        Appointment.appointment_date.asc(),
-        # Assuming TimeSlot relationship is correctly loaded to access start_time for sorting
-        # If this causes issues, you might need to join explicitly or sort differently.
-        # For now, let's try without explicit join on time_slot for ordering if options() handles it.
-        # If there's an error related to time_slot.start_time, we will re-add:
-        # .join(Appointment.time_slot).order_by(Appointment.appointment_date.asc(), TimeSlot.start_time.asc())
-    ).order_by(Appointment.appointment_date.asc()).first() # Simplest order for now if time sort is an issue
-
-    # Refined ordering to ensure sorting by time slot if date is the same
-    # This requires ensuring the time_slot relationship is available for sorting.
-    # If the above .order_by().first() doesn't give the earliest time on the same day,
-    # you might need to query all for the earliest day, then sort in Python, or fix the SQL sort.
-    # For now, let's assume appointments are distinct enough by date.
-
-    if not upcoming_appointment:
-        print(f"[DEBUG] No upcoming confirmed appointments found after filtering and ordering for User ID: {current_user.id}.") # DEBUG
-        return None
-    else:
-        print(f"[DEBUG] Found an upcoming_appointment object. ID: {upcoming_appointment.id}, Date: {upcoming_appointment.appointment_date}, Status: {upcoming_appointment.status}") # DEBUG
-
-    # Prepare response data
-    # Check if all necessary related objects were loaded
-    if upcoming_appointment.time_slot and upcoming_appointment.patient and upcoming_appointment.doctor:
-        print(f"[DEBUG] All related data (time_slot, patient, doctor) seems present for appointment ID: {upcoming_appointment.id}") # DEBUG
-        try:
-            response_data = AppointmentRequestDetails(
-                id=upcoming_appointment.id,
-                appointment_date=upcoming_appointment.appointment_date,
-                status=upcoming_appointment.status,
-                created_at=upcoming_appointment.created_at, # Ensure this exists on Appointment model
-                patient=PatientInfo.model_validate(upcoming_appointment.patient),
-                doctor=Doctor.model_validate(upcoming_appointment.doctor), # Ensure Doctor model matches
-                start_time=upcoming_appointment.time_slot.start_time
-            )
-            print(f"[DEBUG] Successfully created AppointmentRequestDetails. Returning data for appt ID: {response_data.id}") # DEBUG
-            return response_data
-        except Exception as e:
-            print(f"[DEBUG] !!! ERROR during Pydantic validation or response creation: {e}") # DEBUG
-            print(f"[DEBUG] Data for patient: {vars(upcoming_appointment.patient) if upcoming_appointment.patient else 'None'}")
-            print(f"[DEBUG] Data for doctor: {vars(upcoming_appointment.doctor) if upcoming_appointment.doctor else 'None'}")
-            print(f"[DEBUG] Data for time_slot: {vars(upcoming_appointment.time_slot) if upcoming_appointment.time_slot else 'None'}")
-            # Do not raise HTTPException here directly, let the function return None if data is bad
-            # or let Pydantic's validation failure be caught by FastAPI if response_model fails
-            return None # Or raise an internal server error if this state is unexpected
-    else:
-        print(f"[DEBUG] !!! WARNING: Upcoming appointment ID: {upcoming_appointment.id} is missing critical related data (time_slot, patient, or doctor).") # DEBUG
-        if not upcoming_appointment.time_slot: print("[DEBUG] Missing time_slot")
-        if not upcoming_appointment.patient: print("[DEBUG] Missing patient")
-        if not upcoming_appointment.doctor: print("[DEBUG] Missing doctor")
-        return None
\ No newline at end of file
+    if q:
+        # Case-insensitive substring match; LIKE wildcards typed by the user are matched literally
+        pattern = "%" + q.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        query = query.where(or_(PatientProfile.full_name.ilike(pattern, escape="\\"), User.username.ilike(pattern, escape="\\")))
+    query = query.group_by(Appointment.patient_id, User.username, PatientProfile.full_name).order_by(
+        sort_order.nulls_last(), Appointment.patient_id # Patients without a last/next visit go to the end either way
+    ).offset(cursor).limit(limit + 1) # One extra row tells whether another page exists
+
+    rows = (await db.execute(query)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = str(cursor + limit)
+
+    logger.debug("Roster page for doctor %s: %s patients (sort %s %s, cursor %s)", current_doctor.id, len(rows), sort, order, cursor)
+    return [RosterPatient.model_validate(row._mapping) for row in rows]
@@ -1,33 +1,40 @@
 # auth.py
 # --- Add these imports ---
+import logging
 from fastapi import Request, Cookie
 from fastapi.security import OAuth2PasswordBearer
 # ----
 import os
+import hmac
 import random
-import smtplib
-from email.message import EmailMessage
 from datetime import datetime, timedelta
 from fastapi.security import OAuth2PasswordRequestForm
 import jwt
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Header
 from pydantic import BaseModel, EmailStr, field_validator, ValidationInfo
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated, Optional
-from werkzeug.security import generate_password_hash, check_password_hash
 from database import get_db
+from hashing import password_hasher, HashingPoolBusy
+from principal_cache import principal_cache
+from doctor_directory_cache import doctor_directory_cache
+from otp_store import otp_store
+from mailer import mail_queue, MailQueueFull
 from models import User, UserRole
 from dotenv import load_dotenv
 
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/auth",
     tags=["authentication"],
 )
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
 SECRET_KEY = os.environ.get("SECRET_KEY", "default_secret_key_for_dev_only") # Provide a default for safety
 ALGORITHM = "HS256"  # HMAC SHA-256
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
@@ -78,27 +85,14 @@ class Token(BaseModel):
     user_id: int   # <<< ADD THIS LINE
     role: str      # <<< ADD THIS LINE
 
-# Temporary storage for OTPs (Replace with Redis in production)
-otp_store = {}
-
-def send_email(to_email: str, subject: str, body: str):
-    sender_email = os.environ.get("EMAIL_ADDRESS")
-    sender_password = os.environ.get("EMAIL_PASSWORD")
-
-    msg = EmailMessage()
-    msg.set_content(body)
-    msg['Subject'] = subject
-    msg['From'] = sender_email
-    msg['To'] = to_email
-
+async def send_email(to_email: str, subject: str, body: str):
+    """Queues the email for the background mail worker (see mailer.py); returns without waiting for SMTP."""
     try:
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-            smtp.login(sender_email, sender_password)
-            smtp.send_message(msg)
-        print("Email sent successfully!")
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        raise HTTPException(status_code=500, detail="Failed to send email")
+        mail_queue.enqueue(to_email, subject, body)
+        logger.debug("Email queued for delivery.")
+    except MailQueueFull as e:
+        logger.error("Error queueing email: %s", e)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Failed to send email, please try again shortly.", headers={"Retry-After": "5"})
 
 def create_jwt_token(data: dict):
     payload = data
@@ -115,6 +109,51 @@ def verify_jwt_token(token: str):
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
+async def hash_password(password: str) -> str:
+    """Hashes a password on the hashing pool (never on the event loop)."""
+    try:
+        return await password_hasher.hash(password)
+    except HashingPoolBusy as e:
+        logger.warning("Password hashing pool saturated: %s", e)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server is busy, please try again shortly.", headers={"Retry-After": "1"})
+
+async def verify_password(password_hash: str, password: str) -> bool:
+    """Checks a password against its hash on the hashing pool."""
+    try:
+        return await password_hasher.verify(password_hash, password)
+    except HashingPoolBusy as e:
+        logger.warning("Password hashing pool saturated: %s", e)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server is busy, please try again shortly.", headers={"Retry-After": "1"})
+
+async def load_principal(db: AsyncSession, user_id: int, token_version: int) -> Optional[User]:
+    """
+    Resolves the user behind a verified token, from the principal cache when possible.
+    Returns None if the user no longer exists; raises 401 if the token was revoked
+    (issued before the user's last password reset / role change).
+    """
+    cached = principal_cache.get(user_id, token_version)
+    if cached is not None:
+        # The entry may predate a reset handled by another worker, so the version is still
+        # checked against the database: a primary-key read of one column, no row to load
+        user = cached
+        current_version = await db.scalar(select(User.token_version).where(User.id == user_id))
+    else:
+        user = await db.get(User, user_id)
+        current_version = user.token_version if user is not None else None
+
+    if current_version is None:
+        principal_cache.invalidate(user_id)
+        return None
+    if current_version != token_version:
+        principal_cache.invalidate(user_id) # Revoked, possibly through another worker
+        logger.info("Token version %s for user %s is stale (current: %s)", token_version, user_id, current_version)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return cached if cached is not None else principal_cache.put(user)
+
 def validate_license_number(license_number: str) -> bool:
     """
     Validates a doctor's license number (HARDCODED FOR NOW).
@@ -123,11 +162,13 @@ def validate_license_number(license_number: str) -> bool:
     """
     return license_number == HARDCODED_LICENSE_NUMBER
 
-def authenticate_user(db: Session, username: str, password: str):
-    db_user = db.query(User).filter((User.username == username) | (User.email == username)).first()
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    db_user = await db.scalar(
+        select(User).where((User.username == username) | (User.email == username))
+    )
     if not db_user:
         return None
-    if not check_password_hash(db_user.password, password):
+    if not await verify_password(db_user.password, password):
         return None
     return db_user
 
@@ -145,23 +186,24 @@ async def get_current_active_user(
     try:
         payload = verify_jwt_token(token)
         user_id: int | None = payload.get("user_id")
+        token_version: int = payload.get("tv", 0) # Tokens issued before versioning count as version 0
         if user_id is None:
-            print("Token payload missing user_id")
+            logger.debug("Token payload missing user_id")
             raise credentials_exception
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
     except jwt.InvalidTokenError:
         raise credentials_exception
     except Exception as e:
-        print(f"Unexpected error verifying token: {e}")
+        logger.error("Unexpected error verifying token: %s", e)
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await load_principal(db, user_id, token_version)
     if user is None:
-        print(f"User with ID {user_id} from token not found in DB")
+        logger.warning("User with ID %s from token not found in DB", user_id)
         raise credentials_exception
     # Note: We don't check the role here; the endpoint using this dependency will check if needed.
-    print(f"get_current_active_user: Found user {user.username} (ID: {user.id}, Role: {user.role})")
+    logger.debug("get_current_active_user: Found user %s (ID: %s, Role: %s)", user.username, user.id, user.role)
     return user
 # --- End New Dependency ---
 
@@ -187,9 +229,10 @@ async def get_current_doctor(
         # Ensure your create_jwt_token puts 'user_id' in the payload
         user_id: int | None = payload.get("user_id")
         role: str | None = payload.get("role") # Get role from token
+        token_version: int = payload.get("tv", 0)
 
         if user_id is None or role is None:
-            print("Token payload missing user_id or role") # Debug
+            logger.debug("Token payload missing user_id or role")
             raise credentials_exception
 
     except jwt.ExpiredSignatureError:
@@ -199,27 +242,27 @@ async def get_current_doctor(
             headers={"WWW-Authenticate": "Bearer"},
         )
     except jwt.InvalidTokenError as e:
-        print(f"Invalid token error: {e}") # Debug
+        logger.debug("Invalid token error: %s", e)
         raise credentials_exception
     except Exception as e: # Catch other potential errors during verification
-         print(f"Error verifying token: {e}") # Debug
+         logger.error("Error verifying token: %s", e)
          raise credentials_exception
 
-    # Fetch user from DB based on ID from token
-    user = db.query(User).filter(User.id == user_id).first()
+    # Fetch user based on ID from token (principal cache first, then DB)
+    user = await load_principal(db, user_id, token_version)
     if user is None:
-        print(f"User with ID {user_id} not found in DB") # Debug
+        logger.warning("User with ID %s not found in DB", user_id)
         raise credentials_exception
 
     # Check if the role from token matches DB and is 'doctor'
     # Compare with the Enum value or its .value attribute
     if role != UserRole.doctor.value or user.role != UserRole.doctor :
-         print(f"Role mismatch or not a doctor. Token Role: {role}, DB Role: {user.role}") # Debug
+         logger.debug("Role mismatch or not a doctor. Token Role: %s, DB Role: %s", role, user.role)
          raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="User is not authorized (Not a doctor)"
         )
 
-    print(f"get_current_doctor successful for user: {user.username}") # Debug
+    logger.debug("get_current_doctor successful for user: %s", user.username)
     return user
 # --- END OF REPLACEMENT ---
 # --- END OF DEPENDENCY FUNCTION ---
@@ -227,12 +270,12 @@ async def get_current_doctor(
 @router.post("/register", status_code=status.HTTP_201_CREATED)
 async def register(user: UserCreate, db: db_dependency):
      # Check if username already registered
-    db_user_name = db.query(User).filter(User.username == user.username).first()
+    db_user_name = await db.scalar(select(User.id).where(User.username == user.username))
     if db_user_name:
         raise HTTPException(status_code=400, detail="Username already registered")
 
     # Check if email already registered
-    db_user_email = db.query(User).filter(User.email == user.email).first()
+    db_user_email = await db.scalar(select(User.id).where(User.email == user.email))
     if db_user_email:
         raise HTTPException(status_code=400, detail="Email already registered")
 
@@ -251,7 +294,7 @@ async def register(user: UserCreate, db: db_dependency):
         if not validate_license_number(user.license_number):
             raise HTTPException(status_code=400, detail="Invalid license number provided.")
     
-    hashed_password = generate_password_hash(user.password)
+    hashed_password = await hash_password(user.password)
 
     db_user = User(
         username=user.username,
@@ -262,14 +305,16 @@ async def register(user: UserCreate, db: db_dependency):
     )
 
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    if db_user.role == UserRole.doctor:
+        doctor_directory_cache.invalidate() # New entry in the public doctor list
+    await db.refresh(db_user)
     return {"message": "User created successfully"}
 
 # --- MODIFY THIS LOGIN ENDPOINT ---
 @router.post("/login", response_model=Token) # Use your Token model if defined, or adjust response
 async def login_for_access_token(response: Response, db: db_dependency, form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -279,7 +324,7 @@ async def login_for_access_token(response: Response, db: db_dependency, form_dat
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_jwt_token(
         # Include essential info in token if needed elsewhere, but primary auth is cookie
-        data={"sub": user.username, "role": user.role.value, "user_id": user.id}
+        data={"sub": user.username, "role": user.role.value, "user_id": user.id, "tv": user.token_version}
     )
 
     # Set HttpOnly cookie for authentication
@@ -306,16 +351,16 @@ async def login_for_access_token(response: Response, db: db_dependency, form_dat
 @router.post("/forgot-password")
 async def forgot_password(request: ForgotPasswordRequest, db: db_dependency):
     email = request.email
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         raise HTTPException(status_code=404, detail="User with this email not found")
 
     otp = str(random.randint(100000, 999999))
-    otp_store[email] = {"otp": otp, "user_id": user.id}  # Store in temporary storage
+    await otp_store.put(email, otp, user.id)  # Replaces any earlier OTP; expires after OTP_TTL_SECONDS
 
     # Send email
     try:
-        send_email(email, "Password Reset OTP", f"Your OTP is: {otp}")
+        await send_email(email, "Password Reset OTP", f"Your OTP is: {otp}")
     except HTTPException as e:
         raise e  # Re-raise the exception from send_email
     return {"message": "OTP sent to your email address"}
@@ -326,7 +371,8 @@ async def verify_otp(request: VerifyOTPRequest):
     email = request.email
     otp = request.otp
 
-    if email not in otp_store or otp_store[email]["otp"] != otp:
+    record = await otp_store.get(email)
+    if record is None or not hmac.compare_digest(record.otp, otp):
         raise HTTPException(status_code=400, detail="Invalid OTP")
 
     # If OTP is valid, you might return a success message and redirect
@@ -340,19 +386,22 @@ async def reset_password(request: ResetPasswordRequest, db: db_dependency):
     otp = request.otp
     new_password = request.new_password
 
-    if email not in otp_store or otp_store[email]["otp"] != otp:
+    record = await otp_store.get(email)
+    if record is None or not hmac.compare_digest(record.otp, otp):
         raise HTTPException(status_code=400, detail="Invalid OTP")
 
-    user_id = otp_store[email]["user_id"]
-    user = db.query(User).filter(User.id == user_id).first()
+    user_id = record.user_id
+    user = await db.get(User, user_id)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    hashed_password = generate_password_hash(new_password)
+    hashed_password = await hash_password(new_password)
     user.password = hashed_password
-    db.commit()
+    user.token_version += 1 # Revoke every token issued before the reset
+    await db.commit()
+    principal_cache.invalidate(user.id) # Drop the cached principal now that the new version is committed
 
-    del otp_store[email]  # Remove OTP from store
+    await otp_store.delete(email)  # Remove OTP from store
 
     return {"message": "Password reset successfully"}
\ No newline at end of file
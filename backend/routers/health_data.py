@@ -1,20 +1,27 @@
 # backend/routers/health_data.py
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from pydantic import BaseModel, Field, field_validator, validator
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated, List, Optional, Dict, Any
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, select
 from database import get_db
+from read_replica import get_read_db
 from models import User, UserRole, HealthDataEntry, Appointment# Import new model
 from routers.auth import get_current_active_user, get_current_doctor # Use general user auth
 from datetime import datetime, date as py_date, timezone, timedelta
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/health-data",
     tags=["Health Data"],
 )
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+# Read-only endpoints: served by the read replica when one is configured
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 current_user_dependency = Annotated[User, Depends(get_current_active_user)]
 current_doctor_dependency = Annotated[User, Depends(get_current_doctor)]
 
@@ -139,7 +146,7 @@ async def create_health_data_entry(
     if current_user.role != UserRole.patient:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only patients can log health data.")
 
-    print(f"Received health data from user {current_user.id}: {health_data.model_dump(exclude_none=True)}")
+    logger.debug("Received health data from user %s: %s", current_user.id, health_data.model_dump(exclude_none=True))
 
     # Ensure at least one actual metric value is provided (not just timestamp)
     provided_metrics = {k: v for k, v in health_data.model_dump(exclude_none=True).items() if k != 'timestamp'}
@@ -173,20 +180,20 @@ async def create_health_data_entry(
     )
     try:
         db.add(db_entry)
-        db.commit()
-        db.refresh(db_entry)
-        print(f"Health data entry {db_entry.id} created for user {current_user.id}")
+        await db.commit()
+        await db.refresh(db_entry)
+        logger.info("Health data entry %s created for user %s", db_entry.id, current_user.id)
         return db_entry
     except Exception as e:
-        db.rollback()
-        print(f"Error creating health data entry: {e}")
+        await db.rollback()
+        logger.error("Error creating health data entry: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not save health data.")
 
 
 @router.get("/me", response_model=List[HealthDataResponse])
 async def get_my_health_data(
     current_user: current_user_dependency,
-    db: db_dependency,
+    db: read_db_dependency,
     limit: Optional[int] = Query(100, ge=1, le=1000),
     start_date: Optional[py_date] = Query(None), # YYYY-MM-DD
     end_date: Optional[py_date] = Query(None)   # YYYY-MM-DD
@@ -194,29 +201,29 @@ async def get_my_health_data(
     if current_user.role != UserRole.patient:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access restricted to patients.")
 
-    print(f"Fetching health data for user {current_user.id} with limit {limit}, start: {start_date}, end: {end_date}")
-    query = db.query(HealthDataEntry).filter(HealthDataEntry.user_id == current_user.id)
+    logger.debug("Fetching health data for user %s with limit %s, start: %s, end: %s", current_user.id, limit, start_date, end_date)
+    query = select(HealthDataEntry).where(HealthDataEntry.user_id == current_user.id)
 
     if start_date:
         # Convert date to datetime at start of day (UTC) for comparison
         start_datetime = datetime.combine(start_date, datetime.min.time(), tzinfo=timezone.utc)
-        query = query.filter(HealthDataEntry.timestamp >= start_datetime)
+        query = query.where(HealthDataEntry.timestamp >= start_datetime)
     if end_date:
         # Convert date to datetime at end of day (UTC) for comparison
         end_datetime = datetime.combine(end_date, datetime.max.time(), tzinfo=timezone.utc)
-        query = query.filter(HealthDataEntry.timestamp <= end_datetime)
+        query = query.where(HealthDataEntry.timestamp <= end_datetime)
 
-    entries = query.order_by(HealthDataEntry.timestamp.desc()).limit(limit).all()
-    print(f"Found {len(entries)} health data entries.")
+    entries = (await db.scalars(query.order_by(HealthDataEntry.timestamp.desc()).limit(limit))).all()
+    logger.debug("Found %s health data entries.", len(entries))
     return entries
 
 # New Endpoint
 @router.get("/me/latest-snapshot", response_model=Optional[LatestHealthSnapshot])
 async def get_my_latest_health_snapshot(
     current_user: current_user_dependency,
-    db: db_dependency
+    db: read_db_dependency
 ):
-    print(f"Fetching latest health snapshot for user {current_user.id}")
+    logger.debug("Fetching latest health snapshot for user %s", current_user.id)
     snapshot = {}
     metrics_and_status = [
         ("heart_rate", "heart_rate_status"),
@@ -230,16 +237,16 @@ async def get_my_latest_health_snapshot(
     for metric_field, status_field in metrics_and_status:
         latest_entry = None
         if metric_field == "systolic_bp":  # Special handling for BP
-            latest_entry = db.query(
+            latest_entry = (await db.execute(select(
                 HealthDataEntry.systolic_bp,
                 HealthDataEntry.diastolic_bp,
                 HealthDataEntry.bp_status,
                 HealthDataEntry.timestamp
-            ).filter(
+            ).where(
                 HealthDataEntry.user_id == current_user.id,
                 HealthDataEntry.systolic_bp.isnot(None),
                 HealthDataEntry.diastolic_bp.isnot(None)
-            ).order_by(desc(HealthDataEntry.timestamp)).first()
+            ).order_by(desc(HealthDataEntry.timestamp)).limit(1))).first()
 
             if latest_entry:
                 snapshot['systolic_bp'] = latest_entry[0]
@@ -248,14 +255,14 @@ async def get_my_latest_health_snapshot(
                 snapshot['bp_timestamp'] = latest_entry[3]
         else:
             # For other metrics, get the value, its specific status, and timestamp
-            latest_entry = db.query(
+            latest_entry = (await db.execute(select(
                 getattr(HealthDataEntry, metric_field), # e.g., HealthDataEntry.heart_rate
                 getattr(HealthDataEntry, status_field), # e.g., HealthDataEntry.heart_rate_status
                 HealthDataEntry.timestamp
-            ).filter(
+            ).where(
                 HealthDataEntry.user_id == current_user.id,
                 getattr(HealthDataEntry, metric_field).isnot(None) # Ensure the metric itself has a value
-            ).order_by(desc(HealthDataEntry.timestamp)).first()
+            ).order_by(desc(HealthDataEntry.timestamp)).limit(1))).first()
 
             if latest_entry:
                 snapshot[metric_field] = getattr(latest_entry, metric_field)
@@ -270,7 +277,7 @@ async def get_my_latest_health_snapshot(
 async def get_patient_health_data_for_doctor(
     patient_id: int,
     current_doctor: current_doctor_dependency, # Doctor authentication
-    db: db_dependency,
+    db: read_db_dependency,
     limit: Optional[int] = Query(200, ge=1, le=1000, description="Number of recent entries to fetch"), # Default limit 200 for charts
     start_date: Optional[py_date] = Query(None),
     end_date: Optional[py_date] = Query(None)
@@ -279,40 +286,40 @@ async def get_patient_health_data_for_doctor(
     Allows an authenticated doctor to fetch health data entries for a specific patient.
     Includes a basic check to see if the doctor has any appointment record with the patient.
     """
-    print(f"Doctor {current_doctor.id} attempting to fetch health data for patient {patient_id}")
+    logger.debug("Doctor %s attempting to fetch health data for patient %s", current_doctor.id, patient_id)
 
     # 1. Verify patient exists and is actually a patient
-    patient = db.query(User).filter(User.id == patient_id, User.role == UserRole.patient).first()
+    patient = await db.scalar(select(User.id).where(User.id == patient_id, User.role == UserRole.patient))
     if not patient:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Patient not found.")
 
     # 2. Authorization Check: Does this doctor have any appointment (any status) with this patient?
     # This is a basic check. A more robust system might have explicit doctor-patient linking.
-    association_check = db.query(Appointment.id).filter(
+    association_check = await db.scalar(select(Appointment.id).where(
         Appointment.doctor_id == current_doctor.id,
         Appointment.patient_id == patient_id
-    ).first()
+    ).limit(1))
 
     if not association_check:
         # If no association, doctor cannot view this patient's private health data
-        print(f"Authorization failed: Doctor {current_doctor.id} not associated with patient {patient_id}.")
+        logger.warning("Authorization failed: Doctor %s not associated with patient %s.", current_doctor.id, patient_id)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You are not authorized to view this patient's health data."
         )
-    print(f"Doctor {current_doctor.id} is authorized to view patient {patient_id} data.")
+    logger.debug("Doctor %s is authorized to view patient %s data.", current_doctor.id, patient_id)
 
     # 3. Fetch health data for the specified patient
-    query = db.query(HealthDataEntry).filter(HealthDataEntry.user_id == patient_id)
+    query = select(HealthDataEntry).where(HealthDataEntry.user_id == patient_id)
 
     if start_date:
         start_datetime = datetime.combine(start_date, datetime.min.time(), tzinfo=timezone.utc)
-        query = query.filter(HealthDataEntry.timestamp >= start_datetime)
+        query = query.where(HealthDataEntry.timestamp >= start_datetime)
     if end_date:
         end_datetime = datetime.combine(end_date, datetime.max.time(), tzinfo=timezone.utc)
-        query = query.filter(HealthDataEntry.timestamp <= end_datetime)
+        query = query.where(HealthDataEntry.timestamp <= end_datetime)
 
-    entries = query.order_by(HealthDataEntry.timestamp.desc()).limit(limit).all()
-    print(f"Found {len(entries)} health data entries for patient {patient_id} for doctor view.")
+    entries = (await db.scalars(query.order_by(HealthDataEntry.timestamp.desc()).limit(limit))).all()
+    logger.debug("Found %s health data entries for patient %s for doctor view.", len(entries), patient_id)
     return entries
 # --- *** END OF NEW ENDPOINT *** ---
\ No newline at end of file
@@ -0,0 +1,84 @@
+# backend/routers/metrics.py
+# Operational metrics for monitoring. Only answered for local clients (e.g. a sidecar scraper).
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+
+from principal_cache import principal_cache
+from doctor_directory_cache import doctor_directory_cache
+from mailer import mail_queue
+from appointment_sweeper import appointment_sweeper
+from database import sync_pool_metrics, async_pool_metrics, replica_pool_metrics, replica_async_engine
+from read_replica import read_routing_stats
+from query_stats import route_query_stats, SQL_QUERY_BUDGET, SQL_REPEAT_THRESHOLD
+from request_metrics import request_metrics
+from logging_config import logging_stats
+
+# Client addresses allowed to read metrics (comma separated)
+METRICS_ALLOWED_HOSTS = {
+    host.strip() for host in os.environ.get("METRICS_ALLOWED_HOSTS", "127.0.0.1,::1,localhost").split(",") if host.strip()
+}
+
+async def require_local_client(request: Request):
+    """Hides the metrics endpoints from anything but the allowed hosts."""
+    client_host = request.client.host if request.client else None
+    if client_host not in METRICS_ALLOWED_HOSTS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+    dependencies=[Depends(require_local_client)],
+)
+
+@router.get("", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    """Request latency histograms, status codes and in-flight requests per route (Prometheus text format)."""
+    return PlainTextResponse(request_metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@router.get("/principal-cache")
+async def get_principal_cache_stats():
+    """Hit/miss counters of the authenticated-user cache."""
+    return principal_cache.stats()
+
+@router.get("/doctor-directory-cache")
+async def get_doctor_directory_cache_stats():
+    """Hit/miss counters of the cached doctor directory pages."""
+    return doctor_directory_cache.stats()
+
+@router.get("/mail-queue")
+async def get_mail_queue_stats():
+    """Sent/retried/dropped counters and current depth of the outbound mail queue."""
+    return mail_queue.stats()
+
+@router.get("/appointment-sweeper")
+async def get_appointment_sweeper_stats():
+    """Appointments expired/completed and slots freed by the background sweeper, in total and in its last run."""
+    return appointment_sweeper.stats()
+
+@router.get("/db-pool")
+async def get_db_pool_stats():
+    """Checkouts, wait times, timeouts and current occupancy of each connection pool."""
+    pools = {"async": async_pool_metrics.stats(), "sync": sync_pool_metrics.stats()}
+    if replica_async_engine is not None:
+        pools["replica"] = replica_pool_metrics.stats()
+    return pools
+
+@router.get("/read-routing")
+async def get_read_routing_stats():
+    """How read-only requests were routed: replica, primary after a recent write, or fallback."""
+    return read_routing_stats
+
+@router.get("/db")
+async def get_db_query_stats():
+    """Per-route query counts, DB time, slowest statement and likely N+1 requests."""
+    return {
+        "query_budget": SQL_QUERY_BUDGET,
+        "repeat_threshold": SQL_REPEAT_THRESHOLD,
+        "routes": route_query_stats.stats(),
+    }
+
+@router.get("/logging")
+async def get_logging_stats():
+    """Root log level, records waiting to be written and records dropped because the queue was full."""
+    return logging_stats()
@@ -1,6 +1,8 @@
 # backend/routers/notifications.py
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated, List, Optional
 
 from database import get_db
@@ -9,12 +11,14 @@ from routers.auth import get_current_active_user # Use general user auth
 from pydantic import BaseModel
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/notifications",
     tags=["notifications"],
 )
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
 current_user_dependency = Annotated[User, Depends(get_current_active_user)]
 
 # --- Pydantic Models for Notifications ---
@@ -40,28 +44,28 @@ async def get_my_notifications(
     mark_as_read: bool = False # Optional query param to mark as read on fetch
 ):
     """Fetches all notifications for the logged-in user, ordered by most recent."""
-    print(f"Fetching notifications for user {current_user.id}") # DEBUG
-    notifications = db.query(Notification).filter(
+    logger.debug("Fetching notifications for user %s", current_user.id)
+    notifications = (await db.scalars(select(Notification).where(
         Notification.user_id == current_user.id
-    ).order_by(Notification.created_at.desc()).all()
+    ).order_by(Notification.created_at.desc()))).all()
 
     if mark_as_read and notifications:
-         print(f"Marking {len(notifications)} notifications as read for user {current_user.id}") # DEBUG
+         logger.debug("Marking %s notifications as read for user %s", len(notifications), current_user.id)
          try:
               # Mark fetched notifications as read
               unread_ids = [n.id for n in notifications if not n.is_read]
               if unread_ids:
-                   db.query(Notification).filter(
+                   await db.execute(update(Notification).where(
                        Notification.id.in_(unread_ids)
-                   ).update({"is_read": True}, synchronize_session=False)
-                   db.commit()
+                   ).values(is_read=True).execution_options(synchronize_session=False))
+                   await db.commit()
                    # Update the is_read status in the objects we're returning
                    for n in notifications:
                         if n.id in unread_ids:
                             n.is_read = True
          except Exception as e:
-              db.rollback()
-              print(f"Error marking notifications as read: {e}") # Log error but proceed
+              await db.rollback()
+              logger.error("Error marking notifications as read: %s", e) # Log error but proceed
 
     return notifications
 
@@ -71,12 +75,12 @@ async def get_my_unread_notification_count(
     db: db_dependency
 ):
     """Gets the count of unread notifications for the logged-in user."""
-    print(f"Fetching unread count for user {current_user.id}") # DEBUG
-    count = db.query(Notification).filter(
+    logger.debug("Fetching unread count for user %s", current_user.id)
+    count = await db.scalar(select(func.count(Notification.id)).where(
         Notification.user_id == current_user.id,
         Notification.is_read == False
-    ).count()
-    print(f"Unread count for user {current_user.id}: {count}") # DEBUG
+    ))
+    logger.debug("Unread count for user %s: %s", current_user.id, count)
     return {"unread_count": count}
 
 @router.post("/{notification_id}/mark-read", status_code=status.HTTP_204_NO_CONTENT)
@@ -86,20 +90,20 @@ async def mark_notification_as_read(
     db: db_dependency
 ):
     """Marks a specific notification as read."""
-    print(f"Marking notification {notification_id} as read for user {current_user.id}") # DEBUG
-    notification = db.query(Notification).filter(
+    logger.debug("Marking notification %s as read for user %s", notification_id, current_user.id)
+    notification = await db.scalar(select(Notification).where(
         Notification.id == notification_id,
         Notification.user_id == current_user.id # Ensure user owns notification
-    ).first()
+    ))
 
     if not notification:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Notification not found.")
 
     if not notification.is_read:
         notification.is_read = True
-        db.commit()
-        print("Marked as read.") # DEBUG
+        await db.commit()
+        logger.debug("Marked as read.")
     else:
-         print("Already marked as read.") # DEBUG
+         logger.debug("Already marked as read.")
 
     return None # No content to return on success
\ No newline at end of file
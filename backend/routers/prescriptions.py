@@ -1,13 +1,17 @@
 # backend/routers/prescriptions.py
 
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated, List, Optional
 from pydantic import BaseModel, Field
 from datetime import date,datetime # Import date
 
 # Your project imports
 from database import get_db
+from read_replica import get_read_db
 from models import User, UserRole, Prescription, PrescriptionMedication # Import necessary models
 from routers.auth import get_current_doctor, get_current_active_user # Use Doctor auth dependency
 
@@ -56,13 +60,17 @@ class PrescriptionResponse(BaseModel): # Details for one full prescription
 # --- End Pydantic Models ---
 
 
+logger = logging.getLogger(__name__)
+
 # --- Router Setup ---
 router = APIRouter(
     prefix="/prescriptions", # Base path for endpoints in this file
     tags=["prescriptions"],  # Tag for API docs
 )
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+# Read-only endpoints: served by the read replica when one is configured
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 # Only doctors can create prescriptions
 current_doctor_dependency = Annotated[User, Depends(get_current_doctor)]
 # *** ADD Dependency for any logged-in user ***
@@ -81,12 +89,12 @@ async def create_prescription(
     Creates a new prescription written by the logged-in doctor
     for the specified patient, including associated medications.
     """
-    print(f"Received prescription creation request from Dr. {current_doctor.username} (ID: {current_doctor.id}) for patient ID: {prescription_data.patient_id}") # DEBUG
+    logger.debug("Received prescription creation request from Dr. %s (ID: %s) for patient ID: %s", current_doctor.username, current_doctor.id, prescription_data.patient_id)
 
     # Optional: Verify the patient exists and is actually a patient
-    patient = db.query(User).filter(User.id == prescription_data.patient_id, User.role == UserRole.patient).first()
+    patient = await db.scalar(select(User.id).where(User.id == prescription_data.patient_id, User.role == UserRole.patient))
     if not patient:
-        print(f"Error: Patient with ID {prescription_data.patient_id} not found or is not a patient.") # DEBUG
+        logger.warning("Patient with ID %s not found or is not a patient.", prescription_data.patient_id)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Patient with ID {prescription_data.patient_id} not found.")
 
     # Create the main Prescription database record
@@ -101,11 +109,11 @@ async def create_prescription(
     # Ensure parent object gets an ID before adding children if not using cascade correctly
     # Though cascade should handle this if relationship is set up. Flush is safer sometimes.
     try:
-        db.flush() # Assigns ID to db_prescription without committing yet
-        print(f"Prescription object flushed (ID: {db_prescription.id}). Adding medications...") # DEBUG
+        await db.flush() # Assigns ID to db_prescription without committing yet
+        logger.debug("Prescription object flushed (ID: %s). Adding medications...", db_prescription.id)
     except Exception as e:
-         db.rollback()
-         print(f"Error during DB flush for prescription: {e}")
+         await db.rollback()
+         logger.error("Error during DB flush for prescription: %s", e)
          raise HTTPException(status_code=500, detail="Database error during prescription pre-save.")
 
 
@@ -122,17 +130,17 @@ async def create_prescription(
         db.add(db_med) # Add each medication line item
 
     try:
-        db.commit() # Commit parent and all children together
-        db.refresh(db_prescription) # Refresh to ensure all fields are up-to-date
-        print(f"Prescription {db_prescription.id} and its medications committed successfully.") # DEBUG
+        await db.commit() # Commit parent and all children together
+        await db.refresh(db_prescription) # Refresh to ensure all fields are up-to-date
+        logger.info("Prescription %s and its medications committed successfully.", db_prescription.id)
         # Return success response
         return PrescriptionBasicResponse(
              message="Prescription created successfully",
              prescription_id=db_prescription.id
         )
     except Exception as e:
-        db.rollback() # Rollback transaction on error
-        print(f"Error committing prescription: {e}") # Log the specific error
+        await db.rollback() # Rollback transaction on error
+        logger.error("Error committing prescription: %s", e) # Log the specific error
         # Consider more specific error checks (e.g., IntegrityError) if needed
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error saving prescription.")
 # --- End API Endpoint ---
@@ -144,7 +152,7 @@ async def create_prescription(
 # --- *** ADD NEW GET Endpoint for Patient *** ---
 @router.get("/my", response_model=List[PrescriptionResponse]) # Response is List of the model above
 async def get_my_prescriptions(
-    db: db_dependency,
+    db: read_db_dependency,
     current_user: current_user_dependency
 ):
     """
@@ -154,21 +162,21 @@ async def get_my_prescriptions(
     if current_user.role != UserRole.patient:
         return []
 
-    print(f"Fetching prescriptions for patient {current_user.id}")
+    logger.debug("Fetching prescriptions for patient %s", current_user.id)
 
     # Query prescriptions with eager loading
-    prescriptions_db = db.query(Prescription).options(
+    prescriptions_db = (await db.scalars(select(Prescription).options(
         selectinload(Prescription.medications),
         # Eagerly load Doctor and their profile to get the name efficiently
         joinedload(Prescription.doctor).joinedload(User.doctor_profile)
-    ).filter(
+    ).where(
         Prescription.patient_id == current_user.id
     ).order_by(
         Prescription.prescription_date.desc(),
         Prescription.created_at.desc()
-    ).all()
+    ))).all()
 
-    print(f"Found {len(prescriptions_db)} prescriptions in DB.")
+    logger.debug("Found %s prescriptions in DB.", len(prescriptions_db))
 
     # *** MANUALLY CONSTRUCT RESPONSE TO INCLUDE DOCTOR NAME ***
     response_data: List[PrescriptionResponse] = []
@@ -184,7 +192,7 @@ async def get_my_prescriptions(
             else:
                 doc_name = presc.doctor.username # Fallback to username
         else:
-             print(f"Warning: Doctor relationship not loaded for Prescription ID {presc.id}")
+             logger.warning("Doctor relationship not loaded for Prescription ID %s", presc.id)
 
         # Create the response object for this prescription
         response_data.append(
@@ -208,17 +216,17 @@ async def get_my_prescriptions(
 @router.get("/patient/{patient_id}", response_model=List[PrescriptionResponse])
 async def get_prescriptions_for_patient_by_doctor(
     patient_id: int, # Path parameter
-    db: db_dependency,
+    db: read_db_dependency,
     current_doctor: current_doctor_dependency # Ensures only a logged-in doctor can access
 ):
     """
     Fetches all prescriptions for a specific patient ID.
     Only accessible by logged-in doctors.
     """
-    print(f"Doctor {current_doctor.username} (ID: {current_doctor.id}) requesting prescriptions for patient ID: {patient_id}")
+    logger.debug("Doctor %s (ID: %s) requesting prescriptions for patient ID: %s", current_doctor.username, current_doctor.id, patient_id)
 
     # Verify the patient exists
-    patient = db.query(User).filter(User.id == patient_id, User.role == UserRole.patient).first()
+    patient = await db.scalar(select(User.id).where(User.id == patient_id, User.role == UserRole.patient))
     if not patient:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -226,17 +234,17 @@ async def get_prescriptions_for_patient_by_doctor(
         )
 
     # Query prescriptions for the specified patient_id
-    prescriptions_db = db.query(Prescription).options(
+    prescriptions_db = (await db.scalars(select(Prescription).options(
         selectinload(Prescription.medications),
         joinedload(Prescription.doctor).joinedload(User.doctor_profile) # Eager load doctor who prescribed
-    ).filter(
+    ).where(
         Prescription.patient_id == patient_id
     ).order_by(
         Prescription.prescription_date.desc(),
         Prescription.created_at.desc()
-    ).all()
+    ))).all()
 
-    print(f"Found {len(prescriptions_db)} prescriptions in DB for patient {patient_id}.")
+    logger.debug("Found %s prescriptions in DB for patient %s.", len(prescriptions_db), patient_id)
 
     response_data: List[PrescriptionResponse] = []
     for presc in prescriptions_db:
@@ -248,7 +256,7 @@ async def get_prescriptions_for_patient_by_doctor(
             else:
                 doc_name = presc.doctor.username
         else:
-            print(f"Warning: Doctor relationship not loaded for Prescription ID {presc.id}")
+            logger.warning("Doctor relationship not loaded for Prescription ID %s", presc.id)
 
         response_data.append(
             PrescriptionResponse(
@@ -1,7 +1,10 @@
 # backend/routers/profile.py
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr, Field # Make sure Field is imported
-from sqlalchemy.orm import Session, joinedload # Import joinedload for eager loading
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload # Import joinedload for eager loading
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated, Optional, Union # Import Union
 
 from database import get_db
@@ -9,6 +12,8 @@ from database import get_db
 from models import User, UserRole, PatientProfile, DoctorProfile
 # Import the dependency to get the logged-in user
 from routers.auth import get_current_active_user
+from doctor_directory_cache import doctor_directory_cache
+from doctor_availability import refresh_next_free_slot
 
 # --- Pydantic Models for Profile Data ---
 
@@ -83,13 +88,15 @@ class UserProfileResponse(BaseModel):
     class Config: from_attributes = True # Still needed for base User fields
 
 
+logger = logging.getLogger(__name__)
+
 # --- Router Setup ---
 router = APIRouter(
     prefix="/profile", # Use /profile as the prefix for these endpoints
     tags=["profile"],  # Tag for API documentation
 )
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
 current_user_dependency = Annotated[User, Depends(get_current_active_user)] # Use general logged-in user dependency
 
 # --- Endpoints ---
@@ -103,7 +110,7 @@ async def read_users_me(
     Get profile details for the currently authenticated user.
     Eagerly loads the appropriate profile based on the user's role.
     """
-    print(f"Fetching profile for user: {current_user.username}, Role: {current_user.role.value}") # DEBUG
+    logger.debug("Fetching profile for user: %s, Role: %s", current_user.username, current_user.role.value)
 
     profile_data_response = None
     is_complete = False
@@ -111,21 +118,21 @@ async def read_users_me(
     # Query the User again but explicitly load the profile relationship
     # This avoids lazy loading issues and ensures profile data is available
     if current_user.role == UserRole.patient:
-        user_with_profile = db.query(User).options(
+        user_with_profile = await db.scalar(select(User).options(
             joinedload(User.patient_profile) # Eagerly load patient profile
-        ).filter(User.id == current_user.id).first()
+        ).where(User.id == current_user.id))
         if user_with_profile and user_with_profile.patient_profile:
             profile_data_response = PatientProfileResponse.model_validate(user_with_profile.patient_profile)
             is_complete = user_with_profile.patient_profile.is_complete
-            print("Patient profile data found and loaded.") # DEBUG
+            logger.debug("Patient profile data found and loaded.")
     elif current_user.role == UserRole.doctor:
-        user_with_profile = db.query(User).options(
+        user_with_profile = await db.scalar(select(User).options(
             joinedload(User.doctor_profile) # Eagerly load doctor profile
-        ).filter(User.id == current_user.id).first()
+        ).where(User.id == current_user.id))
         if user_with_profile and user_with_profile.doctor_profile:
             profile_data_response = DoctorProfileResponse.model_validate(user_with_profile.doctor_profile)
             is_complete = user_with_profile.doctor_profile.is_complete
-            print("Doctor profile data found and loaded.") # DEBUG
+            logger.debug("Doctor profile data found and loaded.")
     else:
         # Should not happen if role is enforced, but handle case
         user_with_profile = current_user # Use the user object directly if no profile expected
@@ -157,17 +164,17 @@ async def update_patient_profile(
     if current_user.role != UserRole.patient:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only patients can update this profile.")
 
-    print(f"Attempting to update patient profile for user {current_user.id}") # DEBUG
+    logger.debug("Attempting to update patient profile for user %s", current_user.id)
     # Get the existing profile or create a new one if it doesn't exist
-    profile = db.query(PatientProfile).filter(PatientProfile.user_id == current_user.id).first()
+    profile = await db.get(PatientProfile, current_user.id)
     if not profile:
         profile = PatientProfile(user_id=current_user.id)
         db.add(profile)
-        print(f"Creating new PatientProfile for user {current_user.id}") # DEBUG
+        logger.debug("Creating new PatientProfile for user %s", current_user.id)
 
     # Get fields from request that were actually sent (exclude unset)
     update_data = profile_data.model_dump(exclude_unset=True)
-    print(f"Received update data for patient: {update_data}") # DEBUG
+    logger.debug("Received update data for patient: %s", update_data)
     updated = False
     for key, value in update_data.items():
         if hasattr(profile, key) and value is not None: # Check if field exists and value provided
@@ -180,7 +187,7 @@ async def update_patient_profile(
         is_now_complete = bool(profile.full_name and profile.age and profile.gender) # Basic example
         if is_now_complete and not profile.is_complete:
              profile.is_complete = True
-             print(f"Marking patient profile complete for user: {current_user.username}") # DEBUG
+             logger.debug("Marking patient profile complete for user: %s", current_user.username)
         elif not is_now_complete and profile.is_complete:
             # Optional: If user removes required data, mark incomplete again?
             # profile.is_complete = False
@@ -188,15 +195,15 @@ async def update_patient_profile(
 
 
         try:
-            db.commit()
-            db.refresh(profile) # Get any DB defaults/updates
-            print("Patient profile committed successfully.") # DEBUG
+            await db.commit()
+            await db.refresh(profile) # Get any DB defaults/updates
+            logger.info("Patient profile committed successfully.")
         except Exception as e:
-            db.rollback()
-            print(f"Error committing patient profile update: {e}") # DEBUG
+            await db.rollback()
+            logger.error("Error committing patient profile update: %s", e)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
     else:
-         print("No actual data fields were updated.") # DEBUG
+         logger.debug("No actual data fields were updated.")
 
     # Return the full updated profile using the GET endpoint logic
     return await read_users_me(current_user, db)
@@ -212,16 +219,18 @@ async def update_doctor_profile(
     if current_user.role != UserRole.doctor:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only doctors can update this profile.")
 
-    print(f"Attempting to update doctor profile for user {current_user.id}") # DEBUG
+    logger.debug("Attempting to update doctor profile for user %s", current_user.id)
     # Get or create profile record
-    profile = db.query(DoctorProfile).filter(DoctorProfile.user_id == current_user.id).first()
+    profile = await db.get(DoctorProfile, current_user.id)
     if not profile:
         profile = DoctorProfile(user_id=current_user.id)
         db.add(profile)
-        print(f"Creating new DoctorProfile for user {current_user.id}") # DEBUG
+        await db.flush() # So the doctor's existing slots count towards next_free_slot_at
+        await refresh_next_free_slot(db, current_user.id)
+        logger.debug("Creating new DoctorProfile for user %s", current_user.id)
 
     update_data = profile_data.model_dump(exclude_unset=True)
-    print(f"Received update data for doctor: {update_data}") # DEBUG
+    logger.debug("Received update data for doctor: %s", update_data)
     updated = False
     for key, value in update_data.items():
         if hasattr(profile, key) and value is not None:
@@ -235,21 +244,22 @@ async def update_doctor_profile(
         is_now_complete = bool(profile.full_name and profile.specialty and profile.qualifications) # Basic example
         if is_now_complete and not profile.is_complete:
             profile.is_complete = True
-            print(f"Marking doctor profile complete for user: {current_user.username}") # DEBUG
+            logger.debug("Marking doctor profile complete for user: %s", current_user.username)
         elif not is_now_complete and profile.is_complete:
              # profile.is_complete = False # Optional: Revert if user deletes required info
              pass
 
         try:
-            db.commit()
-            db.refresh(profile)
-            print("Doctor profile committed successfully.") # DEBUG
+            await db.commit()
+            doctor_directory_cache.invalidate() # The public doctor list shows profile fields
+            await db.refresh(profile)
+            logger.info("Doctor profile committed successfully.")
         except Exception as e:
-            db.rollback()
-            print(f"Error committing doctor profile update: {e}") # DEBUG
+            await db.rollback()
+            logger.error("Error committing doctor profile update: %s", e)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
     else:
-         print("No actual data fields were updated.") # DEBUG
+         logger.debug("No actual data fields were updated.")
 
     # Return the full updated profile using the GET endpoint logic
     return await read_users_me(current_user, db)
\ No newline at end of file
@@ -0,0 +1,263 @@
+# backend/routers/schedule_templates.py
+# Recurring weekly schedules. A doctor describes a block once (weekday, start/end time, slot
+# length, effective dates) and it is materialised as TimeSlot rows for the next
+# SCHEDULE_TEMPLATE_HORIZON_DAYS days with bulk statements in a single transaction, instead of
+# one PUT /appointments/schedule per date. Changing a template re-expands only the difference.
+# The appointment sweeper rolls every template forward as days pass, so the window never runs out.
+
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Annotated, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel, Field, field_validator, model_validator
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db
+from read_replica import get_read_db
+from models import Appointment, ScheduleTemplate, TimeSlot, User
+from routers.auth import get_current_doctor
+from doctor_availability import refresh_next_free_slot
+from schedule_time import clinic_today, slot_starts_at
+
+logger = logging.getLogger(__name__)
+
+# How far ahead templates are materialised; the appointment sweeper (or POST /expand) rolls the window forward
+SCHEDULE_TEMPLATE_HORIZON_DAYS = int(os.environ.get("SCHEDULE_TEMPLATE_HORIZON_DAYS", "56"))
+
+router = APIRouter(
+    prefix="/appointments/schedule-templates",
+    tags=["appointments"],
+)
+
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
+current_doctor_dependency = Annotated[User, Depends(get_current_doctor)]
+
+# --- Pydantic Models ---
+
+class ScheduleTemplateBase(BaseModel):
+    weekday: int = Field(..., ge=0, le=6) # 0 = Monday ... 6 = Sunday
+    start_time: str # HH:MM (24hr), first slot
+    end_time: str # HH:MM (24hr), the last slot ends by then
+    slot_minutes: int = Field(30, ge=5, le=240)
+    effective_from: date
+    effective_until: Optional[date] = None # Open ended if not given
+
+    @field_validator("start_time", "end_time")
+    @classmethod
+    def validate_time_format(cls, value):
+        try:
+            # Normalise to zero-padded HH:MM so it matches TimeSlot.start_time
+            return datetime.strptime(value, "%H:%M").strftime("%H:%M")
+        except ValueError:
+            raise ValueError("Time must be in HH:MM (24-hour) format")
+
+    @model_validator(mode="after")
+    def validate_ranges(self):
+        if not template_slot_times(self):
+            raise ValueError("end_time must be at least one slot length after start_time")
+        if self.effective_until is not None and self.effective_until < self.effective_from:
+            raise ValueError("effective_until must not be before effective_from")
+        return self
+
+class ScheduleTemplateResponse(ScheduleTemplateBase):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+class ScheduleTemplateExpansion(BaseModel): # Result of creating/updating/expanding a template
+    template: ScheduleTemplateResponse
+    slots_added: int
+    slots_removed: int
+    slots_kept_booked: int # No longer in the template but left alone because they have an appointment
+    expanded_until: date
+
+# --- Expansion ---
+
+def template_slot_times(template) -> List[str]:
+    """Start times of the slots in one occurrence, e.g. 09:00, 09:30, ... for 09:00-12:00 / 30."""
+    start = datetime.strptime(template.start_time, "%H:%M")
+    end = datetime.strptime(template.end_time, "%H:%M")
+    length = timedelta(minutes=template.slot_minutes)
+    times = []
+    while start + length <= end:
+        times.append(start.strftime("%H:%M"))
+        start += length
+    return times
+
+def template_dates(template, first: date, last: date) -> List[date]:
+    """Dates in [first, last] that fall on the template's weekday and inside its effective range."""
+    first = max(first, template.effective_from)
+    if template.effective_until is not None:
+        last = min(last, template.effective_until)
+    current = first + timedelta(days=(template.weekday - first.weekday()) % 7)
+    dates = []
+    while current <= last:
+        dates.append(current)
+        current += timedelta(days=7)
+    return dates
+
+async def expand_template(db: AsyncSession, template: ScheduleTemplate, today: Optional[date] = None) -> dict:
+    """
+    Brings the template's future slots in line with its current definition and records how far
+    they now reach in template.expanded_until (no commit).
+    Constant number of statements: one read, at most one bulk DELETE and one bulk INSERT.
+    Past slots, slots with an appointment and slots the doctor added by hand are never touched,
+    and no slot is generated for a time of `today` that has already passed.
+    """
+    today = today or clinic_today()
+    now = datetime.now(timezone.utc)
+    expanded_until = today + timedelta(days=SCHEDULE_TEMPLATE_HORIZON_DAYS)
+    dates = template_dates(template, today, expanded_until)
+    times = template_slot_times(template)
+    desired = {(slot_date, start_time) for slot_date in dates for start_time in times}
+
+    # 1. This template's future slots, plus anything already on the dates it covers
+    has_appointment = select(Appointment.id).where(Appointment.timeslot_id == TimeSlot.id).exists()
+    existing = (await db.execute(
+        select(TimeSlot.id, TimeSlot.date, TimeSlot.start_time, TimeSlot.template_id, has_appointment.label("has_appointment"))
+        .where(
+            TimeSlot.doctor_id == template.doctor_id,
+            TimeSlot.date >= today,
+            or_(TimeSlot.template_id == template.id, TimeSlot.date.in_(dates)),
+        )
+    )).all()
+
+    stale_ids, kept_booked, occupied = [], 0, set()
+    for slot in existing:
+        key = (slot.date, slot.start_time)
+        if slot.template_id == template.id and key not in desired:
+            if slot.has_appointment:
+                kept_booked += 1
+            else:
+                stale_ids.append(slot.id)
+                continue
+        occupied.add(key)
+
+    # 2. Remove generated slots the template no longer covers (guarded against a booking in between)
+    removed = 0
+    if stale_ids:
+        result = await db.execute(
+            delete(TimeSlot).where(TimeSlot.id.in_(stale_ids), ~has_appointment).execution_options(synchronize_session=False)
+        )
+        removed = result.rowcount
+
+    # 3. Add the missing ones with one bulk INSERT
+    new_slots = [
+        {"doctor_id": template.doctor_id, "date": slot_date, "start_time": start_time, "is_booked": False, "template_id": template.id}
+        for slot_date, start_time in sorted(desired - occupied)
+        if slot_date > today or slot_starts_at(slot_date, start_time) >= now # Would be listed as bookable in the past
+    ]
+    if new_slots:
+        await db.execute(insert(TimeSlot), new_slots)
+
+    template.expanded_until = expanded_until
+    logger.debug("Expanded schedule template %s: +%s -%s (kept %s booked)", template.id, len(new_slots), removed, kept_booked)
+    return {"slots_added": len(new_slots), "slots_removed": removed, "slots_kept_booked": kept_booked, "expanded_until": expanded_until}
+
+async def ensure_no_overlap(db: AsyncSession, doctor_id: int, data: ScheduleTemplateBase, exclude_id: Optional[int] = None):
+    """409 if another of the doctor's templates covers overlapping times on the same weekday and dates."""
+    query = select(ScheduleTemplate).where(
+        ScheduleTemplate.doctor_id == doctor_id,
+        ScheduleTemplate.weekday == data.weekday,
+        ScheduleTemplate.start_time < data.end_time, # HH:MM strings compare chronologically
+        ScheduleTemplate.end_time > data.start_time,
+        or_(ScheduleTemplate.effective_until.is_(None), ScheduleTemplate.effective_until >= data.effective_from),
+    )
+    if data.effective_until is not None:
+        query = query.where(ScheduleTemplate.effective_from <= data.effective_until)
+    if exclude_id is not None:
+        query = query.where(ScheduleTemplate.id != exclude_id)
+    clash = await db.scalar(query.limit(1))
+    if clash:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Overlaps schedule template {clash.id} ({clash.start_time}-{clash.end_time}).")
+
+async def get_own_template(db: AsyncSession, template_id: int, doctor_id: int) -> ScheduleTemplate:
+    template = await db.scalar(select(ScheduleTemplate).where(ScheduleTemplate.id == template_id, ScheduleTemplate.doctor_id == doctor_id))
+    if not template:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Schedule template not found.")
+    return template
+
+# --- API Endpoints ---
+
+@router.get("", response_model=List[ScheduleTemplateResponse])
+async def list_my_templates(current_doctor: current_doctor_dependency, db: read_db_dependency):
+    """The logged-in doctor's weekly templates."""
+    return (await db.scalars(select(ScheduleTemplate).where(
+        ScheduleTemplate.doctor_id == current_doctor.id
+    ).order_by(ScheduleTemplate.weekday, ScheduleTemplate.start_time))).all()
+
+@router.post("", response_model=ScheduleTemplateExpansion, status_code=status.HTTP_201_CREATED)
+async def create_template(data: ScheduleTemplateBase, current_doctor: current_doctor_dependency, db: db_dependency):
+    """Creates a template and materialises its slots for the coming weeks."""
+    await ensure_no_overlap(db, current_doctor.id, data)
+    try:
+        template = ScheduleTemplate(doctor_id=current_doctor.id, **data.model_dump())
+        db.add(template)
+        await db.flush() # Assigns template.id for the generated slots
+        result = await expand_template(db, template)
+        await refresh_next_free_slot(db, current_doctor.id)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error("Error creating schedule template for doctor %s: %s", current_doctor.id, e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create schedule template due to a server error.")
+    logger.info("Created schedule template %s for doctor %s (%s slots).", template.id, current_doctor.id, result["slots_added"])
+    return {"template": template, **result}
+
+@router.put("/{template_id}", response_model=ScheduleTemplateExpansion)
+async def update_template(template_id: int, data: ScheduleTemplateBase, current_doctor: current_doctor_dependency, db: db_dependency):
+    """Replaces a template's definition and re-expands only what changed."""
+    template = await get_own_template(db, template_id, current_doctor.id)
+    await ensure_no_overlap(db, current_doctor.id, data, exclude_id=template_id)
+    try:
+        for field, value in data.model_dump().items():
+            setattr(template, field, value)
+        result = await expand_template(db, template)
+        await refresh_next_free_slot(db, current_doctor.id)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error("Error updating schedule template %s: %s", template_id, e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to update schedule template due to a server error.")
+    await db.refresh(template) # updated_at is set by the database
+    logger.info("Updated schedule template %s: +%s -%s slots.", template_id, result["slots_added"], result["slots_removed"])
+    return {"template": template, **result}
+
+@router.delete("/{template_id}", status_code=status.HTTP_200_OK)
+async def delete_template(template_id: int, current_doctor: current_doctor_dependency, db: db_dependency):
+    """Deletes a template and its future free slots. Booked and past slots stay, detached from it."""
+    template = await get_own_template(db, template_id, current_doctor.id)
+    try:
+        has_appointment = select(Appointment.id).where(Appointment.timeslot_id == TimeSlot.id).exists()
+        result = await db.execute(delete(TimeSlot).where(
+            TimeSlot.template_id == template_id, TimeSlot.date >= clinic_today(), ~has_appointment
+        ).execution_options(synchronize_session=False))
+        await db.execute(update(TimeSlot).where(TimeSlot.template_id == template_id).values(template_id=None).execution_options(synchronize_session=False))
+        await db.delete(template)
+        await refresh_next_free_slot(db, current_doctor.id)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error("Error deleting schedule template %s: %s", template_id, e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to delete schedule template due to a server error.")
+    logger.info("Deleted schedule template %s and %s future slots.", template_id, result.rowcount)
+    return {"message": "Schedule template deleted successfully.", "slots_removed": result.rowcount}
+
+@router.post("/expand", response_model=List[ScheduleTemplateExpansion])
+async def expand_my_templates(current_doctor: current_doctor_dependency, db: db_dependency):
+    """Rolls every template of the doctor forward to the current horizon, in one transaction."""
+    templates = (await db.scalars(select(ScheduleTemplate).where(ScheduleTemplate.doctor_id == current_doctor.id))).all()
+    try:
+        results = [{"template": template, **(await expand_template(db, template))} for template in templates]
+        await refresh_next_free_slot(db, current_doctor.id)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error("Error expanding schedule templates for doctor %s: %s", current_doctor.id, e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to expand schedule templates due to a server error.")
+    return results
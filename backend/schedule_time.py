@@ -0,0 +1,112 @@
+# backend/schedule_time.py
+# Slot times. Doctors publish slots as a date plus an "HH:MM" wall-clock time in the clinic's
+# timezone (SCHEDULE_TZ_OFFSET); TimeSlot.starts_at stores the same instant as a UTC timestamp
+# so ordering, "what's next" queries and video join windows are plain indexed comparisons.
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import DateTime, bindparam, select, update
+from sqlalchemy.types import TypeDecorator
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def parse_utc_offset(value: str) -> timezone:
+    """"+05:30" / "-08:00" -> fixed-offset timezone."""
+    sign = -1 if value.startswith("-") else 1
+    hours, minutes = value.lstrip("+-").split(":")
+    return timezone(sign * timedelta(hours=int(hours), minutes=int(minutes)))
+
+
+# Timezone the "HH:MM" slot times are entered in (IST by default)
+SCHEDULE_TZ = parse_utc_offset(os.environ.get("SCHEDULE_TZ_OFFSET", "+05:30"))
+
+
+def slot_starts_at(slot_date: date, start_time: str) -> datetime:
+    """Aware UTC datetime of a slot given its date and HH:MM start in SCHEDULE_TZ."""
+    local = datetime.combine(slot_date, datetime.strptime(start_time, "%H:%M").time(), tzinfo=SCHEDULE_TZ)
+    return local.astimezone(timezone.utc)
+
+
+def local_start(starts_at: datetime) -> datetime:
+    """starts_at in the clinic's timezone, for display."""
+    return starts_at.astimezone(SCHEDULE_TZ)
+
+
+def clinic_today() -> date:
+    """Today's date in SCHEDULE_TZ, the calendar TimeSlot.date is in (not the server's)."""
+    return datetime.now(SCHEDULE_TZ).date()
+
+
+class UTCDateTime(TypeDecorator):
+    """
+    Timezone-aware timestamp stored in UTC on every backend. PostgreSQL keeps the offset itself;
+    SQLite has no timezone support, so values are normalised to UTC before they are written and
+    marked as UTC when read back, which keeps comparisons and ordering correct there too.
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[datetime], dialect):
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            raise ValueError("UTCDateTime needs a timezone-aware datetime")
+        value = value.astimezone(timezone.utc)
+        return value.replace(tzinfo=None) if dialect.name == "sqlite" else value
+
+    def process_result_value(self, value: Optional[datetime], dialect):
+        if value is None:
+            return None
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def default_starts_at(context) -> Optional[datetime]:
+    """Column default for TimeSlot.starts_at: derived from the row's date and start_time."""
+    params = context.get_current_parameters()
+    if params.get("date") is None or not params.get("start_time"):
+        return None
+    try:
+        return slot_starts_at(params["date"], params["start_time"])
+    except ValueError:
+        return None # Unparseable legacy time; the slot still works by date/start_time
+
+
+def backfill_slot_starts_at(engine) -> int:
+    """Fills TimeSlot.starts_at for rows created before the column existed. Returns rows updated."""
+    from models import TimeSlot # models imports this module for UTCDateTime
+
+    updated = 0
+    set_starts_at = (
+        update(TimeSlot)
+        .where(TimeSlot.id == bindparam("slot_id"))
+        .values(starts_at=bindparam("new_starts_at"))
+    )
+    with engine.begin() as conn:
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                select(TimeSlot.id, TimeSlot.date, TimeSlot.start_time)
+                .where(TimeSlot.starts_at.is_(None), TimeSlot.id > last_id)
+                .order_by(TimeSlot.id)
+                .limit(BACKFILL_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            params = []
+            for row in rows:
+                try:
+                    params.append({"slot_id": row.id, "new_starts_at": slot_starts_at(row.date, row.start_time)})
+                except ValueError:
+                    logger.warning("Time slot %s has unparseable start_time %r; starts_at left empty", row.id, row.start_time)
+            if params:
+                conn.execute(set_starts_at, params)
+                updated += len(params)
+    if updated:
+        logger.info("Backfilled starts_at for %s time slots", updated)
+    return updated
@@ -0,0 +1,75 @@
+# backend/tests/test_mailer.py
+# Run from the backend folder: python -m pytest tests
+import smtplib
+import unittest
+
+from mailer import MailJob, MailQueue
+
+
+class FakeSMTP:
+    """Records what was sent; refuses the recipients in `refused`, like a real server would."""
+
+    def __init__(self, refused=()):
+        self.refused = set(refused)
+        self.sent = []
+        self.closed = False
+
+    def send_message(self, message):
+        if message["To"] in self.refused:
+            raise smtplib.SMTPRecipientsRefused({message["To"]: (550, b"5.1.1 No such user")})
+        self.sent.append(message["To"])
+
+    def quit(self):
+        self.closed = True
+
+
+class FakeServerMailQueue(MailQueue):
+    """MailQueue whose connections are FakeSMTP sessions (or errors, when connect_error is set)."""
+
+    def __init__(self, refused=(), connect_error=None):
+        super().__init__(security="none", password="")
+        self.refused = refused
+        self.connect_error = connect_error
+        self.sessions = []
+
+    def _connect(self):
+        if self.connect_error is not None:
+            raise self.connect_error
+        self.stats_counters["connections"] += 1
+        self.sessions.append(FakeSMTP(self.refused))
+        return self.sessions[-1]
+
+
+def jobs(*recipients):
+    return [MailJob(to_email=recipient, subject="Password Reset OTP", body="Your OTP is: 123456") for recipient in recipients]
+
+
+class SendBatchTest(unittest.TestCase):
+    def test_refused_recipient_fails_only_its_own_mail(self):
+        queue = FakeServerMailQueue(refused={"typo@example"})
+        failures = queue._send_batch(jobs("a@example.com", "typo@example", "b@example.com", "c@example.com"))
+
+        self.assertEqual([job.to_email for job, _ in failures], ["typo@example"])
+        self.assertIsInstance(failures[0][1], smtplib.SMTPRecipientsRefused)
+        # The mails after the refused one still went out, over the same connection
+        self.assertEqual(len(queue.sessions), 1)
+        self.assertEqual(queue.sessions[0].sent, ["a@example.com", "b@example.com", "c@example.com"])
+        self.assertFalse(queue.sessions[0].closed)
+        self.assertEqual(queue.stats_counters["sent"], 3)
+
+    def test_connect_failure_fails_the_batch_without_reconnecting_per_mail(self):
+        error = smtplib.SMTPAuthenticationError(535, b"5.7.8 Bad credentials")
+        queue = FakeServerMailQueue(connect_error=error)
+        attempts = []
+        connect = queue._connect
+        queue._connect = lambda: attempts.append(1) or connect()
+
+        failures = queue._send_batch(jobs("a@example.com", "b@example.com", "c@example.com"))
+
+        self.assertEqual(len(failures), 3)
+        self.assertTrue(all(failure is error for _, failure in failures))
+        self.assertEqual(len(attempts), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()